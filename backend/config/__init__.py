@@ -0,0 +1,7 @@
+# Load the Celery app with Django so shared tasks bind to it; Celery is optional
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -227,6 +227,48 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Background jobs (report corrections, batch anonymization): Celery when a broker
+# is configured, else a local thread pool
+CORRECTION_JOBS_USE_CELERY = config('CORRECTION_JOBS_USE_CELERY', default=bool(config('REDIS_URL', default='')), cast=bool)
+CORRECTION_JOB_THREADS = config('CORRECTION_JOB_THREADS', default=2, cast=int)
+
+# Batch anonymization: process pool size, items per chunk/bulk write, and the
+# largest batch still processed inside the request
+ANONYMIZATION_BATCH_WORKERS = config('ANONYMIZATION_BATCH_WORKERS', default=2, cast=int)
+ANONYMIZATION_BATCH_CHUNK_SIZE = config('ANONYMIZATION_BATCH_CHUNK_SIZE', default=500, cast=int)
+ANONYMIZATION_BATCH_SYNC_LIMIT = config('ANONYMIZATION_BATCH_SYNC_LIMIT', default=20, cast=int)
+ANONYMIZATION_BATCH_START_METHOD = config('ANONYMIZATION_BATCH_START_METHOD', default='spawn')
+
+# PHI name detection: name candidates are checked against the gazetteer built
+# by build_name_gazetteer. Medical phrases are never redacted as names; other
+# unknown pairs still are, unless both name list files are configured. Name
+# list files hold one name per line or CSV with the name first (e.g. SSA first
+# names, Census surnames)
+PHI_NAME_GAZETTEER_PATH = config('PHI_NAME_GAZETTEER_PATH', default=os.path.join(BASE_DIR, 'medical_data', 'name_gazetteer.bin'))
+PHI_FIRST_NAMES_FILE = config('PHI_FIRST_NAMES_FILE', default='')
+PHI_SURNAMES_FILE = config('PHI_SURNAMES_FILE', default='')
+PHI_NAME_GAZETTEER_ERROR_RATE = config('PHI_NAME_GAZETTEER_ERROR_RATE', default=0.001, cast=float)
+
+# Activity logging: entries are queued and written in batches of
+# ACTIVITY_LOG_BATCH_SIZE at least every ACTIVITY_LOG_FLUSH_INTERVAL seconds;
+# beyond ACTIVITY_LOG_MAX_QUEUE waiting entries new ones are dropped
+ACTIVITY_LOG_BUFFERED = config('ACTIVITY_LOG_BUFFERED', default=True, cast=bool)
+ACTIVITY_LOG_BATCH_SIZE = config('ACTIVITY_LOG_BATCH_SIZE', default=200, cast=int)
+ACTIVITY_LOG_FLUSH_INTERVAL = config('ACTIVITY_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+ACTIVITY_LOG_MAX_QUEUE = config('ACTIVITY_LOG_MAX_QUEUE', default=10000, cast=int)
+
+# Dashboard analytics cache: entries are fresh for DASHBOARD_CACHE_TTL seconds
+# or until activity is logged, then served stale (up to DASHBOARD_CACHE_STALE_TTL)
+# while one worker recomputes them, at most every DASHBOARD_CACHE_MIN_REFRESH seconds
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=300, cast=int)
+DASHBOARD_CACHE_STALE_TTL = config('DASHBOARD_CACHE_STALE_TTL', default=3600, cast=int)
+DASHBOARD_CACHE_MIN_REFRESH = config('DASHBOARD_CACHE_MIN_REFRESH', default=15, cast=float)
+DASHBOARD_CACHE_LOCK_TIMEOUT = config('DASHBOARD_CACHE_LOCK_TIMEOUT', default=60, cast=int)
+
+# Keyset (cursor) pagination of log and request lists: whether pages include
+# the total COUNT(*) unless the request passes ?count=false
+KEYSET_PAGINATION_COUNT = config('KEYSET_PAGINATION_COUNT', default=True, cast=bool)
+
 # Cache Configuration - Simplified for deployment
 CACHES = {
     'default': {
@@ -305,6 +347,29 @@ SWAGGER_SETTINGS = {
 # ================================
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 
+# Async LLM client: report sections sent concurrently, each with its own timeout
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=4, cast=int)
+LLM_CHUNK_TIMEOUT = config('LLM_CHUNK_TIMEOUT', default=15.0, cast=float)
+LLM_MAX_CHUNK_CHARS = config('LLM_MAX_CHUNK_CHARS', default=4000, cast=int)
+
+# Content-addressed cache of analyze_medical_report results
+ANALYSIS_CACHE_TIMEOUT = config('ANALYSIS_CACHE_TIMEOUT', default=86400, cast=int)
+ANALYSIS_CACHE_LOCAL_MAX_BYTES = config('ANALYSIS_CACHE_LOCAL_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+ANALYSIS_CACHE_MAX_ITEM_BYTES = config('ANALYSIS_CACHE_MAX_ITEM_BYTES', default=1024 * 1024, cast=int)
+
+# Model registry: each model is loaded once per process
+# MODEL_WARMUP lists models to load at worker boot, e.g. "grammar_t5"
+MODEL_WARMUP = [name.strip() for name in config('MODEL_WARMUP', default='').split(',') if name.strip()]
+MODEL_IDLE_TIMEOUT = config('MODEL_IDLE_TIMEOUT', default=0, cast=int)  # seconds; 0 = never unload
+MODEL_LOAD_RETRY_SECONDS = config('MODEL_LOAD_RETRY_SECONDS', default=300, cast=int)
+MODEL_TORCH_THREADS = config('MODEL_TORCH_THREADS', default=0, cast=int)  # 0 = torch default
+MODEL_TORCH_INTEROP_THREADS = config('MODEL_TORCH_INTEROP_THREADS', default=0, cast=int)
+
+# Local grammar model: sentences from concurrent requests are batched into one generate
+GRAMMAR_BATCH_MAX_SIZE = config('GRAMMAR_BATCH_MAX_SIZE', default=16, cast=int)
+GRAMMAR_BATCH_MAX_WAIT_MS = config('GRAMMAR_BATCH_MAX_WAIT_MS', default=15.0, cast=float)
+GRAMMAR_BATCH_TIMEOUT = config('GRAMMAR_BATCH_TIMEOUT', default=60.0, cast=float)
+
 # ================================
 # Healthcare & HIPAA Compliance Settings
 # ================================
@@ -0,0 +1,245 @@
+"""
+Buffered Activity Log Writer for MedixScan
+Queues ActivityLog entries in memory and writes them in batches
+
+Request threads only append to a bounded queue; a background thread writes
+queued entries with one bulk_create per batch once ACTIVITY_LOG_BATCH_SIZE
+entries are waiting or every ACTIVITY_LOG_FLUSH_INTERVAL seconds. ActivityType
+ids are resolved once and kept in memory. When the queue is full, new entries
+are dropped and counted instead of blocking the request. The buffer is drained
+at interpreter exit.
+
+Each batch is folded into the hourly and daily ActivityRollup rows in the
+same transaction as its insert, so the rollups always match the log table.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ActivityLog, ActivityType
+from .rollups import apply_logs
+
+logger = logging.getLogger(__name__)
+
+
+class ActivitySink:
+    """
+    Bounded in-memory buffer in front of ActivityLog.objects.bulk_create
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_queue: Optional[int] = None, buffered: Optional[bool] = None,
+                 on_flush: Optional[Callable[[int], None]] = None):
+        self.batch_size = batch_size or getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)
+        self.max_queue = max_queue or getattr(settings, 'ACTIVITY_LOG_MAX_QUEUE', 10000)
+        self.buffered = getattr(settings, 'ACTIVITY_LOG_BUFFERED', True) if buffered is None else buffered
+        self.on_flush = on_flush
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=self.max_queue)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._stopped = False
+        self._types: Dict[str, Tuple[int, str]] = {}  # name -> (id, category)
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._flushes = 0
+        self._last_flush_at: Optional[str] = None
+
+        atexit.register(self.shutdown)
+
+    def record(self, activity_type: str, action: str, user=None, **kwargs) -> bool:
+        """
+        Queue one activity; returns False if it was dropped.
+
+        Accepts the same keyword arguments as
+        DashboardAnalyticsService.log_activity.
+        """
+        entry = {
+            'activity_type': activity_type,
+            'category': kwargs.get('category', 'system'),
+            'type_description': kwargs.get('description', ''),
+            'user_id': getattr(user, 'pk', None),
+            'action': action,
+            'description': kwargs.get('description', action),
+            'severity': kwargs.get('severity', 'info'),
+            'metadata': kwargs.get('metadata') or {},
+            'ip_address': kwargs.get('ip_address'),
+            'user_agent': kwargs.get('user_agent') or '',
+            'session_key': kwargs.get('session_key') or '',
+            'duration': kwargs.get('duration'),
+            'timestamp': timezone.now(),
+        }
+
+        if not self.buffered or self._stopped:
+            with self._stats_lock:
+                self._enqueued += 1
+            self._write([entry])
+            return True
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            return False
+
+        with self._stats_lock:
+            self._enqueued += 1
+        self._ensure_worker()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive() or self._worker_pid != os.getpid():
+                self._worker = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Activity log flush failed")
+            finally:
+                close_old_connections()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        entries = []
+        while len(entries) < limit:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                entries = self._drain(self.batch_size)
+                if not entries:
+                    break
+                written += self._write(entries)
+        return written
+
+    def _type_id(self, entry: Dict[str, Any]) -> int:
+        name = entry['activity_type']
+        cached = self._types.get(name)
+        if cached is None:
+            activity_type, _ = ActivityType.objects.get_or_create(
+                name=name,
+                defaults={
+                    'category': entry['category'],
+                    'description': entry['type_description'],
+                }
+            )
+            cached = self._types[name] = (activity_type.pk, activity_type.category)
+        return cached[0]
+
+    def _insert(self, entries: List[Dict[str, Any]]):
+        logs = self._build_logs(entries)
+        categories = dict(self._types.values())
+        with transaction.atomic():
+            ActivityLog.objects.bulk_create(logs)
+            apply_logs(logs, categories)
+
+    def _build_logs(self, entries: List[Dict[str, Any]]) -> List[ActivityLog]:
+        return [
+            ActivityLog(
+                activity_type_id=self._type_id(entry),
+                user_id=entry['user_id'],
+                action=entry['action'],
+                description=entry['description'],
+                severity=entry['severity'],
+                metadata=entry['metadata'],
+                ip_address=entry['ip_address'],
+                user_agent=entry['user_agent'],
+                session_key=entry['session_key'],
+                duration=entry['duration'],
+                timestamp=entry['timestamp'],
+            )
+            for entry in entries
+        ]
+
+    def _write(self, entries: List[Dict[str, Any]]) -> int:
+        try:
+            try:
+                self._insert(entries)
+            except Exception:
+                # A cached activity type may have been deleted; resolve again once
+                self._types.clear()
+                self._insert(entries)
+        except Exception as e:
+            logger.error(f"Dropping {len(entries)} activity log entries: {e}")
+            with self._stats_lock:
+                self._failed += len(entries)
+            return 0
+
+        with self._stats_lock:
+            self._written += len(entries)
+            self._flushes += 1
+            self._last_flush_at = timezone.now().isoformat()
+        if self.on_flush is not None:
+            try:
+                self.on_flush(len(entries))
+            except Exception as e:
+                logger.warning(f"Activity log flush callback failed: {e}")
+        return len(entries)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the writer thread and write whatever is still queued"""
+        self._stopped = True
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and worker is not threading.current_thread():
+            worker.join(timeout)
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Activity log drain failed")
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and write counters"""
+        with self._stats_lock:
+            return {
+                'buffered': self.buffered,
+                'queued': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'flushes': self._flushes,
+                'last_flush_at': self._last_flush_at,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'cached_activity_types': len(self._types),
+            }
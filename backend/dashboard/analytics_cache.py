@@ -0,0 +1,181 @@
+"""
+Dashboard Analytics Cache for MedixScan
+Generation-versioned cache entries served stale while one worker recomputes
+
+Every entry is written twice: under a key versioned with the current cache
+generation and under a "last" key holding the newest value of any
+generation. Invalidation is a single increment of the generation counter,
+which works on every cache backend and never touches the entries
+themselves.
+
+A read returns the versioned entry while it is fresh. Otherwise it returns
+the last value, stale, and schedules a background recompute. The recompute
+takes a lock in the shared cache, so only one process recomputes a key at a
+time. A read with no value at all computes synchronously, and concurrent
+readers wait for that result instead of stampeding the database. While
+writes keep bumping the generation, a key is recomputed at most once every
+DASHBOARD_CACHE_MIN_REFRESH seconds.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dashboard'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+
+class AnalyticsCache:
+    """
+    Stale-while-revalidate cache over the shared Django cache
+    """
+
+    def __init__(self, ttl: Optional[int] = None, stale_ttl: Optional[int] = None,
+                 min_refresh: Optional[float] = None, lock_timeout: Optional[int] = None, workers: int = 2):
+        self.ttl = ttl or getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+        self.stale_ttl = stale_ttl or getattr(settings, 'DASHBOARD_CACHE_STALE_TTL', 3600)
+        self.min_refresh = getattr(settings, 'DASHBOARD_CACHE_MIN_REFRESH', 15) if min_refresh is None else min_refresh
+        self.lock_timeout = lock_timeout or getattr(settings, 'DASHBOARD_CACHE_LOCK_TIMEOUT', 60)
+        self.wait_timeout = 10.0  # seconds a reader waits for another worker's first computation
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-cache')
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def generation(self) -> int:
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            cache.add(GENERATION_KEY, 1, None)
+            generation = cache.get(GENERATION_KEY, 1)
+        return generation
+
+    def bump_generation(self) -> int:
+        """Invalidate every entry; they are served stale until recomputed"""
+        try:
+            return cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 2, None)
+            return cache.get(GENERATION_KEY, 2)
+
+    def _keys(self, name: str, generation: int):
+        return f'{KEY_PREFIX}:{name}:g{generation}', f'{KEY_PREFIX}:{name}:last', f'{KEY_PREFIX}:{name}:lock'
+
+    def _count(self, name: str, counter: str, amount: float = 1):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, {
+                'hits': 0, 'stale_hits': 0, 'misses': 0, 'recomputes': 0, 'errors': 0,
+                'recompute_ms_total': 0.0, 'recompute_ms_max': 0.0, 'last_recompute_at': None,
+            })
+            stats[counter] += amount
+            if counter == 'recompute_ms_total':
+                stats['recompute_ms_max'] = max(stats['recompute_ms_max'], amount)
+                stats['last_recompute_at'] = time.time()
+
+    def get_or_compute(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Value of name: fresh, stale with a background refresh, or computed now"""
+        generation = self.generation()
+        current_key, last_key, _ = self._keys(name, generation)
+        found = cache.get_many([current_key, last_key])
+
+        entry = found.get(current_key)
+        if entry is not None and time.time() < entry['fresh_until']:
+            self._count(name, 'hits')
+            return entry['value']
+
+        last = found.get(last_key)
+        if last is not None:
+            self._count(name, 'stale_hits')
+            if time.time() - last['computed_at'] >= self.min_refresh:
+                self._refresh_in_background(name, compute, generation)
+            return last['value']
+
+        self._count(name, 'misses')
+        return self._compute_once(name, compute, generation)
+
+    def _refresh_in_background(self, name: str, compute: Callable[[], Any], generation: int):
+        _, _, lock_key = self._keys(name, generation)
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, self.lock_timeout):
+            return  # another worker is already recomputing
+
+        def run():
+            try:
+                self._compute_and_store(name, compute, generation)
+            except Exception:
+                logger.exception(f"Background recompute of dashboard '{name}' failed")
+            finally:
+                self._release(lock_key, token)
+                close_old_connections()
+
+        self._executor.submit(run)
+
+    def _compute_once(self, name: str, compute: Callable[[], Any], generation: int) -> Any:
+        _, last_key, lock_key = self._keys(name, generation)
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, self.lock_timeout):
+            # Someone else is computing; wait for their result
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                last = cache.get(last_key)
+                if last is not None:
+                    return last['value']
+            return self._compute_and_store(name, compute, generation)
+        try:
+            return self._compute_and_store(name, compute, generation)
+        finally:
+            self._release(lock_key, token)
+
+    def _compute_and_store(self, name: str, compute: Callable[[], Any], generation: int) -> Any:
+        current_key, last_key, _ = self._keys(name, generation)
+        started = time.perf_counter()
+        try:
+            value = compute()
+        except Exception:
+            self._count(name, 'errors')
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._count(name, 'recomputes')
+        self._count(name, 'recompute_ms_total', elapsed_ms)
+
+        now = time.time()
+        entry = {'value': value, 'computed_at': now, 'fresh_until': now + self.ttl, 'generation': generation}
+        cache.set(current_key, entry, self.ttl)
+        cache.set(last_key, entry, self.stale_ttl)
+        return value
+
+    def _release(self, lock_key: str, token: str):
+        # Only drop the lock if it is still ours (it may have expired and been retaken)
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-key hit, stale hit, miss and recompute time counters of this process"""
+        with self._stats_lock:
+            keys = {}
+            for name, stats in self._stats.items():
+                recomputes = stats['recomputes']
+                keys[name] = {
+                    'hits': stats['hits'],
+                    'stale_hits': stats['stale_hits'],
+                    'misses': stats['misses'],
+                    'recomputes': recomputes,
+                    'errors': stats['errors'],
+                    'avg_recompute_ms': round(stats['recompute_ms_total'] / recomputes, 2) if recomputes else 0.0,
+                    'max_recompute_ms': round(stats['recompute_ms_max'], 2),
+                    'last_recompute_at': stats['last_recompute_at'],
+                }
+        return {
+            'generation': self.generation(),
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'min_refresh': self.min_refresh,
+            'keys': keys,
+        }
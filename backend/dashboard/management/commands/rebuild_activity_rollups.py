@@ -0,0 +1,40 @@
+"""
+Management command to backfill or rebuild the hourly/daily activity rollups
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from dashboard.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute ActivityRollup rows from ActivityLog (all history, or from a start day)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild the last N days')
+        parser.add_argument('--since', help='Only rebuild from this day (YYYY-MM-DD, UTC)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Logs aggregated in memory per rollup write')
+
+    def handle(self, *args, **options):
+        """Replace rollups in the range with aggregates of the logs it covers"""
+        since = None
+        if options['since']:
+            day = parse_date(options['since'])
+            if day is None:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+            since = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+        elif options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        result = rebuild_rollups(since=since, chunk_size=options['chunk_size'])
+        scope = f"since {since:%Y-%m-%d}" if since else 'for all history'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt activity rollups {scope}: {result['logs']} logs, "
+                f"{result['deleted_rows']} rows replaced by {result['written_rows']}"
+            )
+        )
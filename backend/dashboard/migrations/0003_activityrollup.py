@@ -0,0 +1,73 @@
+# Generated by Django 4.2.15 on 2026-10-17 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dashboard", "0002_activitylog_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActivityRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=10
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.DateTimeField(help_text="Start of the hour or day (UTC)"),
+                ),
+                ("category", models.CharField(max_length=50)),
+                ("severity", models.CharField(max_length=20)),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                ("duration_count", models.PositiveBigIntegerField(default=0)),
+                ("duration_sum", models.FloatField(default=0)),
+                ("duration_min", models.FloatField(blank=True, null=True)),
+                ("duration_max", models.FloatField(blank=True, null=True)),
+                (
+                    "user_sketch",
+                    models.BinaryField(
+                        default=bytes,
+                        help_text="HyperLogLog sketch of distinct user ids",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "activity_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="dashboard.activitytype",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "dashboard_activity_rollup",
+                "ordering": ["granularity", "-bucket"],
+                "indexes": [
+                    models.Index(
+                        fields=["granularity", "category", "bucket"],
+                        name="dashboard_rollup_cat_idx",
+                    )
+                ],
+                "unique_together": {
+                    ("granularity", "bucket", "category", "activity_type", "severity")
+                },
+            },
+        ),
+    ]
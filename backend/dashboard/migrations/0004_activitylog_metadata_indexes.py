@@ -0,0 +1,30 @@
+# Generated by Django 4.2.15 on 2026-10-17 14:00
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.fields.json
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dashboard", "0003_activityrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(
+                django.db.models.expressions.F("activity_type"),
+                django.db.models.fields.json.KeyTextTransform("file_format", "metadata"),
+                name="dashboard_log_file_format_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(
+                django.db.models.expressions.F("activity_type"),
+                django.db.models.fields.json.KeyTextTransform("correction_type", "metadata"),
+                name="dashboard_log_corr_type_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.15 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dashboard", "0004_activitylog_metadata_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(fields=["-timestamp", "-id"], name="dashboard_log_ts_id_idx"),
+        ),
+    ]
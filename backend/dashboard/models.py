@@ -4,6 +4,8 @@ Implements soft-coded activity logging with flexible metrics
 """
 import json
 from django.db import models
+from django.db.models import F
+from django.db.models.fields.json import KeyTextTransform
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
@@ -83,8 +85,8 @@ class ActivityLog(models.Model):
     user_agent = models.TextField(blank=True)
     session_key = models.CharField(max_length=40, blank=True)
     
-    # Timing
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Timing; set when the activity happens, buffered writes keep it
+    timestamp = models.DateTimeField(default=timezone.now)
     duration = models.FloatField(null=True, blank=True, help_text="Duration in seconds")
     
     class Meta:
@@ -94,6 +96,13 @@ class ActivityLog(models.Model):
             models.Index(fields=['activity_type', '-timestamp']),
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['-timestamp']),
+            # Keyset pagination order
+            models.Index(fields=['-timestamp', '-id'], name='dashboard_log_ts_id_idx'),
+            # Expression indexes for the metadata keys the analytics group by
+            models.Index(F('activity_type'), KeyTextTransform('file_format', 'metadata'),
+                         name='dashboard_log_file_format_idx'),
+            models.Index(F('activity_type'), KeyTextTransform('correction_type', 'metadata'),
+                         name='dashboard_log_corr_type_idx'),
         ]
     
     def __str__(self):
@@ -101,6 +110,45 @@ class ActivityLog(models.Model):
         return f"{username}: {self.action} ({self.timestamp})"
 
 
+class ActivityRollup(models.Model):
+    """
+    Hourly and daily ActivityLog aggregates, maintained as logs are written
+    """
+    GRANULARITY_HOUR = 'hour'
+    GRANULARITY_DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (GRANULARITY_HOUR, 'Hour'),
+        (GRANULARITY_DAY, 'Day'),
+    ]
+    
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text="Start of the hour or day (UTC)")
+    category = models.CharField(max_length=50)
+    activity_type = models.ForeignKey(ActivityType, on_delete=models.CASCADE, related_name='rollups')
+    severity = models.CharField(max_length=20)
+    
+    # Aggregates; the duration fields only cover logs with a duration
+    count = models.PositiveBigIntegerField(default=0)
+    duration_count = models.PositiveBigIntegerField(default=0)
+    duration_sum = models.FloatField(default=0)
+    duration_min = models.FloatField(null=True, blank=True)
+    duration_max = models.FloatField(null=True, blank=True)
+    user_sketch = models.BinaryField(default=bytes, help_text="HyperLogLog sketch of distinct user ids")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'dashboard_activity_rollup'
+        ordering = ['granularity', '-bucket']
+        unique_together = ['granularity', 'bucket', 'category', 'activity_type', 'severity']
+        indexes = [
+            models.Index(fields=['granularity', 'category', 'bucket'], name='dashboard_rollup_cat_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.category}/{self.severity}: {self.count}"
+
+
 class DashboardMetric(models.Model):
     """
     Soft-coded dashboard metrics for flexible KPI tracking
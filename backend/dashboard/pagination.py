@@ -0,0 +1,193 @@
+"""
+Keyset Pagination for MedixScan
+Cursor pagination over (timestamp, id) for append-only log tables
+
+Pages are selected with a WHERE on the last row seen instead of an OFFSET,
+so with a composite index on the ordering fields every page costs the same
+as the first. Cursors are opaque, signed tokens; a tampered or malformed
+cursor is rejected with a 404 like an out-of-range page number. The total
+COUNT(*) is optional: pass ?count=false (or set KEYSET_PAGINATION_COUNT to
+False for a default of no counting) to skip it on large tables.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_SALT = 'medixscan.keyset-pagination'
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over a unique ordering, newest first by default.
+
+    Subclasses set ordering to the fields of a composite index, ending with
+    a unique field so the position of every row is unambiguous.
+    """
+    ordering: Sequence[str] = ('-timestamp', '-id')
+    page_size: Optional[int] = None
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = self.page_size or getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE') or 20
+        self.include_count = getattr(settings, 'KEYSET_PAGINATION_COUNT', True)
+
+    # Cursor encoding
+
+    def encode_cursor(self, position: List[Any], reverse: bool) -> str:
+        token = signing.dumps({'p': position, 'r': int(reverse)}, salt=CURSOR_SALT, compress=True)
+        return urlsafe_b64encode(token.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request) -> Optional[Tuple[List[Any], bool]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            token = urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode('ascii')
+            payload = signing.loads(token, salt=CURSOR_SALT)
+            position, reverse = payload['p'], bool(payload['r'])
+        except (ValueError, TypeError, KeyError, signing.BadSignature):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    # Queries
+
+    def _fields(self, reverse: bool) -> List[Tuple[str, bool]]:
+        """(field, descending) pairs in the order the rows are read"""
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        return [(name, not descending) for name, descending in fields] if reverse else fields
+
+    def _after(self, fields: List[Tuple[str, bool]], position: List[Any]) -> Q:
+        """Rows strictly after position: (a, b) < (x, y) as a < x OR (a = x AND b < y)"""
+        condition = Q()
+        for index, (name, descending) in enumerate(fields):
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": position[index]})
+            for earlier in range(index):
+                step &= Q(**{fields[earlier][0]: position[earlier]})
+            condition |= step
+        return condition
+
+    def _position(self, row) -> List[Any]:
+        position = []
+        for name in self.ordering:
+            value = getattr(row, name.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def _parse_position(self, queryset, position: List[Any]) -> List[Any]:
+        try:
+            return [
+                queryset.model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_size(self, request) -> int:
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def wants_count(self, request) -> bool:
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return self.include_count
+        return value.lower() not in FALSE_VALUES
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position, reverse = cursor if cursor else (None, False)
+
+        fields = self._fields(reverse)
+        self.count = queryset.count() if self.wants_count(request) else None
+        queryset = queryset.order_by(*[f"-{name}" if descending else name for name, descending in fields])
+        if position is not None:
+            queryset = queryset.filter(self._after(fields, self._parse_position(queryset, position)))
+
+        # One extra row tells whether there is a page beyond this one
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next, self.has_previous = bool(rows), has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return rows
+
+    # Links
+
+    def _link(self, row, reverse: bool) -> str:
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self._position(row), reverse))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data, results_key: str = 'results') -> Dict[str, Any]:
+        paginated = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            paginated['count'] = self.count
+        paginated[results_key] = data
+        return paginated
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class TimestampPagination(KeysetPagination):
+    """Log models ordered by timestamp, newest first"""
+    ordering = ('-timestamp', '-id')
+
+
+class CreatedAtPagination(KeysetPagination):
+    """Models ordered by creation time, newest first"""
+    ordering = ('-created_at', '-id')
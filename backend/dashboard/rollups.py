@@ -0,0 +1,220 @@
+"""
+Activity Rollups for MedixScan dashboard
+Maintains hourly and daily ActivityLog aggregates for the dashboard figures
+
+Each ActivityRollup row holds the count, duration sum/min/max and a
+HyperLogLog sketch of distinct users for one (granularity, bucket, category,
+activity type, severity). The activity sink folds every written batch into
+the rollups in the same transaction, and rebuild_rollups recomputes them
+from ActivityLog (see the rebuild_activity_rollups command). Overview,
+health and trend queries then scan at most one row per bucket and key
+combination, however many logs there are.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .hyperloglog import HyperLogLog
+from .models import ActivityLog, ActivityRollup
+
+GRANULARITIES = (ActivityRollup.GRANULARITY_HOUR, ActivityRollup.GRANULARITY_DAY)
+
+# (granularity, bucket, category, activity_type_id, severity)
+RollupKey = Tuple[str, datetime, str, int, str]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the UTC hour or day containing timestamp"""
+    timestamp = timestamp.astimezone(dt_timezone.utc) if timezone.is_aware(timestamp) else \
+        timestamp.replace(tzinfo=dt_timezone.utc)
+    if granularity == ActivityRollup.GRANULARITY_DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupAccumulator:
+    """
+    Aggregates logs in memory, then merges them into ActivityRollup rows
+    with one locked read-modify-write per touched row
+    """
+
+    def __init__(self):
+        self.rows: Dict[RollupKey, Dict[str, Any]] = {}
+        self.logs = 0
+
+    def add(self, timestamp: datetime, activity_type_id: int, category: str, severity: str,
+            user_id: Optional[int] = None, duration: Optional[float] = None):
+        self.logs += 1
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(timestamp, granularity), category, activity_type_id, severity)
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = {
+                    'count': 0, 'duration_count': 0, 'duration_sum': 0.0,
+                    'duration_min': None, 'duration_max': None, 'users': HyperLogLog(),
+                }
+            row['count'] += 1
+            if duration is not None:
+                row['duration_count'] += 1
+                row['duration_sum'] += duration
+                row['duration_min'] = duration if row['duration_min'] is None else min(row['duration_min'], duration)
+                row['duration_max'] = duration if row['duration_max'] is None else max(row['duration_max'], duration)
+            if user_id is not None:
+                row['users'].add(user_id)
+
+    def save(self) -> int:
+        """Merge into the rollup tables; returns the number of rows touched"""
+        with transaction.atomic():
+            # A fixed lock order keeps concurrent writers from deadlocking
+            for key in sorted(self.rows):
+                _merge_row(key, self.rows[key])
+        touched = len(self.rows)
+        self.rows = {}
+        self.logs = 0
+        return touched
+
+
+def _merge_row(key: RollupKey, delta: Dict[str, Any]):
+    granularity, bucket, category, activity_type_id, severity = key
+    lookup = {
+        'granularity': granularity, 'bucket': bucket, 'category': category,
+        'activity_type_id': activity_type_id, 'severity': severity,
+    }
+    rollup = ActivityRollup.objects.select_for_update().filter(**lookup).first()
+    if rollup is None:
+        try:
+            with transaction.atomic():
+                ActivityRollup.objects.create(
+                    **lookup,
+                    count=delta['count'],
+                    duration_count=delta['duration_count'],
+                    duration_sum=delta['duration_sum'],
+                    duration_min=delta['duration_min'],
+                    duration_max=delta['duration_max'],
+                    user_sketch=delta['users'].to_bytes(),
+                )
+            return
+        except IntegrityError:
+            # Created concurrently by another writer
+            rollup = ActivityRollup.objects.select_for_update().get(**lookup)
+
+    rollup.count += delta['count']
+    rollup.duration_count += delta['duration_count']
+    rollup.duration_sum += delta['duration_sum']
+    for field, pick in (('duration_min', min), ('duration_max', max)):
+        values = [value for value in (getattr(rollup, field), delta[field]) if value is not None]
+        setattr(rollup, field, pick(values) if values else None)
+    users = HyperLogLog.from_bytes(rollup.user_sketch)
+    users.merge(delta['users'])
+    rollup.user_sketch = users.to_bytes()
+    rollup.save(update_fields=['count', 'duration_count', 'duration_sum', 'duration_min',
+                               'duration_max', 'user_sketch', 'updated_at'])
+
+
+def apply_logs(logs: Iterable[ActivityLog], categories: Dict[int, str]) -> int:
+    """Fold newly written logs into the rollups; categories maps activity type id to category"""
+    accumulator = RollupAccumulator()
+    for log in logs:
+        accumulator.add(log.timestamp, log.activity_type_id, categories[log.activity_type_id],
+                        log.severity, log.user_id, log.duration)
+    return accumulator.save()
+
+
+def _rebuild_days(since: Optional[datetime]) -> List[datetime]:
+    """UTC day starts from since onwards that have logs or rollups, in order"""
+    logs = ActivityLog.objects.all()
+    rollups = ActivityRollup.objects.filter(granularity=ActivityRollup.GRANULARITY_DAY)
+    if since is not None:
+        logs = logs.filter(timestamp__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+    days = set(rollups.values_list('bucket', flat=True))
+    days.update(
+        logs.annotate(day=TruncDay('timestamp', tzinfo=dt_timezone.utc)).order_by()
+        .values_list('day', flat=True).distinct()
+    )
+    return sorted(bucket_start(day, ActivityRollup.GRANULARITY_DAY) for day in days)
+
+
+def rebuild_rollups(since: Optional[datetime] = None, chunk_size: int = 5000) -> Dict[str, int]:
+    """
+    Recompute rollups from ActivityLog for every day from since (all history
+    when None). Each UTC day is replaced in its own transaction, so readers
+    see either the old or the new rows of a day and a failed rebuild leaves
+    the remaining days untouched. Logs written while the rebuild runs may be
+    counted twice, so run it while activity logging is quiet.
+    """
+    if since is not None:
+        since = bucket_start(since, ActivityRollup.GRANULARITY_DAY)
+
+    processed = deleted = touched = 0
+    for day in _rebuild_days(since):
+        next_day = day + timedelta(days=1)
+        with transaction.atomic():
+            deleted += ActivityRollup.objects.filter(bucket__gte=day, bucket__lt=next_day).delete()[0]
+            accumulator = RollupAccumulator()
+            rows = ActivityLog.objects.filter(timestamp__gte=day, timestamp__lt=next_day).order_by(
+                'timestamp', 'id'
+            ).values_list('timestamp', 'activity_type_id', 'activity_type__category',
+                          'severity', 'user_id', 'duration')
+            for timestamp, activity_type_id, category, severity, user_id, duration in \
+                    rows.iterator(chunk_size=chunk_size):
+                accumulator.add(timestamp, activity_type_id, category, severity, user_id, duration)
+                processed += 1
+                if accumulator.logs >= chunk_size:
+                    touched += accumulator.save()
+            touched += accumulator.save()
+    return {'logs': processed, 'deleted_rows': deleted, 'written_rows': touched}
+
+
+def rollup_totals(granularity: str, since: Optional[datetime] = None, **filters) -> Dict[str, Any]:
+    """Count and average duration over rollup buckets from since onwards"""
+    queryset = ActivityRollup.objects.filter(granularity=granularity, **filters)
+    if since is not None:
+        queryset = queryset.filter(bucket__gte=bucket_start(since, granularity))
+    totals = queryset.aggregate(count=Sum('count'), duration_count=Sum('duration_count'),
+                                duration_sum=Sum('duration_sum'))
+    duration_count = totals['duration_count'] or 0
+    return {
+        'count': totals['count'] or 0,
+        'avg_duration': totals['duration_sum'] / duration_count if duration_count else 0,
+    }
+
+
+def rollup_windowed_counts(granularity: str, windows: Dict[str, Tuple[Optional[datetime], Optional[datetime]]],
+                           extra: Optional[Dict[str, Q]] = None, **filters) -> Dict[str, int]:
+    """
+    Several counts in one query: each window is a [start, end) bucket range
+    (None for open); each extra entry counts the rows matching a condition
+    within the earliest window start.
+    """
+    conditions = {}
+    for name, (start, end) in windows.items():
+        condition = Q()
+        if start is not None:
+            condition &= Q(bucket__gte=bucket_start(start, granularity))
+        if end is not None:
+            condition &= Q(bucket__lt=bucket_start(end, granularity))
+        conditions[name] = condition
+    conditions.update(extra or {})
+
+    starts = [start for start, _ in windows.values()]
+    queryset = ActivityRollup.objects.filter(granularity=granularity, **filters)
+    if starts and None not in starts:
+        queryset = queryset.filter(bucket__gte=bucket_start(min(starts), granularity))
+    totals = queryset.aggregate(**{name: Sum('count', filter=condition) for name, condition in conditions.items()})
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def rollup_distinct_users(granularity: str, since: Optional[datetime] = None, **filters) -> int:
+    """Estimated distinct users over rollup buckets from since onwards"""
+    queryset = ActivityRollup.objects.filter(granularity=granularity, **filters)
+    if since is not None:
+        queryset = queryset.filter(bucket__gte=bucket_start(since, granularity))
+    users = HyperLogLog()
+    for sketch in queryset.values_list('user_sketch', flat=True).iterator():
+        users.merge(HyperLogLog.from_bytes(sketch))
+    return users.count()
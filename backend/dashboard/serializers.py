@@ -109,6 +109,7 @@ class AnonymizerAnalyticsSerializer(serializers.Serializer):
     """Serializer for anonymizer analytics"""
     total_anonymizations = serializers.IntegerField()
     file_types_processed = serializers.DictField()
+    processing_time_by_file_type = serializers.DictField(required=False)
     average_processing_time = serializers.FloatField()
     recent_activity = serializers.ListField()
     usage_by_day = serializers.DictField()
@@ -119,6 +120,8 @@ class ReportCorrectionAnalyticsSerializer(serializers.Serializer):
     """Serializer for report correction analytics"""
     total_corrections = serializers.IntegerField()
     correction_types = serializers.DictField()
+    processing_time_by_correction_type = serializers.DictField(required=False)
+    average_processing_time = serializers.FloatField(required=False)
     recent_activity = serializers.ListField()
     usage_by_day = serializers.DictField()
     top_users = serializers.ListField()
@@ -6,11 +6,15 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from django.db.models import Count, Avg, Sum, Q, F
+from django.db.models.fields.json import KeyTextTransform
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.core.cache import cache
 
-from .models import ActivityLog, ActivityType, DashboardMetric, UserSession
+from .activity_sink import ActivitySink
+from .analytics_cache import AnalyticsCache
+from .models import ActivityLog, ActivityRollup, ActivityType, DashboardMetric, UserSession
+from .rollups import rollup_distinct_users, rollup_totals, rollup_windowed_counts
+from .timeseries import activity_timeseries, hour_of_day_distribution
 from patients.models import Patient
 from doctors.models import Doctor
 from appointments.models import Appointment
@@ -23,8 +27,9 @@ class DashboardAnalyticsService:
     """
     
     def __init__(self):
-        self.cache_timeout = 300  # 5 minutes default cache
         self.soft_config = self._load_soft_config()
+        self.analytics_cache = AnalyticsCache()
+        self.activity_sink = ActivitySink(on_flush=self._update_related_metrics)
     
     def _load_soft_config(self) -> Dict[str, Any]:
         """Load soft-coded dashboard configuration"""
@@ -74,12 +79,9 @@ class DashboardAnalyticsService:
     
     def get_overview_statistics(self) -> Dict[str, Any]:
         """Get comprehensive dashboard overview"""
-        cache_key = 'dashboard_overview'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
+        return self.analytics_cache.get_or_compute('overview', self._compute_overview_statistics)
+    
+    def _compute_overview_statistics(self) -> Dict[str, Any]:
         now = timezone.now()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         
@@ -94,9 +96,7 @@ class DashboardAnalyticsService:
             'today_appointments': Appointment.objects.filter(
                 created_at__gte=today_start
             ).count(),
-            'today_activities': ActivityLog.objects.filter(
-                timestamp__gte=today_start
-            ).count(),
+            'today_activities': rollup_totals(ActivityRollup.GRANULARITY_DAY, since=today_start)['count'],
             
             # Anonymizer specific
             'anonymizer_usage': self._get_anonymizer_statistics(),
@@ -109,17 +109,15 @@ class DashboardAnalyticsService:
             'trends': self._calculate_trends()
         }
         
-        cache.set(cache_key, stats, self.cache_timeout)
         return stats
     
     def get_activity_statistics(self, time_range: str = 'week') -> Dict[str, Any]:
         """Get activity statistics for specified time range"""
-        cache_key = f'activity_stats_{time_range}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
+        return self.analytics_cache.get_or_compute(
+            f'activity_stats:{time_range}', lambda: self._compute_activity_statistics(time_range)
+        )
+    
+    def _compute_activity_statistics(self, time_range: str) -> Dict[str, Any]:
         start_date = self._get_date_range(time_range)
         
         # Activity by type
@@ -149,35 +147,22 @@ class DashboardAnalyticsService:
             'hourly_distribution': self._get_hourly_activity_distribution(start_date)
         }
         
-        cache.set(cache_key, stats, self.cache_timeout)
         return stats
     
     def get_anonymizer_analytics(self) -> Dict[str, Any]:
         """Get detailed anonymizer usage analytics"""
-        cache_key = 'anonymizer_analytics'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
+        return self.analytics_cache.get_or_compute('anonymizer_analytics', self._compute_anonymizer_analytics)
+    
+    def _compute_anonymizer_analytics(self) -> Dict[str, Any]:
         anonymizer_logs = ActivityLog.objects.filter(
             activity_type__category='anonymizer'
         )
         
-        # Basic metrics
-        total_anonymizations = anonymizer_logs.count()
-        
-        # File type analysis (from metadata)
-        file_types = {}
-        processing_times = []
+        # Basic metrics, from the daily rollups
+        totals = rollup_totals(ActivityRollup.GRANULARITY_DAY, category='anonymizer')
         
-        for log in anonymizer_logs.filter(metadata__isnull=False)[:100]:  # Limit for performance
-            if 'file_format' in log.metadata:
-                format_type = log.metadata['file_format']
-                file_types[format_type] = file_types.get(format_type, 0) + 1
-            
-            if log.duration:
-                processing_times.append(log.duration)
+        # File type analysis over all history, grouped in the database
+        file_types = self._get_metadata_breakdown('anonymizer', 'file_format')
         
         # Recent activity
         recent_activity = anonymizer_logs.order_by('-timestamp')[:10].values(
@@ -185,37 +170,32 @@ class DashboardAnalyticsService:
         )
         
         analytics = {
-            'total_anonymizations': total_anonymizations,
-            'file_types_processed': file_types,
-            'average_processing_time': sum(processing_times) / len(processing_times) if processing_times else 0,
+            'total_anonymizations': totals['count'],
+            'file_types_processed': {value: row['count'] for value, row in file_types.items()},
+            'processing_time_by_file_type': {value: row['avg_duration'] for value, row in file_types.items()},
+            'average_processing_time': totals['avg_duration'],
             'recent_activity': list(recent_activity),
             'usage_by_day': self._get_daily_usage('anonymizer'),
             'top_users': self._get_top_users_for_activity('anonymizer')
         }
         
-        cache.set(cache_key, analytics, self.cache_timeout)
         return analytics
     
     def get_report_correction_analytics(self) -> Dict[str, Any]:
         """Get detailed report correction analytics"""
-        cache_key = 'report_correction_analytics'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
+        return self.analytics_cache.get_or_compute(
+            'report_correction_analytics', self._compute_report_correction_analytics
+        )
+    
+    def _compute_report_correction_analytics(self) -> Dict[str, Any]:
         correction_logs = ActivityLog.objects.filter(
             activity_type__category='report_correction'
         )
         
-        total_corrections = correction_logs.count()
+        totals = rollup_totals(ActivityRollup.GRANULARITY_DAY, category='report_correction')
         
-        # Correction types analysis
-        correction_types = {}
-        for log in correction_logs.filter(metadata__isnull=False)[:100]:
-            if 'correction_type' in log.metadata:
-                correction_type = log.metadata['correction_type']
-                correction_types[correction_type] = correction_types.get(correction_type, 0) + 1
+        # Correction types analysis over all history, grouped in the database
+        correction_types = self._get_metadata_breakdown('report_correction', 'correction_type')
         
         # Recent activity
         recent_activity = correction_logs.order_by('-timestamp')[:10].values(
@@ -223,54 +203,49 @@ class DashboardAnalyticsService:
         )
         
         analytics = {
-            'total_corrections': total_corrections,
-            'correction_types': correction_types,
+            'total_corrections': totals['count'],
+            'correction_types': {value: row['count'] for value, row in correction_types.items()},
+            'processing_time_by_correction_type': {
+                value: row['avg_duration'] for value, row in correction_types.items()
+            },
+            'average_processing_time': totals['avg_duration'],
             'recent_activity': list(recent_activity),
             'usage_by_day': self._get_daily_usage('report_correction'),
             'top_users': self._get_top_users_for_activity('report_correction')
         }
         
-        cache.set(cache_key, analytics, self.cache_timeout)
         return analytics
     
-    def log_activity(self, activity_type: str, action: str, user=None, **kwargs) -> ActivityLog:
-        """Log activity with soft-coded metadata"""
+    def _get_metadata_breakdown(self, category: str, key: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Count and average duration per value of a metadata key, in one
+        GROUP BY over every log of the category. Keys listed in
+        ActivityLog.Meta.indexes are read from their expression index.
+        """
+        type_ids = list(ActivityType.objects.filter(category=category).values_list('id', flat=True))
+        rows = ActivityLog.objects.filter(activity_type_id__in=type_ids).annotate(
+            value=KeyTextTransform(key, 'metadata')
+        ).filter(value__isnull=False).order_by().values('value').annotate(
+            count=Count('id'), avg_duration=Avg('duration')
+        ).order_by('-count', 'value')
+        return {
+            row['value']: {'count': row['count'], 'avg_duration': row['avg_duration'] or 0}
+            for row in rows
+        }
+    
+    def log_activity(self, activity_type: str, action: str, user=None, **kwargs) -> bool:
+        """
+        Log activity with soft-coded metadata.
+
+        The entry is queued on the activity sink and written in a batch by its
+        background thread; returns False if it could not be queued.
+        """
         try:
-            # Get or create activity type
-            activity_type_obj, created = ActivityType.objects.get_or_create(
-                name=activity_type,
-                defaults={
-                    'category': kwargs.get('category', 'system'),
-                    'description': kwargs.get('description', ''),
-                }
-            )
-            
-            # Extract metadata
-            metadata = kwargs.get('metadata', {})
-            
-            # Create activity log
-            log = ActivityLog.objects.create(
-                activity_type=activity_type_obj,
-                user=user,
-                action=action,
-                description=kwargs.get('description', action),
-                severity=kwargs.get('severity', 'info'),
-                metadata=metadata,
-                ip_address=kwargs.get('ip_address'),
-                user_agent=kwargs.get('user_agent'),
-                session_key=kwargs.get('session_key'),
-                duration=kwargs.get('duration')
-            )
-            
-            # Update metrics asynchronously
-            self._update_related_metrics(activity_type, action, metadata)
-            
-            return log
-            
+            return self.activity_sink.record(activity_type, action, user=user, **kwargs)
         except Exception as e:
             # Fail silently to avoid breaking main functionality
             print(f"Activity logging failed: {e}")
-            return None
+            return False
     
     def _get_active_users_count(self) -> int:
         """Get count of currently active users"""
@@ -280,48 +255,47 @@ class DashboardAnalyticsService:
             logout_time__isnull=True
         ).count()
     
+    def _get_category_rollup_statistics(self, category: str) -> Dict[str, Any]:
+        """All-time and today's usage of a category, read from the daily rollups"""
+        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        totals = rollup_totals(ActivityRollup.GRANULARITY_DAY, category=category)
+        return {
+            'total': totals['count'],
+            'today': rollup_totals(ActivityRollup.GRANULARITY_DAY, since=today_start, category=category)['count'],
+            'avg_duration': totals['avg_duration'],
+            'unique_users_today': rollup_distinct_users(ActivityRollup.GRANULARITY_DAY, since=today_start,
+                                                        category=category),
+        }
+    
     def _get_anonymizer_statistics(self) -> Dict[str, Any]:
         """Get anonymizer-specific statistics"""
-        anonymizer_logs = ActivityLog.objects.filter(
-            activity_type__category='anonymizer'
-        )
-        
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
+        stats = self._get_category_rollup_statistics('anonymizer')
         return {
-            'total_usage': anonymizer_logs.count(),
-            'today_usage': anonymizer_logs.filter(timestamp__gte=today_start).count(),
-            'avg_processing_time': anonymizer_logs.exclude(
-                duration__isnull=True
-            ).aggregate(avg=Avg('duration'))['avg'] or 0
+            'total_usage': stats['total'],
+            'today_usage': stats['today'],
+            'avg_processing_time': stats['avg_duration'],
+            'unique_users_today': stats['unique_users_today']
         }
     
     def _get_report_correction_statistics(self) -> Dict[str, Any]:
         """Get report correction statistics"""
-        correction_logs = ActivityLog.objects.filter(
-            activity_type__category='report_correction'
-        )
-        
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
+        stats = self._get_category_rollup_statistics('report_correction')
         return {
-            'total_corrections': correction_logs.count(),
-            'today_corrections': correction_logs.filter(timestamp__gte=today_start).count(),
-            'avg_correction_time': correction_logs.exclude(
-                duration__isnull=True
-            ).aggregate(avg=Avg('duration'))['avg'] or 0
+            'total_corrections': stats['total'],
+            'today_corrections': stats['today'],
+            'avg_correction_time': stats['avg_duration'],
+            'unique_users_today': stats['unique_users_today']
         }
     
     def _calculate_system_health(self) -> Dict[str, Any]:
-        """Calculate system health metrics"""
-        recent_errors = ActivityLog.objects.filter(
-            severity='error',
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        ).count()
-        
-        total_recent_activities = ActivityLog.objects.filter(
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        ).count()
+        """Calculate system health metrics over the last 24 hourly rollups"""
+        counts = rollup_windowed_counts(
+            ActivityRollup.GRANULARITY_HOUR,
+            {'total': (timezone.now() - timedelta(hours=24), None)},
+            extra={'errors': Q(severity='error')}
+        )
+        recent_errors = counts['errors']
+        total_recent_activities = counts['total']
         
         error_rate = (recent_errors / total_recent_activities * 100) if total_recent_activities > 0 else 0
         
@@ -355,14 +329,12 @@ class DashboardAnalyticsService:
         current_week_start = now - timedelta(days=7)
         previous_week_start = now - timedelta(days=14)
         
-        current_week_activities = ActivityLog.objects.filter(
-            timestamp__gte=current_week_start
-        ).count()
-        
-        previous_week_activities = ActivityLog.objects.filter(
-            timestamp__gte=previous_week_start,
-            timestamp__lt=current_week_start
-        ).count()
+        counts = rollup_windowed_counts(ActivityRollup.GRANULARITY_HOUR, {
+            'current': (current_week_start, None),
+            'previous': (previous_week_start, current_week_start),
+        })
+        current_week_activities = counts['current']
+        previous_week_activities = counts['previous']
         
         activity_trend = self._calculate_percentage_change(
             current_week_activities, previous_week_activities
@@ -391,43 +363,13 @@ class DashboardAnalyticsService:
     
     def _get_hourly_activity_distribution(self, start_date: datetime) -> Dict[str, int]:
         """Get activity distribution by hour"""
-        from django.db.models import Extract
-        
-        hourly_data = ActivityLog.objects.filter(
-            timestamp__gte=start_date
-        ).extra(
-            select={'hour': 'EXTRACT(hour FROM timestamp)'}
-        ).values('hour').annotate(
-            count=Count('id')
-        ).order_by('hour')
-        
-        # Initialize all hours with 0
-        distribution = {str(i): 0 for i in range(24)}
-        
-        # Fill in actual data
-        for item in hourly_data:
-            hour = str(int(item['hour']))
-            distribution[hour] = item['count']
-        
-        return distribution
+        return hour_of_day_distribution(start_date)
     
     def _get_daily_usage(self, category: str, days: int = 30) -> Dict[str, int]:
-        """Get daily usage for a category"""
+        """Get daily usage for a category, with zeros for days without activity"""
         start_date = timezone.now() - timedelta(days=days)
-        
-        daily_data = ActivityLog.objects.filter(
-            activity_type__category=category,
-            timestamp__gte=start_date
-        ).extra(
-            select={'date': 'DATE(timestamp)'}
-        ).values('date').annotate(
-            count=Count('id')
-        ).order_by('date')
-        
-        return {
-            str(item['date']): item['count'] 
-            for item in daily_data
-        }
+        series = activity_timeseries(start_date, split_by=None, activity_type__category=category)
+        return dict(zip(series['labels'], series['total']))
     
     def _get_top_users_for_activity(self, category: str, limit: int = 5) -> List[Dict]:
         """Get top users for specific activity category"""
@@ -440,12 +382,9 @@ class DashboardAnalyticsService:
             ).order_by('-count')[:limit]
         )
     
-    def _update_related_metrics(self, activity_type: str, action: str, metadata: Dict):
-        """Update dashboard metrics based on activity"""
-        # This would be implemented to update real-time metrics
-        # For now, we'll just cache clear to trigger recalculation
-        cache.delete_pattern('dashboard_*')
-        cache.delete_pattern('activity_stats_*')
+    def _update_related_metrics(self, written: int):
+        """Mark cached statistics stale after a batch of activity logs is written"""
+        self.analytics_cache.bump_generation()
     
     def _calculate_percentage_change(self, current: int, previous: int) -> float:
         """Calculate percentage change between two values"""
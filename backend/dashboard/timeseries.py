@@ -0,0 +1,148 @@
+"""
+Activity Time Series for MedixScan dashboard
+Hourly/daily ActivityLog counts for charts, one GROUP BY query per series set
+
+Buckets are computed in the database with TruncHour/TruncDay (or ExtractHour
+for hour-of-day distributions), optionally in a named time zone, so the
+queries run on SQLite and PostgreSQL alike. When the split values are known
+up front (e.g. the activity categories) every series is a conditional
+Count(filter=Q(...)) column of the same query; otherwise the query also
+groups by the split field. Missing buckets are filled with zeros.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone, tzinfo
+from typing import Any, Dict, List, Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import ActivityLog, ActivityType
+
+GRANULARITY_HOUR = 'hour'
+GRANULARITY_DAY = 'day'
+TRUNC_FUNCTIONS = {GRANULARITY_HOUR: TruncHour, GRANULARITY_DAY: TruncDay}
+
+# Split fields, with their known values where conditional aggregation applies
+SPLIT_FIELDS = {
+    'category': 'activity_type__category',
+    'activity_type': 'activity_type__name',
+    'severity': 'severity',
+    'action': 'action',
+}
+KNOWN_VALUES = {
+    'category': [value for value, _ in ActivityType.CATEGORY_CHOICES],
+    'severity': [value for value, _ in ActivityLog.SEVERITY_CHOICES],
+}
+
+
+def resolve_timezone(name: Optional[str]) -> tzinfo:
+    """Time zone by IANA name; UTC when no name is given. Raises ValueError for unknown names"""
+    if not name:
+        return dt_timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+
+def _bucket_key(value: datetime, granularity: str, tz: tzinfo):
+    """Comparable key of a bucket: local date for days, UTC instant for hours"""
+    if granularity == GRANULARITY_DAY:
+        return value.astimezone(tz).date() if isinstance(value, datetime) else value
+    return value.astimezone(dt_timezone.utc)
+
+
+def bucket_range(start: datetime, end: datetime, granularity: str, tz: tzinfo) -> List[Any]:
+    """Every bucket key from the one containing start to the one containing end"""
+    if granularity == GRANULARITY_DAY:
+        first, last = start.astimezone(tz).date(), end.astimezone(tz).date()
+        return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+    # Local hour starts, stepped in UTC so DST changes neither skip nor repeat buckets
+    current = start.astimezone(tz).replace(minute=0, second=0, microsecond=0).astimezone(dt_timezone.utc)
+    last = end.astimezone(dt_timezone.utc)
+    buckets = []
+    while current <= last:
+        buckets.append(current)
+        current += timedelta(hours=1)
+    return buckets
+
+
+def _label(key, tz: tzinfo) -> str:
+    if isinstance(key, date) and not isinstance(key, datetime):
+        return key.isoformat()
+    return key.astimezone(tz).isoformat(timespec='minutes')
+
+
+def activity_timeseries(start: datetime, end: Optional[datetime] = None, granularity: str = GRANULARITY_DAY,
+                        split_by: Optional[str] = 'category', values: Optional[Sequence[str]] = None,
+                        tz: Optional[tzinfo] = None, **filters) -> Dict[str, Any]:
+    """
+    ActivityLog counts per bucket between start and end, one series per
+    split value plus the total, from a single query.
+
+    values fixes the series (defaults to the known values of the split
+    field); without any, the series are the values found in the window.
+    filters are extra ActivityLog lookups, e.g. activity_type__category.
+    """
+    if granularity not in TRUNC_FUNCTIONS:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    tz = tz or dt_timezone.utc
+    end = end or timezone.now()
+    split_field = SPLIT_FIELDS[split_by] if split_by else None
+    if split_by and values is None:
+        values = KNOWN_VALUES.get(split_by)
+
+    queryset = ActivityLog.objects.filter(timestamp__gte=start, timestamp__lte=end, **filters).annotate(
+        bucket=TRUNC_FUNCTIONS[granularity]('timestamp', tzinfo=tz)
+    ).order_by()
+    keys = bucket_range(start, end, granularity, tz)
+    positions = {key: index for index, key in enumerate(keys)}
+    total = [0] * len(keys)
+    series: Dict[str, List[int]] = {value: [0] * len(keys) for value in values or []}
+
+    if split_field and values is not None:
+        aggregates = {f"s{index}": Count('id', filter=Q(**{split_field: value})) for index, value in enumerate(values)}
+        rows = queryset.values('bucket').annotate(total=Count('id'), **aggregates)
+        for row in rows:
+            position = positions.get(_bucket_key(row['bucket'], granularity, tz))
+            if position is None:
+                continue
+            total[position] += row['total']
+            for index, value in enumerate(values):
+                series[value][position] += row[f"s{index}"]
+    else:
+        group = ['bucket', split_field] if split_field else ['bucket']
+        for row in queryset.values(*group).annotate(count=Count('id')):
+            position = positions.get(_bucket_key(row['bucket'], granularity, tz))
+            if position is None:
+                continue
+            total[position] += row['count']
+            if split_field:
+                series.setdefault(str(row[split_field]), [0] * len(keys))[position] += row['count']
+
+    return {
+        'granularity': granularity,
+        'timezone': str(tz),
+        'labels': [_label(key, tz) for key in keys],
+        'series': series,
+        'total': total,
+    }
+
+
+def hour_of_day_distribution(start: datetime, end: Optional[datetime] = None, tz: Optional[tzinfo] = None,
+                             **filters) -> Dict[str, int]:
+    """ActivityLog counts per hour of the day ('0'..'23') in tz, from a single query"""
+    tz = tz or dt_timezone.utc
+    queryset = ActivityLog.objects.filter(timestamp__gte=start, **filters)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lte=end)
+    rows = queryset.annotate(hour=ExtractHour('timestamp', tzinfo=tz)).order_by().values('hour').annotate(
+        count=Count('id')
+    )
+
+    distribution = {str(hour): 0 for hour in range(24)}
+    for row in rows:
+        distribution[str(int(row['hour']))] += row['count']
+    return distribution
@@ -20,6 +20,8 @@ dashboard_patterns = [
     path('doctor-stats/', DashboardViewSet.as_view({'get': 'get_doctor_stats'}), name='dashboard-doctor-stats'),
     path('recent-activities/', DashboardViewSet.as_view({'get': 'get_recent_activities'}), name='dashboard-recent-activities'),
     path('chart-data/', DashboardViewSet.as_view({'get': 'get_chart_data'}), name='dashboard-chart-data'),
+    path('cache-stats/', DashboardViewSet.as_view({'get': 'get_cache_stats'}), name='dashboard-cache-stats'),
+    path('activity-sink/', DashboardViewSet.as_view({'get': 'get_activity_sink_stats'}), name='dashboard-activity-sink'),
 ]
 
 urlpatterns = [
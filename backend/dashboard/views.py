@@ -6,13 +6,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils import timezone
 from django.core.cache import cache
 from datetime import datetime, timedelta
 
 from .models import ActivityLog, ActivityType, DashboardMetric, UserSession
+from .pagination import TimestampPagination
 from .services import dashboard_service
+from .timeseries import GRANULARITY_DAY, GRANULARITY_HOUR, activity_timeseries, resolve_timezone
 from .serializers import (
     ActivityLogSerializer, ActivityTypeSerializer, DashboardMetricSerializer,
     UserSessionSerializer, DashboardOverviewSerializer, ActivityStatisticsSerializer,
@@ -20,6 +21,18 @@ from .serializers import (
     ChartDataSerializer, DashboardConfigSerializer
 )
 
+# Longest chart window per bucket size
+CHART_MAX_DAYS = {GRANULARITY_DAY: 366, GRANULARITY_HOUR: 31}
+SERIES_COLORS = [
+    'rgba(54, 162, 235, 0.8)',
+    'rgba(255, 99, 132, 0.8)',
+    'rgba(255, 205, 86, 0.8)',
+    'rgba(75, 192, 192, 0.8)',
+    'rgba(153, 102, 255, 0.8)',
+    'rgba(255, 159, 64, 0.8)',
+    'rgba(201, 203, 207, 0.8)',
+]
+
 
 class DashboardViewSet(viewsets.ViewSet):
     """
@@ -27,7 +40,6 @@ class DashboardViewSet(viewsets.ViewSet):
     """
     permission_classes = [IsAuthenticated]
     
-    @method_decorator(cache_page(60 * 5))  # Cache for 5 minutes
     @action(detail=False, methods=['get'], url_path='overview')
     def get_overview(self, request):
         """Get dashboard overview statistics"""
@@ -165,22 +177,53 @@ class DashboardViewSet(viewsets.ViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'], url_path='activity-sink')
+    def get_activity_sink_stats(self, request):
+        """Get queue depth and dropped/written counters of the activity log writer"""
+        return Response({
+            'success': True,
+            'data': dashboard_service.activity_sink.stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def get_cache_stats(self, request):
+        """Get hit/miss/recompute counters of the dashboard analytics cache"""
+        return Response({
+            'success': True,
+            'data': dashboard_service.analytics_cache.stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    
     @action(detail=False, methods=['get'], url_path='chart-data')
     def get_chart_data(self, request):
         """Get chart data for dashboard widgets"""
         try:
             chart_type = request.query_params.get('type', 'overview')
             
+            if chart_type in ('activities', 'anonymizer_usage', 'report_correction_usage'):
+                try:
+                    window = self._get_chart_window(request)
+                except ValueError as e:
+                    return Response({
+                        'success': False,
+                        'error': str(e)
+                    }, status=status.HTTP_400_BAD_REQUEST)
+            
             if chart_type == 'appointments':
                 data = self._generate_appointment_chart_data()
             elif chart_type == 'patients':
                 data = self._generate_patient_chart_data()
             elif chart_type == 'activities':
-                data = self._generate_activity_chart_data()
+                data = self._generate_activity_chart_data(**window)
             elif chart_type == 'anonymizer':
                 data = self._generate_anonymizer_chart_data()
             elif chart_type == 'report_corrections':
                 data = self._generate_report_correction_chart_data()
+            elif chart_type == 'anonymizer_usage':
+                data = self._generate_usage_chart_data('anonymizer', 'Anonymizer Usage', **window)
+            elif chart_type == 'report_correction_usage':
+                data = self._generate_usage_chart_data('report_correction', 'Report Corrections', **window)
             else:
                 data = self._generate_overview_chart_data()
             
@@ -255,37 +298,78 @@ class DashboardViewSet(viewsets.ViewSet):
             }
         }
     
-    def _generate_activity_chart_data(self):
-        """Generate activity timeline chart data"""
-        activities_data = dashboard_service.get_activity_statistics('week')
-        
-        labels = []
-        data = []
+    def _get_chart_window(self, request):
+        """Time-series window from ?days=, ?granularity=day|hour and ?tz= (IANA name)"""
+        granularity = request.query_params.get('granularity', GRANULARITY_DAY)
+        if granularity not in (GRANULARITY_DAY, GRANULARITY_HOUR):
+            raise ValueError("granularity must be 'day' or 'hour'")
+        default_days = 1 if granularity == GRANULARITY_HOUR else 7
+        try:
+            days = int(request.query_params.get('days', default_days))
+        except ValueError:
+            raise ValueError('days must be an integer')
+        if not 1 <= days <= CHART_MAX_DAYS[granularity]:
+            raise ValueError(f"days must be between 1 and {CHART_MAX_DAYS[granularity]} for {granularity} buckets")
         
-        # Generate last 7 days
-        for i in range(6, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            labels.append(date)
-            # Use real data if available, otherwise mock
-            count = activities_data.get('usage_by_day', {}).get(date, 5 + (i % 4))
-            data.append(count)
+        tz = resolve_timezone(request.query_params.get('tz'))
+        now = timezone.now()
+        # Whole buckets: the window starts at the first bucket's boundary
+        local_now = now.astimezone(tz)
+        if granularity == GRANULARITY_DAY:
+            start = (local_now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            start = (local_now - timedelta(hours=days * 24 - 1)).replace(minute=0, second=0, microsecond=0)
+        return {'start': start, 'end': now, 'granularity': granularity, 'tz': tz}
+    
+    def _timeseries_datasets(self, series, labels=None):
+        """Chart datasets for the non-empty series, or a single empty one"""
+        labels = labels or {}
+        datasets = [
+            {
+                'label': labels.get(name, name),
+                'data': data,
+                'backgroundColor': SERIES_COLORS[index % len(SERIES_COLORS)],
+                'borderColor': SERIES_COLORS[index % len(SERIES_COLORS)],
+                'borderWidth': 1
+            }
+            for index, (name, data) in enumerate(item for item in series['series'].items() if any(item[1]))
+        ]
+        return datasets or [{'label': 'Activities', 'data': series['total'], 'backgroundColor': SERIES_COLORS[0]}]
+    
+    def _generate_activity_chart_data(self, start, end, granularity, tz):
+        """Generate activity timeline chart data, one series per category"""
+        series = activity_timeseries(start, end, granularity=granularity, split_by='category', tz=tz)
         
         return {
             'chart_type': 'bar',
             'title': 'System Activity',
-            'labels': labels,
-            'datasets': [{
-                'label': 'Activities',
-                'data': data,
-                'backgroundColor': 'rgba(54, 162, 235, 0.8)',
-                'borderColor': 'rgba(54, 162, 235, 1)',
-                'borderWidth': 1
-            }],
+            'labels': series['labels'],
+            'datasets': self._timeseries_datasets(series, dict(ActivityType.CATEGORY_CHOICES)),
+            'options': {
+                'responsive': True,
+                'scales': {'x': {'stacked': True}, 'y': {'stacked': True}},
+                'plugins': {
+                    'legend': {'position': 'top'},
+                    'title': {'display': True, 'text': 'Activity Overview'}
+                }
+            }
+        }
+    
+    def _generate_usage_chart_data(self, category, title, start, end, granularity, tz):
+        """Generate usage over time for one category, one series per activity type"""
+        series = activity_timeseries(start, end, granularity=granularity, split_by='activity_type', tz=tz,
+                                     activity_type__category=category)
+        
+        return {
+            'chart_type': 'line',
+            'title': title,
+            'labels': series['labels'],
+            'datasets': self._timeseries_datasets(series),
             'options': {
                 'responsive': True,
                 'plugins': {
                     'legend': {'position': 'top'},
-                    'title': {'display': True, 'text': 'Weekly Activity Overview'}
+                    'title': {'display': True, 'text': f"{title} ({'hourly' if granularity == GRANULARITY_HOUR else 'daily'})"}
                 }
             }
         }
@@ -374,9 +458,10 @@ class DashboardViewSet(viewsets.ViewSet):
 
 class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     """Activity log management endpoints"""
-    queryset = ActivityLog.objects.select_related('activity_type', 'user').order_by('-timestamp')
+    queryset = ActivityLog.objects.select_related('activity_type', 'user').order_by('-timestamp', '-id')
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimestampPagination
     
     def get_queryset(self):
         """Filter activities based on query parameters"""
@@ -3,7 +3,12 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import APIException
+from rest_framework.views import APIView
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from .services.medical_correction_service import get_medical_correction_service
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,6 +41,17 @@ def test_correction_api(request):
             'message': 'Medical correction API failed'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def model_registry_stats(request):
+    """Load time, memory footprint and usage of the process's models, plus batching queue stats"""
+    from .services.model_registry import get_model_registry
+    from .services.report_pipeline import get_grammar_batcher
+    return Response({
+        **get_model_registry().stats(),
+        'batchers': {'grammar': get_grammar_batcher().stats()},
+    }, status=status.HTTP_200_OK)
+
 def get_correction_service_or_error():
     """
     Get medical correction service with soft coding error handling
@@ -104,6 +120,215 @@ def analyze_report_with_ai(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([])  # Same access as analyze_report_with_ai
+def analyze_report_incremental(request):
+    """
+    Re-analyze an edited report, reusing a previous analysis
+    
+    Expects the new 'report_text' (or 'text') and 'previous_cache_key', the
+    analysis.metadata.cache_key of an earlier response. Only the edited
+    sentences are re-analyzed; without a usable previous analysis a full
+    analysis is returned (analysis.metadata.incremental is then False).
+    """
+    try:
+        report_text = request.data.get('report_text', '') or request.data.get('text', '')
+        previous_cache_key = request.data.get('previous_cache_key', '')
+        openai_api_key = request.data.get('openai_api_key', '')
+        model_name = request.data.get('model_name', 'gpt-3.5-turbo')
+        
+        if not report_text or not report_text.strip():
+            return Response(
+                {'error': 'Report text is required. Please provide either "report_text" or "text" parameter.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        correction_service, service_error = get_correction_service_or_error()
+        if service_error:
+            return service_error
+        
+        analysis_result = correction_service.analyze_medical_report_incremental(
+            report_text,
+            previous_cache_key,
+            openai_api_key=openai_api_key if openai_api_key else None,
+            model_name=model_name
+        )
+        
+        if analysis_result.get('status') == 'error':
+            return Response(
+                {'error': f'Analysis failed: {analysis_result.get("message", "Unknown error")}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'success': True,
+            'original_text': analysis_result.get('original_text', report_text),
+            'corrected_text': analysis_result.get('corrected_text', report_text),
+            'analysis': analysis_result,
+            'service_type': 'medical_correction_service',
+            'ai_enhanced': analysis_result.get('metadata', {}).get('ai_enhanced', False),
+            'incremental': analysis_result.get('metadata', {}).get('incremental', False)
+        }, status=status.HTTP_200_OK)
+    
+    except Exception as e:
+        logger.error(f"Error in analyze_report_incremental: {e}")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+def _format_stream_event(event, sse):
+    """One NDJSON line, or one Server-Sent Events message named after the event"""
+    payload = json.dumps(event, separators=(',', ':'), default=str)
+    if sse:
+        return f"event: {event.get('event', 'message')}\ndata: {payload}\n\n"
+    return payload + '\n'
+
+@api_view(['POST'])
+@permission_classes([])  # Same access as analyze_report_with_ai
+def analyze_report_stream(request):
+    """
+    Streaming variant of analyze_report_with_ai
+    
+    Emits each rule-based detector's corrections as soon as it finishes, then
+    the LLM-enhanced corrections (if AI is available) and finally a 'complete'
+    event with the corrected text, summary and metadata. The body is NDJSON,
+    or Server-Sent Events when the client sends Accept: text/event-stream or
+    ?stream=sse.
+    """
+    report_text = request.data.get('report_text', '') or request.data.get('text', '')
+    openai_api_key = request.data.get('openai_api_key', '')
+    model_name = request.data.get('model_name', 'gpt-3.5-turbo')
+    
+    if not report_text or not report_text.strip():
+        return Response(
+            {'error': 'Report text is required. Please provide either "report_text" or "text" parameter.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    correction_service, service_error = get_correction_service_or_error()
+    if service_error:
+        return service_error
+    
+    sse = (request.query_params.get('stream') == 'sse'
+           or 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''))
+    
+    def events():
+        try:
+            for event in correction_service.stream_medical_report_analysis(
+                report_text,
+                openai_api_key=openai_api_key if openai_api_key else None,
+                model_name=model_name
+            ):
+                yield _format_stream_event(event, sse)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"Error in analyze_report_stream: {e}")
+            yield _format_stream_event({'event': 'error', 'error': str(e)}, sse)
+    
+    response = StreamingHttpResponse(
+        events(), content_type='text/event-stream' if sse else 'application/x-ndjson'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class _AsyncAnalysisAccess(APIView):
+    """DRF authentication, permission and throttle checks for the plain async view"""
+    permission_classes = [IsAuthenticated]
+
+
+def _check_async_access(request):
+    """
+    Run DRF's authentication, permission and throttle checks on a plain
+    Django request; returns an error JsonResponse, or None if allowed
+    """
+    view = _AsyncAnalysisAccess()
+    view.args, view.kwargs, view.headers = (), {}, {}
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    try:
+        view.initial(drf_request)
+    except APIException as exc:
+        response = view.handle_exception(exc)
+        error = JsonResponse(response.data, status=response.status_code)
+        for header in ('WWW-Authenticate', 'Retry-After'):
+            if response.has_header(header):
+                error[header] = response[header]
+        return error
+    # Later code sees the authenticated user, as in a DRF view
+    request.user = drf_request.user
+    return None
+
+async def analyze_report_async(request):
+    """
+    Async variant of analyze_report_with_ai for ASGI deployments
+    
+    Report sections are enhanced by the LLM concurrently with per-section
+    timeouts, so a slow upstream does not hold a worker thread. Sections that
+    time out keep their rule-based corrections (see metadata.ai_sections_failed).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    # Every request can trigger billed LLM calls, so authenticate and throttle
+    # exactly like the DRF endpoints
+    denied = await sync_to_async(_check_async_access)(request)
+    if denied is not None:
+        return denied
+    
+    try:
+        try:
+            data = json.loads(request.body or b'{}')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({'error': 'Request body must be valid JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Accept both 'report_text' and 'text' parameter names for flexibility
+        report_text = data.get('report_text', '') or data.get('text', '')
+        openai_api_key = data.get('openai_api_key', '')
+        model_name = data.get('model_name', 'gpt-3.5-turbo')
+        
+        if not report_text or not report_text.strip():
+            return JsonResponse(
+                {'error': 'Report text is required. Please provide either "report_text" or "text" parameter.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        correction_service = await sync_to_async(get_medical_correction_service, thread_sensitive=False)()
+        if correction_service is None:
+            return JsonResponse(
+                {
+                    'error': 'Medical Correction Service not available',
+                    'message': 'Medical text correction services are currently unavailable. Please check configuration.',
+                    'code': 'CORRECTION_SERVICE_UNAVAILABLE'
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        analysis_result = await correction_service.analyze_medical_report_async(
+            report_text,
+            openai_api_key=openai_api_key if openai_api_key else None,
+            model_name=model_name
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'original_text': analysis_result.get('original_text', report_text),
+            'corrected_text': analysis_result.get('corrected_text', report_text),
+            'analysis': analysis_result,
+            'service_type': 'medical_correction_service',
+            'ai_enhanced': analysis_result.get('metadata', {}).get('ai_enhanced', False)
+        }, status=status.HTTP_200_OK)
+    
+    except Exception as e:
+        logger.error(f"Error in analyze_report_async: {e}")
+        return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# DRF's SessionAuthentication enforces CSRF itself (as in every DRF view), and
+# csrf_exempt() is not async-aware in Django 4.2
+analyze_report_async.csrf_exempt = True
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def anonymize_text(request):
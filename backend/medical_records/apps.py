@@ -1,5 +1,19 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
 
 class MedicalRecordsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'medical_records'
\ No newline at end of file
+    name = 'medical_records'
+
+    def ready(self):
+        # Load configured models at worker boot instead of on the first request
+        warmup = getattr(settings, 'MODEL_WARMUP', [])
+        if warmup:
+            from .services import report_pipeline  # registers the pipeline models
+            from .services.model_registry import model_registry
+            logger.info(f"Model warm-up: {model_registry.warm_up(warmup)}")
@@ -4,12 +4,17 @@ Handles file uploads, processing, and anonymization
 """
 
 import os
+import re
 import uuid
 import logging
 from typing import Dict, List, Optional, Tuple
 from django.core.files.storage import default_storage
 from django.conf import settings
 
+from .services.name_gazetteer import load_gazetteer
+from .services.phi_config import get_gazetteer_path
+from .services.span_edits import SpanEdit, apply_span_edits
+
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +33,29 @@ class FileProcessingService:
             'email': [r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'],
             'dates': [r'\b\d{1,2}/\d{1,2}/\d{4}\b', r'\b\d{4}-\d{2}-\d{2}\b'],
         }
+        # Candidates a pattern type only redacts when the filter accepts them
+        self.match_filters = {
+            'names': self._is_probable_name,
+        }
+
+    def _is_probable_name(self, candidate: str) -> bool:
+        """Name gazetteer check; without a gazetteer every candidate counts"""
+        gazetteer = load_gazetteer(get_gazetteer_path())
+        return gazetteer is None or gazetteer.is_name(candidate)
+
+    def _iter_matches(self, pattern: str, text: str, keep=None):
+        """Matches of pattern; after a rejected candidate the search resumes one character later"""
+        compiled = re.compile(pattern)
+        position = 0
+        while True:
+            match = compiled.search(text, position)
+            if match is None:
+                return
+            if keep is None or keep(match.group(0)):
+                yield match
+                position = max(match.end(), match.start() + 1)
+            else:
+                position = match.start() + 1
 
     def validate_file(self, file) -> Tuple[bool, str]:
         """
@@ -128,11 +156,6 @@ class FileProcessingService:
         Returns dict with anonymized text and anonymization report
         """
         try:
-            import re
-
-            anonymized_text = text
-            anonymizations = []
-
             level_patterns = {
                 'basic': ['names', 'ssn'],
                 'standard': ['names', 'ssn', 'phone', 'email'],
@@ -141,18 +164,28 @@ class FileProcessingService:
 
             patterns_to_use = level_patterns.get(anonymization_level, ['names', 'ssn'])
 
-            for pattern_type in patterns_to_use:
+            # Match every pattern against the original text and rewrite once;
+            # on overlap the earlier pattern type in the level wins
+            edits = []
+            for rank, pattern_type in enumerate(patterns_to_use):
                 if pattern_type in self.anonymization_patterns:
+                    replacement = f"[{pattern_type.upper()}_REDACTED]"
+                    keep = self.match_filters.get(pattern_type)
                     for pattern in self.anonymization_patterns[pattern_type]:
-                        matches = re.findall(pattern, anonymized_text)
-                        for match in matches:
-                            replacement = f"[{pattern_type.upper()}_REDACTED]"
-                            anonymized_text = anonymized_text.replace(match, replacement)
-                            anonymizations.append({
-                                'type': pattern_type,
-                                'original': match,
-                                'replacement': replacement
-                            })
+                        for match in self._iter_matches(pattern, text, keep):
+                            edits.append(SpanEdit(match.start(), match.end(), replacement,
+                                                  -rank, payload=pattern_type))
+
+            result = apply_span_edits(text, edits)
+            anonymized_text = result.text
+            anonymizations = [
+                {
+                    'type': edit.payload,
+                    'original': text[edit.start:edit.end],
+                    'replacement': edit.replacement
+                }
+                for edit in result.applied
+            ]
 
             return {
                 'success': True,
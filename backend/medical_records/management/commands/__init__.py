@@ -0,0 +1 @@
+"""Management commands for medical_records"""
@@ -0,0 +1,34 @@
+"""
+Management command to build the medical terminology knowledge base
+"""
+from django.core.management.base import BaseCommand
+
+from medical_records.services.rag_medical_service import MedicalKnowledgeBase
+
+
+class Command(BaseCommand):
+    help = 'Build the versioned medical terminology knowledge base (SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild even if the existing database is already current',
+        )
+
+    def handle(self, *args, **options):
+        """Write the knowledge base once and stamp its schema and content version"""
+        knowledge_base = MedicalKnowledgeBase(auto_build=False)
+
+        if knowledge_base.build(force=options['force']):
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Built medical knowledge base {knowledge_base.version} at {knowledge_base.db_path}'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Medical knowledge base is already current ({knowledge_base.version})'
+                )
+            )
@@ -0,0 +1,32 @@
+"""
+Management command to build the name gazetteer used by PHI name detection
+"""
+from django.core.management.base import BaseCommand
+
+from medical_records.services.phi_config import build_name_gazetteer, gazetteer_path
+
+
+class Command(BaseCommand):
+    help = 'Build the first-name/surname Bloom filters and medical stoplist used to confirm PHI name matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild even if the existing gazetteer is already current',
+        )
+
+    def handle(self, *args, **options):
+        """Write the gazetteer file once and stamp it with a checksum of its sources"""
+        gazetteer = build_name_gazetteer(force=options['force'])
+
+        if gazetteer is not None:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Built name gazetteer at {gazetteer_path()}: {gazetteer.meta['first_names']} first names, "
+                    f"{gazetteer.meta['surnames']} surnames, {len(gazetteer.stoplist)} medical stopwords, "
+                    f"{gazetteer.first_names.nbytes + gazetteer.surnames.nbytes} filter bytes"
+                )
+            )
+        else:
+            self.stdout.write(self.style.WARNING(f'Name gazetteer is already current ({gazetteer_path()})'))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.15 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("medical_records", "0004_anonymizationrequest_anonymizationconfiguration_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportcorrectionrequest",
+            name="progress",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reportcorrectionrequest",
+            name="error_message",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.15 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("medical_records", "0006_anonymizationbatchjob_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reportcorrectionrequest",
+            index=models.Index(fields=["-created_at", "-id"], name="correction_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="anonymizationauditlog",
+            index=models.Index(fields=["-timestamp", "-id"], name="anon_audit_ts_id_idx"),
+        ),
+    ]
@@ -21,22 +21,39 @@ class MedicalRecord(models.Model):
         ordering = ['-created_at']
 
 
+def generate_correction_request_id():
+    # The full uuid4, so ids of other users' requests cannot be guessed
+    import uuid
+    return f"CRR-{uuid.uuid4().hex.upper()}"
+
+
 class ReportCorrectionRequest(models.Model):
     """Model for storing report correction requests"""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_PROCESSED = 'completed'
+    STATUS_FAILED = 'failed'
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
+        ('failed', 'Failed'),
         ('rejected', 'Rejected'),
     ]
 
-    request_id = models.CharField(max_length=100, unique=True)
+    request_id = models.CharField(max_length=100, unique=True, default=generate_correction_request_id)
     medical_record = models.ForeignKey(MedicalRecord, on_delete=models.CASCADE, null=True, blank=True)
     medical_record_id_fallback = models.CharField(max_length=100, null=True, blank=True)
     original_text = models.TextField()
     corrected_text = models.TextField(blank=True)
     notes = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Background job progress (0-100) and outcome
+    progress = models.PositiveSmallIntegerField(default=0)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
     requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,6 +63,9 @@ class ReportCorrectionRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='correction_created_id_idx'),
+        ]
 
 
 class ReportCorrectionVersion(models.Model):
@@ -65,6 +85,54 @@ class ReportCorrectionVersion(models.Model):
         unique_together = ['correction_request', 'version_number']
 
 
+def generate_anonymization_request_id():
+    # The full uuid4: batch exports bulk_create many thousands of these at once
+    import uuid
+    return f"ANR-{uuid.uuid4().hex.upper()}"
+
+
+def generate_anonymization_batch_id():
+    # The full uuid4, so ids of other users' jobs cannot be guessed
+    import uuid
+    return f"ANB-{uuid.uuid4().hex.upper()}"
+
+
+class AnonymizationBatchJob(models.Model):
+    """Batch anonymization of many texts or medical records, processed in the background"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.CharField(max_length=100, unique=True, default=generate_anonymization_batch_id)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Inputs: {'texts': [...], 'record_ids': [...], 'options': {...}}
+    payload = models.JSONField(default=dict)
+    total_items = models.PositiveIntegerField(default=0)
+    processed_items = models.PositiveIntegerField(default=0)
+    failed_items = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Anonymization Batch {self.job_id}"
+
+    @property
+    def progress(self):
+        if not self.total_items:
+            return 100 if self.status == 'completed' else 0
+        return int(self.processed_items * 100 / self.total_items)
+
+    class Meta:
+        ordering = ['-created_at']
+
+
 class AnonymizationRequest(models.Model):
     """Model for storing anonymization requests"""
     STATUS_CHOICES = [
@@ -74,11 +142,32 @@ class AnonymizationRequest(models.Model):
         ('failed', 'Failed'),
     ]
 
-    request_id = models.CharField(max_length=100, unique=True)
-    file_name = models.CharField(max_length=255)
+    request_id = models.CharField(max_length=100, unique=True, default=generate_anonymization_request_id)
+    file_name = models.CharField(max_length=255, blank=True, default='')
     file_path = models.CharField(max_length=500, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     anonymization_level = models.CharField(max_length=50, default='standard')
+    # Text anonymization inputs and results (schema from migration 0004)
+    medical_record = models.ForeignKey(MedicalRecord, on_delete=models.CASCADE, null=True, blank=True,
+                                       related_name='anonymization_requests')
+    batch_job = models.ForeignKey(AnonymizationBatchJob, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='requests')
+    original_text = models.TextField(blank=True)
+    sensitivity_level = models.CharField(max_length=10, default='medium')
+    compliance_framework = models.CharField(max_length=10, default='HIPAA')
+    anonymization_strategy = models.CharField(max_length=20, default='REPLACEMENT')
+    anonymized_text = models.TextField(blank=True)
+    detections_json = models.JSONField(default=dict)
+    summary_json = models.JSONField(default=dict)
+    insights_json = models.JSONField(default=dict)
+    risk_level = models.CharField(max_length=10, blank=True)
+    compliance_score = models.FloatField(null=True, blank=True)
+    detections_count = models.IntegerField(default=0)
+    processing_time_ms = models.IntegerField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.TextField(blank=True)
     requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -103,19 +192,27 @@ class AnonymizationAuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='anon_audit_ts_id_idx'),
+        ]
 
 
 class AnonymizationConfiguration(models.Model):
     """Model for storing anonymization configuration settings"""
-    name = models.CharField(max_length=100, unique=True)
-    config_settings = models.JSONField(default=dict)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    is_default = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # e.g. {'data_types': {'names': {'priority': 'HIGH', 'enabled': True}, ...}}
+    config_json = models.JSONField(default=dict)
+    version = models.IntegerField(default=1)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Anonymization Config: {self.name}"
+        return f"Anonymization Config: {self.name} v{self.version}"
 
     class Meta:
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['-created_at']
+        unique_together = ['name', 'version']
\ No newline at end of file
@@ -5,7 +5,9 @@ from .models import (
     ReportCorrectionVersion,
     AnonymizationRequest,
     AnonymizationAuditLog,
-    AnonymizationConfiguration
+    AnonymizationConfiguration,
+    generate_anonymization_request_id,
+    generate_correction_request_id,
 )
 
 
@@ -24,13 +26,12 @@ class ReportCorrectionRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReportCorrectionRequest
         fields = '__all__'
-        read_only_fields = ['created_at', 'updated_at', 'request_id']
+        read_only_fields = ['created_at', 'updated_at', 'request_id', 'status', 'progress', 'processed_at', 'error_message']
 
     def create(self, validated_data):
         # Auto-generate request_id if not provided
         if not validated_data.get('request_id'):
-            import uuid
-            validated_data['request_id'] = f"CRR-{uuid.uuid4().hex[:8].upper()}"
+            validated_data['request_id'] = generate_correction_request_id()
         return super().create(validated_data)
 
 
@@ -68,8 +69,7 @@ class AnonymizationRequestSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Auto-generate request_id if not provided
         if not validated_data.get('request_id'):
-            import uuid
-            validated_data['request_id'] = f"ANR-{uuid.uuid4().hex[:8].upper()}"
+            validated_data['request_id'] = generate_anonymization_request_id()
         return super().create(validated_data)
 
 
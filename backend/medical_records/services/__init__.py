@@ -33,8 +33,25 @@ def get_available_services():
     
     return services
 
+# Report correction pipeline, imported on first use (it pulls in the ORM models)
+_REPORT_PIPELINE_EXPORTS = (
+    'run_grammar_correction',
+    'run_medical_term_check',
+    'rag_retrieval',
+    'aggregate_corrections',
+    'process_report_correction_sync',
+    'standard_analysis',
+)
+
+def __getattr__(name):
+    if name in _REPORT_PIPELINE_EXPORTS:
+        from . import report_pipeline
+        return getattr(report_pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Export commonly used services
 __all__ = [
     'get_ai_service',
-    'get_available_services'
+    'get_available_services',
+    *_REPORT_PIPELINE_EXPORTS,
 ]
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Batch Anonymization Engine
+==========================
+
+De-identifies large batches of texts and MedicalRecord rows. Items are
+processed in chunks of ANONYMIZATION_BATCH_CHUNK_SIZE: records are streamed
+from the database with iterator(), each chunk is fanned out to a process
+pool of ANONYMIZATION_BATCH_WORKERS workers (inline when 1), and its
+results are written with one bulk_create of AnonymizationRequest rows.
+Job progress is updated after every chunk.
+
+Workers run phi_detection.anonymize_phi_safe, which needs no Django setup, so
+the pool uses the 'spawn' start method by default; forking a threaded web
+worker is not safe.
+"""
+
+import logging
+import multiprocessing
+import time
+from functools import partial
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import AnonymizationBatchJob, AnonymizationRequest, MedicalRecord
+from .job_dispatch import dispatch_job
+from .phi_config import get_active_detectors, get_gazetteer_path
+from .phi_detection import anonymize_phi_safe
+
+logger = logging.getLogger(__name__)
+
+# (source, text): source is {'index': i} for texts or {'record': MedicalRecord}
+BatchItem = Tuple[Dict[str, Any], str]
+
+
+def _chunks(items: Iterable[BatchItem], size: int) -> Iterator[List[BatchItem]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _record_filter(record_ids: List[Any]) -> Q:
+    """Record ids may be primary keys or MedicalRecord.record_id values"""
+    pks = [int(value) for value in record_ids if isinstance(value, int) or str(value).isdigit()]
+    return Q(pk__in=pks) | Q(record_id__in=[str(value) for value in record_ids])
+
+
+class BatchAnonymizationEngine:
+    """Chunked, process-parallel anonymization of texts and medical records"""
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        self.workers = workers or getattr(settings, 'ANONYMIZATION_BATCH_WORKERS', 2)
+        self.chunk_size = chunk_size or getattr(settings, 'ANONYMIZATION_BATCH_CHUNK_SIZE', 500)
+        self.start_method = start_method or getattr(settings, 'ANONYMIZATION_BATCH_START_METHOD', 'spawn')
+
+    def count_items(self, texts: List[str], record_ids: List[Any]) -> int:
+        total = len(texts)
+        if record_ids:
+            total += MedicalRecord.objects.filter(_record_filter(record_ids)).count()
+        return total
+
+    def iter_items(self, texts: List[str], record_ids: List[Any]) -> Iterator[BatchItem]:
+        for index, text in enumerate(texts):
+            yield {'index': index}, text or ''
+        if record_ids:
+            records = (MedicalRecord.objects.filter(_record_filter(record_ids))
+                       .only('id', 'record_id', 'content').order_by('pk'))
+            for record in records.iterator(chunk_size=self.chunk_size):
+                yield {'record': record}, record.content or ''
+
+    def _open_pool(self) -> Optional[Executor]:
+        if self.workers <= 1:
+            return None
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   mp_context=multiprocessing.get_context(self.start_method))
+
+    def process(self, items: Iterable[BatchItem], options: Dict[str, Any], job: Optional[AnonymizationBatchJob] = None,
+                requested_by=None, keep_results: bool = False) -> Dict[str, Any]:
+        """
+        Anonymize items chunk by chunk and store one AnonymizationRequest per
+        item. Returns counts, plus per-item results when keep_results is set.
+        """
+        sensitivity = options.get('sensitivity', 'medium')
+        compliance_framework = options.get('compliance_framework', 'HIPAA')
+        strategy = options.get('strategy', 'REPLACEMENT')
+
+        # Resolve the configured detectors and gazetteer here; workers only get
+        # their names and map the gazetteer file themselves
+        anonymize = partial(anonymize_phi_safe, detector_names=get_active_detectors(),
+                            gazetteer_path=get_gazetteer_path())
+
+        processed = failed = 0
+        results = []
+        pool = self._open_pool()
+        try:
+            for chunk in _chunks(items, self.chunk_size):
+                started = time.perf_counter()
+                texts = [text for _, text in chunk]
+                if pool is None:
+                    outcomes = [anonymize(text) for text in texts]
+                else:
+                    # Several texts per task to amortize inter-process overhead
+                    outcomes = list(pool.map(anonymize, texts,
+                                             chunksize=max(1, len(texts) // (self.workers * 4))))
+                elapsed_ms = int((time.perf_counter() - started) * 1000 / max(1, len(texts)))
+
+                now = timezone.now()
+                rows = []
+                for (source, text), outcome in zip(chunk, outcomes):
+                    record = source.get('record')
+                    item_key = {'record_id': record.record_id} if record is not None else {'index': source['index']}
+                    if 'error' in outcome:
+                        failed += 1
+                        rows.append(AnonymizationRequest(
+                            batch_job=job, medical_record=record, original_text=text,
+                            sensitivity_level=sensitivity, compliance_framework=compliance_framework,
+                            anonymization_strategy=strategy, status='failed',
+                            summary_json={'error': outcome['error']}, requested_by=requested_by,
+                        ))
+                        if keep_results:
+                            results.append({**item_key, 'status': 'error', 'error': outcome['error']})
+                        continue
+                    
+                    detections = outcome['detections']
+                    rows.append(AnonymizationRequest(
+                        batch_job=job,
+                        medical_record=record,
+                        original_text=text,
+                        sensitivity_level=sensitivity,
+                        compliance_framework=compliance_framework,
+                        anonymization_strategy=strategy,
+                        anonymized_text=outcome['anonymized_text'],
+                        detections_json=detections,
+                        summary_json={'total_detections': len(detections)},
+                        risk_level=outcome['risk_level'],
+                        compliance_score=outcome['compliance_score'],
+                        detections_count=len(detections),
+                        processing_time_ms=elapsed_ms,
+                        status='completed',
+                        processed_at=now,
+                        requested_by=requested_by,
+                    ))
+                    if keep_results:
+                        results.append({
+                            **item_key,
+                            'status': 'success',
+                            'anonymized_text': outcome['anonymized_text'],
+                            'detections_count': len(detections),
+                        })
+
+                AnonymizationRequest.objects.bulk_create(rows, batch_size=self.chunk_size)
+                chunk_failed = sum(1 for row in rows if row.status == 'failed')
+                processed += len(chunk)
+                if job is not None:
+                    AnonymizationBatchJob.objects.filter(pk=job.pk).update(
+                        processed_items=F('processed_items') + len(chunk),
+                        failed_items=F('failed_items') + chunk_failed,
+                        updated_at=timezone.now()
+                    )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        return {'processed': processed, 'failed': failed, 'results': results}
+
+
+def run_batch_job(job_id: str):
+    """Process a queued batch job, recording progress and failures on it"""
+    job = AnonymizationBatchJob.objects.get(job_id=job_id)
+    if job.status == 'completed':
+        logger.info(f"Anonymization batch {job_id} is already completed; skipping")
+        return None
+
+    payload = job.payload or {}
+    texts, record_ids = payload.get('texts', []), payload.get('record_ids', [])
+    engine = BatchAnonymizationEngine()
+
+    # A redelivered job starts over
+    job.requests.all().delete()
+    job.status = 'processing'
+    job.processed_items = 0
+    job.failed_items = 0
+    job.error_message = ''
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'processed_items', 'failed_items', 'error_message', 'started_at', 'updated_at'])
+
+    try:
+        outcome = engine.process(engine.iter_items(texts, record_ids), payload.get('options', {}),
+                                 job=job, requested_by=job.requested_by)
+    except Exception as e:
+        logger.exception(f"Anonymization batch {job_id} failed")
+        AnonymizationBatchJob.objects.filter(pk=job.pk).update(
+            status='failed', error_message=str(e), completed_at=timezone.now(), updated_at=timezone.now()
+        )
+        raise
+
+    AnonymizationBatchJob.objects.filter(pk=job.pk).update(
+        status='completed', total_items=outcome['processed'], completed_at=timezone.now(), updated_at=timezone.now()
+    )
+    return outcome['processed']
+
+
+def enqueue_batch_job(job_id: str) -> str:
+    """Queue a saved batch job; returns the backend ('celery' or 'thread')"""
+    return dispatch_job('process_anonymization_batch', run_batch_job, job_id)
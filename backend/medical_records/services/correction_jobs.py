@@ -0,0 +1,67 @@
+"""
+Report Correction Jobs
+======================
+
+Runs process_report_correction_sync outside the HTTP request, on the
+Celery worker (tasks.process_report_correction) or the local thread pool
+(see job_dispatch).
+
+Status, progress and errors are written to the ReportCorrectionRequest
+row, so clients poll the request resource whichever backend ran the job.
+"""
+
+import logging
+
+from django.utils import timezone
+
+from ..models import ReportCorrectionRequest
+from .job_dispatch import dispatch_job
+
+logger = logging.getLogger(__name__)
+
+
+def _set_progress(pk: int, percent: int):
+    ReportCorrectionRequest.objects.filter(pk=pk).update(progress=percent, updated_at=timezone.now())
+
+
+def run_correction_job(request_id: str):
+    """
+    Process one correction request, recording progress and failures.
+
+    Returns the created version id. Exceptions are stored on the request
+    and re-raised so the executing backend sees the failure too.
+    """
+    from .report_pipeline import process_report_correction_sync
+
+    req = ReportCorrectionRequest.objects.get(request_id=request_id)
+    if req.status == ReportCorrectionRequest.STATUS_PROCESSED:
+        # Redelivered or duplicate job
+        logger.info(f"Correction request {request_id} is already processed; skipping")
+        return None
+
+    req.status = ReportCorrectionRequest.STATUS_PROCESSING
+    req.progress = 0
+    req.error_message = ''
+    req.save(update_fields=['status', 'progress', 'error_message', 'updated_at'])
+
+    try:
+        version = process_report_correction_sync(req, on_progress=lambda percent: _set_progress(req.pk, percent))
+    except Exception as e:
+        logger.exception(f"Correction job {request_id} failed")
+        ReportCorrectionRequest.objects.filter(pk=req.pk).update(
+            status=ReportCorrectionRequest.STATUS_FAILED,
+            error_message=str(e),
+            processed_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        raise
+    return version.pk
+
+
+def enqueue_correction_job(request_id: str) -> str:
+    """
+    Queue processing of a saved request once the current transaction commits.
+
+    Returns the backend the job is sent to ('celery' or 'thread').
+    """
+    return dispatch_job('process_report_correction', run_correction_job, request_id)
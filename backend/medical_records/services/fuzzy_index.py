@@ -0,0 +1,239 @@
+"""
+Fuzzy Lookup Indexes
+====================
+
+In-memory structures that answer fuzzy lookups without scanning a whole
+lexicon:
+
+1. SymmetricDeleteIndex: SymSpell-style index answering "nearest lexicon
+   term within edit distance k". Every term is indexed under all strings
+   obtainable by deleting up to k characters. Two strings within
+   Levenshtein distance k always share such a deletion variant, so a query
+   only has to generate its own variants and verify the terms filed under them.
+2. NgramIndex: character n-gram inverted index producing the top-k
+   candidates by n-gram overlap, for callers that score candidates with a
+   more expensive similarity measure.
+"""
+
+import hashlib
+import heapq
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    Levenshtein distance between two strings.
+
+    With max_distance set, computation stops as soon as the distance is known
+    to exceed it and max_distance + 1 is returned.
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+
+    if max_distance is not None and len(s1) - len(s2) > max_distance:
+        return max_distance + 1
+
+    if len(s2) == 0:
+        return len(s1)
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        if max_distance is not None and min(current_row) > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def _deletion_variants(word: str, max_distance: int) -> Set[str]:
+    """All strings obtained from word by deleting up to max_distance characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if not item:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= variants
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+
+class SymmetricDeleteIndex:
+    """
+    Symmetric-delete fuzzy index over a lexicon of terms with payloads.
+
+    Terms keep their insertion order, which breaks ties between candidates
+    at the same distance.
+    """
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._terms: List[str] = []
+        self._payloads: List[Any] = []
+        self._term_ids: Dict[str, int] = {}
+        self._deletes: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._term_ids
+
+    def add(self, term: str, payload: Any = None):
+        """Add a term; re-adding an existing term only replaces its payload"""
+        if term in self._term_ids:
+            self._payloads[self._term_ids[term]] = payload
+            return
+
+        term_id = len(self._terms)
+        self._terms.append(term)
+        self._payloads.append(payload)
+        self._term_ids[term] = term_id
+
+        for variant in _deletion_variants(term, self.max_distance):
+            self._deletes.setdefault(variant, []).append(term_id)
+
+    def get(self, term: str, default: Any = None) -> Any:
+        """Exact lookup of a term's payload"""
+        term_id = self._term_ids.get(term)
+        return self._payloads[term_id] if term_id is not None else default
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int, Any]]:
+        """
+        Find lexicon terms within max_distance of word.
+
+        Returns (term, distance, payload) tuples ordered by distance, then by
+        insertion order.
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        candidate_ids = set()
+        for variant in _deletion_variants(word, max_distance):
+            candidate_ids.update(self._deletes.get(variant, ()))
+
+        matches = []
+        for term_id in candidate_ids:
+            term = self._terms[term_id]
+            distance = levenshtein_distance(word, term, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, term_id))
+
+        matches.sort()
+        return [(self._terms[term_id], distance, self._payloads[term_id]) for distance, term_id in matches]
+
+    def nearest(self, word: str, max_distance: Optional[int] = None) -> Optional[Tuple[str, int, Any]]:
+        """Closest lexicon term within max_distance, or None"""
+        matches = self.lookup(word, max_distance)
+        return matches[0] if matches else None
+
+
+class NgramIndex:
+    """
+    Character n-gram inverted index for fuzzy candidate generation.
+
+    Keys are padded so that short words still produce n-grams anchored at
+    their start and end. Candidates are ranked by Jaccard overlap of their
+    n-gram sets with the query and only the top-k are returned.
+    """
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._keys: List[str] = []
+        self._payloads: List[Any] = []
+        self._gram_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _ngrams(self, text: str) -> Set[str]:
+        padded = ' ' * (self.n - 1) + text + ' '
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def add(self, key: str, payload: Any = None):
+        """Add an entry; the same key may be added several times with different payloads"""
+        entry_id = len(self._keys)
+        grams = self._ngrams(key)
+        self._keys.append(key)
+        self._payloads.append(payload)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+
+    def candidates(self, query: str, limit: int = 50) -> List[Tuple[int, float, str, Any]]:
+        """
+        Top entries by n-gram overlap with query.
+
+        Returns (entry_id, score, key, payload) tuples, best first. Entry ids
+        follow insertion order and can be used as a stable tie-breaker.
+        """
+        query_grams = self._ngrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            postings = self._postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        if not shared:
+            return []
+
+        query_size = len(query_grams)
+        gram_counts = self._gram_counts
+        scored = (
+            (count / (query_size + gram_counts[entry_id] - count), -entry_id)
+            for entry_id, count in shared.items()
+        )
+        best = heapq.nlargest(limit, scored)
+        return [
+            (-neg_id, score, self._keys[-neg_id], self._payloads[-neg_id])
+            for score, neg_id in best
+        ]
+
+
+# Per-process cache of built indexes keyed by lexicon content
+_index_cache: Dict[Tuple[str, int], SymmetricDeleteIndex] = {}
+_index_cache_lock = threading.Lock()
+
+
+def _lexicon_fingerprint(entries: Iterable[Tuple[str, Any]]) -> str:
+    digest = hashlib.sha1()
+    for term, payload in entries:
+        digest.update(repr((term, payload)).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_lexicon_index(lexicon: Dict[str, Any], max_distance: int = 2) -> SymmetricDeleteIndex:
+    """
+    Return the fuzzy index for a lexicon, building it at most once per process.
+
+    Identical lexicons (same terms, payloads and order) share one index, so
+    every service instance and detector reuses the same structure.
+    """
+    items = list(lexicon.items())
+    key = (_lexicon_fingerprint(items), max_distance)
+
+    index = _index_cache.get(key)
+    if index is not None:
+        return index
+
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is None:
+            index = SymmetricDeleteIndex(max_distance=max_distance)
+            for term, payload in items:
+                index.add(term, payload)
+            _index_cache[key] = index
+    return index
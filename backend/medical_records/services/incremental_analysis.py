@@ -0,0 +1,129 @@
+"""
+Incremental Report Analysis
+===========================
+
+Sentence-level diffing between a previously analyzed report and its edited
+version. The plan says which regions of the new text must be re-analyzed
+and how the offsets of the previous corrections shift outside them, so
+re-analysis cost scales with the size of the edit.
+
+Changed sentences are widened by one unchanged neighbour on each side, so
+corrections that straddle a sentence boundary (e.g. capitalization after a
+period) are re-detected against the edited text.
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+# A sentence ends after terminal punctuation followed by whitespace, or at a line break
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*')
+
+# Unchanged sentences re-analyzed around each edit
+CONTEXT_SENTENCES = 1
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Sentence spans covering the whole text.
+
+    Each sentence keeps its trailing whitespace, so the spans are contiguous
+    and joining the sentences reproduces the text.
+    """
+    spans = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        if match.end() > start:
+            spans.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+@dataclass
+class IncrementalPlan:
+    """What to keep, shift and re-analyze when moving from old to new text"""
+    old_spans: List[Tuple[int, int]]
+    new_spans: List[Tuple[int, int]]
+    # Regions of the new text to re-analyze: (start, end, context_end)
+    regions: List[Tuple[int, int, int]] = field(default_factory=list)
+    # Old sentence index -> (equal block id, new sentence index) for unchanged sentences
+    unchanged: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    # New sentence indices inside a re-analyzed region
+    reanalyzed: set = field(default_factory=set)
+
+    def __post_init__(self):
+        self._old_starts = [span[0] for span in self.old_spans]
+
+    @property
+    def sentences_reanalyzed(self) -> int:
+        return len(self.reanalyzed)
+
+    def shift_correction(self, correction: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        The previous correction moved to its offset in the new text, or None
+        if it touched edited text or lies in a re-analyzed region.
+        """
+        start, end = correction['position']
+        first = bisect_right(self._old_starts, start) - 1
+        last = bisect_right(self._old_starts, max(start, end - 1)) - 1
+        if first < 0 or first not in self.unchanged or last not in self.unchanged:
+            return None
+
+        block, new_index = self.unchanged[first]
+        if self.unchanged[last][0] != block or new_index in self.reanalyzed:
+            return None
+
+        delta = self.new_spans[new_index][0] - self.old_spans[first][0]
+        return {**correction, 'position': [start + delta, end + delta]}
+
+
+def plan_incremental(old_text: str, new_text: str) -> IncrementalPlan:
+    """Diff two report versions sentence by sentence"""
+    old_spans = split_sentences(old_text)
+    new_spans = split_sentences(new_text)
+    plan = IncrementalPlan(old_spans, new_spans)
+
+    matcher = SequenceMatcher(
+        None,
+        [old_text[start:end] for start, end in old_spans],
+        [new_text[start:end] for start, end in new_spans],
+        autojunk=False,
+    )
+
+    changed = set()
+    for block, (tag, i1, i2, j1, j2) in enumerate(matcher.get_opcodes()):
+        if tag == 'equal':
+            for offset in range(i2 - i1):
+                plan.unchanged[i1 + offset] = (block, j1 + offset)
+        elif j2 > j1:
+            changed.update(range(j1, j2))
+        else:
+            # Pure deletion - the sentences meeting at the cut are re-checked
+            changed.update(index for index in (j1 - 1, j1) if 0 <= index < len(new_spans))
+
+    for index in changed:
+        low = max(0, index - CONTEXT_SENTENCES)
+        high = min(len(new_spans), index + CONTEXT_SENTENCES + 1)
+        plan.reanalyzed.update(range(low, high))
+
+    # Merge re-analyzed sentences into contiguous regions
+    region_start = None
+    for index in range(len(new_spans) + 1):
+        if index < len(new_spans) and index in plan.reanalyzed:
+            if region_start is None:
+                region_start = index
+        elif region_start is not None:
+            # Detection may read one sentence past the region for cross-boundary patterns
+            context_index = min(index, len(new_spans) - 1)
+            plan.regions.append((
+                new_spans[region_start][0],
+                new_spans[index - 1][1],
+                new_spans[context_index][1],
+            ))
+            region_start = None
+
+    return plan
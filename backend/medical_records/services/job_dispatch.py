@@ -0,0 +1,77 @@
+"""
+Background Job Dispatch
+=======================
+
+Sends background jobs to Celery when CORRECTION_JOBS_USE_CELERY is on - by
+default, whenever REDIS_URL is set - and otherwise, or if the broker cannot
+be reached, to a local thread pool of CORRECTION_JOB_THREADS workers.
+Jobs record their own status on a database row, so clients poll that row
+whichever backend ran them.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CORRECTION_JOB_THREADS', 2),
+                    thread_name_prefix='background-job',
+                )
+    return _executor
+
+
+def _use_celery() -> bool:
+    return getattr(settings, 'CORRECTION_JOBS_USE_CELERY', False)
+
+
+def _run_in_thread(run: Callable[[str], object], job_id: str):
+    close_old_connections()
+    try:
+        run(job_id)
+    except Exception:
+        # Jobs record their own failures on their database row
+        pass
+    finally:
+        close_old_connections()
+
+
+def _dispatch(task_name: str, run: Callable[[str], object], job_id: str) -> str:
+    if _use_celery():
+        try:
+            from .. import tasks
+            getattr(tasks, task_name).delay(job_id)
+            return 'celery'
+        except Exception as e:
+            logger.warning(f"Celery unavailable for {task_name}({job_id}), using local executor: {e}")
+
+    _get_executor().submit(_run_in_thread, run, job_id)
+    return 'thread'
+
+
+def dispatch_job(task_name: str, run: Callable[[str], object], job_id: str) -> str:
+    """
+    Run a job once the current transaction commits: the Celery task
+    tasks.<task_name>, or run(job_id) on the local executor.
+
+    Returns the backend the job is sent to ('celery' or 'thread'); inside a
+    transaction this is the configured preference.
+    """
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _dispatch(task_name, run, job_id))
+        return 'celery' if _use_celery() else 'thread'
+    return _dispatch(task_name, run, job_id)
@@ -0,0 +1,180 @@
+"""
+Async LLM Client
+================
+
+asyncio-based OpenAI client layer for the correction service. Long reports
+are split into section chunks (FINDINGS, IMPRESSION, ...) that are sent
+concurrently with bounded parallelism. Every chunk has its own timeout, and
+a chunk that fails or times out leaves the rest of the results intact.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Section headings that start a new chunk, e.g. "FINDINGS:" or "Impression:"
+SECTION_HEADING_PATTERN = re.compile(
+    r'^[ \t]*(CLINICAL HISTORY|HISTORY|INDICATIONS?|TECHNIQUE|COMPARISON|FINDINGS|IMPRESSION|CONCLUSIONS?|RECOMMENDATIONS?)[ \t]*:',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Boundaries used when a section is too long for a single chunk
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+CHUNK_OK = 'ok'
+CHUNK_TIMEOUT = 'timeout'
+CHUNK_ERROR = 'error'
+
+
+@dataclass
+class ReportChunk:
+    """A section of a report with its offsets in the full text"""
+    name: str
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class ChunkResult:
+    """Outcome of one chunk request"""
+    chunk: ReportChunk
+    status: str
+    content: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == CHUNK_OK
+
+
+def _split_long(name: str, start: int, text: str, max_chars: int) -> List[ReportChunk]:
+    """Split an oversized section on paragraph, then sentence boundaries"""
+    if len(text) <= max_chars:
+        return [ReportChunk(name, start, start + len(text), text)]
+
+    for pattern in (_PARAGRAPH_BREAK, _SENTENCE_BREAK):
+        cuts = [match.end() for match in pattern.finditer(text) if 0 < match.end() < len(text)]
+        if cuts:
+            break
+    else:
+        cuts = list(range(max_chars, len(text), max_chars))
+
+    chunks = []
+    chunk_start = 0
+    last_cut = 0
+    for cut in cuts + [len(text)]:
+        if cut - chunk_start > max_chars and last_cut > chunk_start:
+            chunks.append((chunk_start, last_cut))
+            chunk_start = last_cut
+        last_cut = cut
+    chunks.append((chunk_start, len(text)))
+
+    return [
+        ReportChunk(f"{name}#{part + 1}", start + chunk_start, start + chunk_end, text[chunk_start:chunk_end])
+        for part, (chunk_start, chunk_end) in enumerate(chunks)
+    ]
+
+
+def split_report_sections(text: str, max_chars: Optional[int] = None) -> List[ReportChunk]:
+    """
+    Split a report into section chunks covering the whole text.
+
+    Text before the first heading becomes a 'PREAMBLE' chunk. Sections longer
+    than max_chars are split further so no single request gets too large.
+    """
+    max_chars = max_chars or getattr(settings, 'LLM_MAX_CHUNK_CHARS', 4000)
+
+    headings = list(SECTION_HEADING_PATTERN.finditer(text))
+    boundaries = [(match.start(), match.group(1).upper()) for match in headings]
+    if not boundaries or boundaries[0][0] > 0:
+        boundaries.insert(0, (0, 'PREAMBLE' if boundaries else 'REPORT'))
+
+    chunks = []
+    for index, (start, name) in enumerate(boundaries):
+        end = boundaries[index + 1][0] if index + 1 < len(boundaries) else len(text)
+        section = text[start:end]
+        if section.strip():
+            chunks.extend(_split_long(name, start, section, max_chars))
+    return chunks
+
+
+class AsyncLLMClient:
+    """
+    Concurrent chat-completion client built on openai.AsyncOpenAI.
+
+    At most max_concurrency requests are in flight per client, and each one
+    is cancelled after chunk_timeout seconds.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo",
+                 max_concurrency: Optional[int] = None, chunk_timeout: Optional[float] = None,
+                 max_tokens: int = 2000):
+        self.api_key = api_key or getattr(settings, 'OPENAI_API_KEY', None) or os.getenv('OPENAI_API_KEY')
+        self.model = model
+        self.max_concurrency = max_concurrency or getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+        self.chunk_timeout = chunk_timeout or getattr(settings, 'LLM_CHUNK_TIMEOUT', 15.0)
+        self.max_tokens = max_tokens
+        self._client = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+            # Retries would multiply the per-chunk budget; a failed chunk falls back instead
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        """Single chat completion; raises on API errors"""
+        response = await self._get_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+            temperature=0.0,  # Deterministic for medical accuracy
+        )
+        return response.choices[0].message.content.strip()
+
+    async def run_chunks(self, chunks: List[ReportChunk],
+                         build_messages: Callable[[ReportChunk], List[Dict[str, str]]]) -> List[ChunkResult]:
+        """
+        Send one request per chunk concurrently and collect every outcome.
+
+        Results come back in chunk order. Timeouts and API errors are reported
+        per chunk instead of failing the whole batch.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(chunk: ReportChunk) -> ChunkResult:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    content = await asyncio.wait_for(self.complete(build_messages(chunk)), self.chunk_timeout)
+                    return ChunkResult(chunk, CHUNK_OK, content=content, elapsed=time.monotonic() - started)
+                except asyncio.TimeoutError:
+                    logger.warning(f"LLM request for section {chunk.name} timed out after {self.chunk_timeout}s")
+                    return ChunkResult(chunk, CHUNK_TIMEOUT, error='timeout', elapsed=time.monotonic() - started)
+                except Exception as e:
+                    logger.warning(f"LLM request for section {chunk.name} failed: {e}")
+                    return ChunkResult(chunk, CHUNK_ERROR, error=str(e), elapsed=time.monotonic() - started)
+
+        return await asyncio.gather(*(run(chunk) for chunk in chunks))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
@@ -11,13 +11,22 @@ Output Format: JSON with position indexes for UI integration
 Compliance: SILO4 medical safety standards
 """
 
+import asyncio
+import hashlib
 import re
 import json
 import logging
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, Iterator, List, Any, Tuple, Optional
 from dataclasses import dataclass
 from django.conf import settings
 
+from .report_tokenizer import TokenizedReport, tokenize_report
+from .fuzzy_index import get_lexicon_index, levenshtein_distance
+from .llm_client import AsyncLLMClient, split_report_sections
+from .result_cache import AnalysisResultCache
+from .incremental_analysis import plan_incremental
+from .span_edits import SpanEdit, apply_span_edits
+
 # RAG Medical Knowledge Base Integration
 try:
     from .rag_medical_service import rag_retriever, RAGMedicalRetriever
@@ -28,6 +37,26 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Bump when detection or correction logic changes in a way the loaded
+# dictionaries and rules do not capture; invalidates cached analysis results
+RULESET_VERSION = 1
+
+# Patterns compiled once at import time
+_REPEATED_CHAR_PATTERN = re.compile(r'(.)\1{2,}')
+_DOCTOR_TITLE_PATTERN = re.compile(r'\bdr\s+([a-z])', re.IGNORECASE)
+_PERSON_TITLE_PATTERN = re.compile(r'\b(mr|ms|mrs)\s+([a-z])', re.IGNORECASE)
+_ABBREVIATION_PATTERN = re.compile(r'\\b[A-Z]{2,}\\b')
+_PAST_TENSE_PATTERN = re.compile(r'\\b(was|were|showed|demonstrated)\\b', re.IGNORECASE)
+_PRESENT_TENSE_PATTERN = re.compile(r'\\b(is|are|shows|demonstrates)\\b', re.IGNORECASE)
+
+# Common non-medical words skipped by the terminology detector
+_COMMON_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'was', 'has', 'his', 'her', 'this', 'that', 'with', 'from',
+    'they', 'been', 'have', 'were', 'said', 'each', 'which', 'what', 'when', 'where', 'will',
+    'more', 'very', 'can', 'had', 'our', 'out', 'day', 'get', 'use', 'man', 'new', 'now', 'old',
+    'see', 'him', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too',
+})
+
 @dataclass
 class ErrorCorrection:
     """Structure for error correction with position tracking"""
@@ -51,9 +80,45 @@ class MedicalReportCorrectionService:
         self.grammar_rules = self._load_grammar_rules()
         self.medical_abbreviations = self._load_medical_abbreviations()
         self.radiology_terms = self._load_radiology_terms()
+        self.compiled_grammar_rules = self._compile_grammar_rules(self.grammar_rules)
+        self.advanced_corrections = self._load_advanced_corrections()
+        
+        # Fuzzy index over the combined correction lexicon (built once per process)
+        correction_lexicon = self._build_correction_lexicon()
+        self.correction_index = get_lexicon_index(correction_lexicon, max_distance=2)
+        self.correct_forms = frozenset(correction for correction, _ in correction_lexicon.values())
+        
+        # Content-addressed cache of complete analysis results
+        self.ruleset_version = self._compute_ruleset_version()
+        self.result_cache = AnalysisResultCache()
         
         # Initialize OpenAI client if available
         self.openai_client = self._initialize_openai_client()
+    
+    def _compute_ruleset_version(self) -> str:
+        """Fingerprint of the loaded dictionaries and rules, used in result cache keys"""
+        digest = hashlib.sha256(str(RULESET_VERSION).encode('utf-8'))
+        for ruleset in (self.medical_dictionary, self.grammar_rules, self.medical_abbreviations,
+                        self.radiology_terms, self.advanced_corrections):
+            digest.update(json.dumps(ruleset, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def _result_cache_key(self, report_text: str, model_name: str, ai_enabled: bool) -> str:
+        kb_version = rag_retriever.knowledge_base.version if RAG_AVAILABLE and rag_retriever else 'none'
+        return self.result_cache.make_key(report_text, model_name, ai_enabled, kb_version, self.ruleset_version)
+    
+    def _get_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        result = self.result_cache.get(cache_key)
+        if result is not None:
+            result['metadata']['cache_hit'] = True
+        return result
+    
+    def _cache_result(self, cache_key: str, result: Dict[str, Any], cacheable: bool = True):
+        """Tag a fresh result with its cache key and store it if complete"""
+        result['metadata']['cache_hit'] = False
+        result['metadata']['cache_key'] = cache_key
+        if cacheable:
+            self.result_cache.set(cache_key, result)
         
     def _initialize_openai_client(self) -> Optional[Any]:
         """Initialize OpenAI client with proper error handling"""
@@ -198,46 +263,65 @@ class MedicalReportCorrectionService:
         }
     
     def _load_grammar_rules(self) -> Dict[str, Any]:
-        """Load grammar correction rules for medical reports"""
+        """
+        Load grammar correction rules for medical reports
+
+        Each pattern is (regex, error_type, anchors). Anchors are the lowercased
+        words a match must contain; patterns whose anchors are absent from the
+        report are skipped without scanning. None means always scan.
+        """
         return {
             'tense_consistency': {
                 'patterns': [
-                    (r'(?i)\b(was|were)\s+(\w+ed)\b', 'past_tense_consistency'),
-                    (r'(?i)\b(is|are)\s+(\w+ing)\b', 'present_tense_consistency'),
+                    (r'(?i)\b(was|were)\s+(\w+ed)\b', 'past_tense_consistency', {'was', 'were'}),
+                    (r'(?i)\b(is|are)\s+(\w+ing)\b', 'present_tense_consistency', {'is', 'are'}),
                 ],
                 'recommendation': 'Grammar tense correction'
             },
             'plural_singular': {
                 'patterns': [
-                    (r'(?i)\b(are|were)\s+(\w+)(?<!s)\b', 'plural_verb_singular_noun'),
-                    (r'(?i)\b(is|was)\s+(\w+s)\b', 'singular_verb_plural_noun'),
+                    (r'(?i)\b(are|were)\s+(\w+)(?<!s)\b', 'plural_verb_singular_noun', {'are', 'were'}),
+                    (r'(?i)\b(is|was)\s+(\w+s)\b', 'singular_verb_plural_noun', {'is', 'was'}),
                 ],
                 'recommendation': 'Use plural form'
             },
             'article_usage': {
                 'patterns': [
-                    (r'(?i)\ba\s+([aeiouAEIOU])', 'article_before_vowel'),
-                    (r'(?i)\ban\s+([^aeiouAEIOU])', 'article_before_consonant'),
+                    (r'(?i)\ba\s+([aeiouAEIOU])', 'article_before_vowel', {'a'}),
+                    (r'(?i)\ban\s+([^aeiouAEIOU])', 'article_before_consonant', {'an'}),
                 ],
                 'recommendation': 'Article correction'
             },
             'sentence_structure': {
                 'patterns': [
-                    (r'[.!?]\s+[a-z]', 'capitalize_after_period'),
-                    (r'\s{3,}', 'multiple_spaces'),  # Only flag 3+ spaces
+                    (r'[.!?]\s+[a-z]', 'capitalize_after_period', None),
+                    (r'\s{3,}', 'multiple_spaces', None),  # Only flag 3+ spaces
                 ],
                 'recommendation': 'Sentence structure correction'
             },
             'medical_formatting': {
                 'patterns': [
-                    (r'(?i)\bdr\s+([a-z])', 'doctor_title_capitalization'),
-                    (r'(?i)\bmr\s+([a-z])', 'mr_title_capitalization'),
-                    (r'(?i)\bms\s+([a-z])', 'ms_title_capitalization'),
-                    (r'(?i)\bmrs\s+([a-z])', 'mrs_title_capitalization'),
+                    (r'(?i)\bdr\s+([a-z])', 'doctor_title_capitalization', {'dr'}),
+                    (r'(?i)\bmr\s+([a-z])', 'mr_title_capitalization', {'mr'}),
+                    (r'(?i)\bms\s+([a-z])', 'ms_title_capitalization', {'ms'}),
+                    (r'(?i)\bmrs\s+([a-z])', 'mrs_title_capitalization', {'mrs'}),
                 ],
                 'recommendation': 'Professional title formatting'
             }
         }
+
+    def _compile_grammar_rules(self, grammar_rules: Dict[str, Any]) -> List[Tuple[str, Any, str, Optional[frozenset]]]:
+        """Compile grammar patterns once so analysis never recompiles them"""
+        compiled = []
+        for rule_name, rule_config in grammar_rules.items():
+            for pattern, error_type, anchors in rule_config['patterns']:
+                compiled.append((
+                    rule_name,
+                    re.compile(pattern),
+                    error_type,
+                    frozenset(anchors) if anchors else None
+                ))
+        return compiled
     
     def _load_medical_abbreviations(self) -> Dict[str, str]:
         """Load standard medical abbreviations"""
@@ -300,27 +384,205 @@ class MedicalReportCorrectionService:
                 }
             }
         
+        # Initialize temporary OpenAI client if API key provided
+        temp_openai_client = None
+        if openai_api_key and openai_api_key.strip():
+            try:
+                import openai
+                temp_openai_client = openai.OpenAI(api_key=openai_api_key)
+            except Exception as e:
+                logger.warning(f"Failed to initialize temporary OpenAI client: {e}")
+        ai_client = temp_openai_client or self.openai_client
+        
+        # Identical submissions are served from the result cache
+        cache_key = self._result_cache_key(report_text, model_name, bool(ai_client))
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+        corrections = self._detect_corrections(report_text)
+        
+        # Generate enhanced corrections using AI if available
+        ai_failed = False
+        if ai_client and corrections:
+            ai_enhanced_corrections = self._enhance_with_ai(report_text, corrections, ai_client, model_name)
+            ai_failed = not ai_enhanced_corrections
+            corrections = ai_enhanced_corrections if ai_enhanced_corrections else corrections
+        
+        result = self._build_analysis_result(report_text, corrections)
+        # A failed AI call is retried on the next submission rather than cached
+        self._cache_result(cache_key, result, cacheable=not ai_failed)
+        return result
+    
+    async def analyze_medical_report_async(self, report_text: str, openai_api_key: str = None, model_name: str = "gpt-3.5-turbo") -> Dict[str, Any]:
+        """
+        Async variant of analyze_medical_report for ASGI views
+        
+        Rule-based detection runs in a worker thread. AI enhancement sends the
+        report's sections concurrently, each with its own timeout; sections
+        that fail keep their rule-based corrections.
+        """
+        if not report_text or not report_text.strip():
+            return self.analyze_medical_report(report_text)
+        
+        llm_client = AsyncLLMClient(api_key=openai_api_key or None, model=model_name)
+        
+        # Identical submissions are served from the result cache
+        cache_key = self._result_cache_key(report_text, model_name, llm_client.available)
+        cached_result = await asyncio.to_thread(self._get_cached_result, cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+        corrections = await asyncio.to_thread(self._detect_corrections, report_text)
+        
+        ai_metadata = {}
+        if llm_client.available and corrections:
+            try:
+                corrections, ai_metadata = await self._enhance_with_ai_async(report_text, corrections, llm_client)
+            finally:
+                await llm_client.aclose()
+        
+        result = self._build_analysis_result(report_text, corrections)
+        result['metadata'].update(ai_metadata)
+        # Partial AI results are retried on the next submission rather than cached
+        await asyncio.to_thread(
+            self._cache_result, cache_key, result, not ai_metadata.get('ai_sections_failed')
+        )
+        return result
+    
+    def analyze_medical_report_incremental(self, report_text: str, previous_cache_key: str, openai_api_key: str = None, model_name: str = "gpt-3.5-turbo") -> Dict[str, Any]:
+        """
+        Re-analyze an edited report starting from a previous analysis
+        
+        Only sentences changed since the analysis stored under
+        previous_cache_key (plus one neighbouring sentence on each side) go
+        through detection and AI enhancement; the previous corrections
+        elsewhere are kept with shifted positions. Falls back to a full
+        analysis when the previous result is unknown or was produced with a
+        different model, knowledge base or ruleset.
+        """
+        if not report_text or not report_text.strip():
+            return self.analyze_medical_report(report_text)
+        
+        # Initialize temporary OpenAI client if API key provided
+        temp_openai_client = None
+        if openai_api_key and openai_api_key.strip():
+            try:
+                import openai
+                temp_openai_client = openai.OpenAI(api_key=openai_api_key)
+            except Exception as e:
+                logger.warning(f"Failed to initialize temporary OpenAI client: {e}")
+        ai_client = temp_openai_client or self.openai_client
+        
+        cache_key = self._result_cache_key(report_text, model_name, bool(ai_client))
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+        previous = self.result_cache.get(previous_cache_key) if previous_cache_key else None
+        fallback_reason = None
+        if previous is None:
+            fallback_reason = 'previous_analysis_not_found'
+        elif self._result_cache_key(previous['original_text'], model_name, bool(ai_client)) != previous_cache_key:
+            # The key covers model, AI mode, knowledge base and ruleset versions
+            fallback_reason = 'previous_analysis_outdated'
+        
+        if fallback_reason:
+            result = self.analyze_medical_report(report_text, openai_api_key, model_name)
+            result['metadata'].update({'incremental': False, 'incremental_fallback': fallback_reason})
+            return result
+        
+        plan = plan_incremental(previous['original_text'], report_text)
+        
         corrections = []
+        for correction in previous['corrections']:
+            shifted = plan.shift_correction(correction)
+            if shifted is not None:
+                corrections.append(shifted)
         
-        # 1. ERROR DETECTION
-        spelling_errors = self._detect_spelling_errors(report_text)
-        grammar_errors = self._detect_grammar_errors(report_text)
-        medical_term_errors = self._detect_medical_terminology_errors(report_text)
-        consistency_errors = self._detect_consistency_errors(report_text)
+        ai_failed = False
+        for start, end, context_end in plan.regions:
+            region_text = report_text[start:context_end]
+            region_corrections = [
+                correction for correction in self._detect_corrections(region_text)
+                if correction['position'][0] < end - start
+            ]
+            
+            if ai_client and region_corrections:
+                enhanced = self._enhance_with_ai(region_text, region_corrections, ai_client, model_name)
+                if enhanced and self._has_valid_positions(enhanced):
+                    region_corrections = enhanced
+                else:
+                    ai_failed = True
+            
+            for correction in region_corrections:
+                region_start, region_end = correction['position']
+                corrections.append({**correction, 'position': [region_start + start, region_end + start]})
         
-        # Combine all errors
-        all_errors = spelling_errors + grammar_errors + medical_term_errors + consistency_errors
+        corrections.sort(key=lambda x: x['position'][0])
         
-        # 2. ERROR CORRECTION & 3. RECOMMENDATION WORDS
-        for error in all_errors:
-            correction = self._generate_correction_with_recommendation(error, report_text)
-            if correction:
-                corrections.append(correction)
+        result = self._build_analysis_result(report_text, corrections)
+        result['metadata'].update({
+            'incremental': True,
+            'previous_cache_key': previous_cache_key,
+            'sentences_total': len(plan.new_spans),
+            'sentences_reanalyzed': plan.sentences_reanalyzed,
+        })
+        self._cache_result(cache_key, result, cacheable=not ai_failed)
+        return result
+    
+    def _detect_corrections(self, report_text: str) -> List[Dict[str, Any]]:
+        """Rule-based detection and correction, sorted by position"""
+        corrections = []
+        for _, detector_corrections in self._iter_detector_corrections(report_text):
+            corrections.extend(detector_corrections)
         
         # Sort corrections by position
         corrections.sort(key=lambda x: x['position'][0])
+        return corrections
+    
+    def _iter_detector_corrections(self, report_text: str) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Run the rule-based detectors one at a time, yielding
+        (detector name, corrections) as each finishes
+        """
+        # Tokenize once - every detector reads the same token array
+        tokens = tokenize_report(report_text)
+        
+        detectors = (
+            ('spelling', self._detect_spelling_errors),
+            ('grammar', self._detect_grammar_errors),
+            ('terminology', self._detect_medical_terminology_errors),
+            ('consistency', self._detect_consistency_errors),
+        )
+        for name, detect in detectors:
+            # 1. ERROR DETECTION
+            errors = detect(report_text, tokens)
+            
+            # 2. ERROR CORRECTION & 3. RECOMMENDATION WORDS
+            corrections = []
+            for error in errors:
+                correction = self._generate_correction_with_recommendation(error, report_text)
+                if correction:
+                    corrections.append(correction)
+            yield name, corrections
+    
+    def stream_medical_report_analysis(self, report_text: str, openai_api_key: str = None, model_name: str = "gpt-3.5-turbo") -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of analyze_medical_report
+        
+        Yields events as work finishes:
+          - 'corrections': one per rule-based detector, with its corrections
+          - 'ai_enhanced': the LLM-enhanced list replacing all earlier
+            corrections (only when AI enhancement is available)
+          - 'complete': corrected text, final corrections, summary and metadata
+        An identical earlier submission is answered from the result cache with
+        a single 'corrections' event (detector 'cache') and 'complete'.
+        """
+        if not report_text or not report_text.strip():
+            yield {'event': 'error', **self.analyze_medical_report(report_text)}
+            return
         
-        # Initialize temporary OpenAI client if API key provided
         temp_openai_client = None
         if openai_api_key and openai_api_key.strip():
             try:
@@ -328,13 +590,44 @@ class MedicalReportCorrectionService:
                 temp_openai_client = openai.OpenAI(api_key=openai_api_key)
             except Exception as e:
                 logger.warning(f"Failed to initialize temporary OpenAI client: {e}")
-        
-        # Generate enhanced corrections using AI if available
         ai_client = temp_openai_client or self.openai_client
+        
+        cache_key = self._result_cache_key(report_text, model_name, bool(ai_client))
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result is not None:
+            yield {'event': 'corrections', 'detector': 'cache', 'corrections': cached_result['corrections']}
+            yield self._complete_event(cached_result)
+            return
+        
+        corrections = []
+        for detector, detector_corrections in self._iter_detector_corrections(report_text):
+            corrections.extend(detector_corrections)
+            yield {'event': 'corrections', 'detector': detector, 'corrections': detector_corrections}
+        corrections.sort(key=lambda x: x['position'][0])
+        
+        ai_failed = False
         if ai_client and corrections:
             ai_enhanced_corrections = self._enhance_with_ai(report_text, corrections, ai_client, model_name)
-            corrections = ai_enhanced_corrections if ai_enhanced_corrections else corrections
+            ai_failed = not ai_enhanced_corrections
+            if ai_enhanced_corrections:
+                corrections = ai_enhanced_corrections
+                yield {'event': 'ai_enhanced', 'corrections': corrections}
         
+        result = self._build_analysis_result(report_text, corrections)
+        self._cache_result(cache_key, result, cacheable=not ai_failed)
+        yield self._complete_event(result)
+    
+    def _complete_event(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'event': 'complete',
+            'corrected_text': result['corrected_text'],
+            'corrections': result['corrections'],
+            'summary': result['summary'],
+            'metadata': result['metadata'],
+        }
+    
+    def _build_analysis_result(self, report_text: str, corrections: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Assemble the JSON analysis response for a set of corrections"""
         # Calculate confidence score
         confidence_score = self._calculate_confidence_score(report_text, corrections)
         
@@ -371,16 +664,14 @@ class MedicalReportCorrectionService:
             }
         }
     
-    def _detect_spelling_errors(self, text: str) -> List[Dict[str, Any]]:
+    def _detect_spelling_errors(self, text: str, tokens: Optional[TokenizedReport] = None) -> List[Dict[str, Any]]:
         """Enhanced spelling error detection including repeated characters and advanced patterns"""
         errors = []
+        tokens = tokens if tokens is not None else tokenize_report(text)
         
-        # Find all words with their positions in the original text
-        word_pattern = re.compile(r'\b\w+\b')
-        
-        for match in word_pattern.finditer(text):
-            word = match.group().lower()
-            original_word = match.group()
+        for token in tokens:
+            word = token.lower
+            original_word = token.text
             
             # 1. Check for repeated character patterns (like "suggesteddddddddd")
             repeated_char_correction = self._detect_repeated_characters(original_word)
@@ -390,7 +681,7 @@ class MedicalReportCorrectionService:
                     'subtype': 'repeated_characters',
                     'original': original_word,
                     'correction': repeated_char_correction,
-                    'position': (match.start(), match.end()),
+                    'position': token.position,
                     'confidence': 0.98,
                     'message': f'Repeated characters detected and corrected'
                 })
@@ -407,7 +698,7 @@ class MedicalReportCorrectionService:
                     'type': 'spelling',
                     'original': original_word,
                     'correction': corrected,
-                    'position': (match.start(), match.end()),
+                    'position': token.position,
                     'confidence': 0.95
                 })
                 continue
@@ -420,7 +711,7 @@ class MedicalReportCorrectionService:
                     'subtype': 'advanced_medical',
                     'original': original_word,
                     'correction': advanced_correction['correction'],
-                    'position': (match.start(), match.end()),
+                    'position': token.position,
                     'confidence': advanced_correction['confidence'],
                     'message': f'Advanced medical term correction: {advanced_correction["reason"]}'
                 })
@@ -435,9 +726,8 @@ class MedicalReportCorrectionService:
         if len(word) < 4:
             return None
         
-        # Pattern to find 3+ consecutive identical characters
-        repeated_pattern = re.compile(r'(.)\1{2,}')
-        matches = list(repeated_pattern.finditer(word.lower()))
+        # Find 3+ consecutive identical characters
+        matches = list(_REPEATED_CHAR_PATTERN.finditer(word.lower()))
         
         if not matches:
             return None
@@ -468,14 +758,9 @@ class MedicalReportCorrectionService:
         
         return corrected if corrected != word.lower() else None
     
-    def _detect_advanced_medical_patterns(self, word: str) -> Optional[Dict[str, Any]]:
-        """
-        Advanced pattern detection for medical terminology corrections
-        """
-        word_lower = word.lower()
-        
-        # Medical terms that commonly get misspelled
-        advanced_corrections = {
+    def _load_advanced_corrections(self) -> Dict[str, str]:
+        """Load advanced medical terminology corrections"""
+        return {
             # Common medical misspellings
             'suggestd': 'suggested',
             'sugestd': 'suggested', 
@@ -503,10 +788,29 @@ class MedicalReportCorrectionService:
             'parenchymal': 'parenchymal',  # Verify correct
             'degenerative': 'degenerative', # Verify correct
         }
+
+    def _build_correction_lexicon(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Combine the correction sources into one lexicon for fuzzy lookup
+        
+        Advanced corrections come first so they win ties at equal distance.
+        """
+        lexicon = {}
+        for incorrect, correct in self.advanced_corrections.items():
+            lexicon[incorrect] = (correct, 'advanced_medical')
+        for incorrect, correct in self.medical_dictionary.items():
+            lexicon.setdefault(incorrect, (correct, 'medical_dictionary'))
+        return lexicon
+    
+    def _detect_advanced_medical_patterns(self, word: str) -> Optional[Dict[str, Any]]:
+        """
+        Advanced pattern detection for medical terminology corrections
+        """
+        word_lower = word.lower()
         
         # Direct lookup
-        if word_lower in advanced_corrections:
-            corrected = advanced_corrections[word_lower]
+        if word_lower in self.advanced_corrections:
+            corrected = self.advanced_corrections[word_lower]
             # Preserve capitalization
             if word[0].isupper():
                 corrected = corrected.capitalize()
@@ -519,118 +823,113 @@ class MedicalReportCorrectionService:
                 'reason': 'Common medical terminology correction'
             }
         
-        # Fuzzy matching for close medical terms
-        for incorrect, correct in advanced_corrections.items():
-            if self._calculate_levenshtein_distance(word_lower, incorrect) <= 2 and len(word) > 3:
-                # Preserve capitalization
-                corrected = correct
-                if word[0].isupper():
-                    corrected = corrected.capitalize()
-                elif word.isupper():
-                    corrected = corrected.upper()
-                    
-                return {
-                    'correction': corrected,
-                    'confidence': 0.88,
-                    'reason': 'Fuzzy match medical terminology correction'
-                }
+        # Fuzzy matching for close medical terms, skipping words already spelled correctly
+        if len(word) <= 3 or word_lower in self.correct_forms:
+            return None
+        
+        for incorrect, distance, (correct, _source) in self.correction_index.lookup(word_lower, max_distance=2):
+            # Short entries must not absorb unrelated words
+            if distance * 2 >= len(incorrect) or correct == word_lower:
+                continue
+            
+            # Preserve capitalization
+            corrected = correct
+            if word[0].isupper():
+                corrected = corrected.capitalize()
+            elif word.isupper():
+                corrected = corrected.upper()
+                
+            return {
+                'correction': corrected,
+                'confidence': 0.88,
+                'reason': 'Fuzzy match medical terminology correction'
+            }
         
         return None
     
     def _calculate_levenshtein_distance(self, s1: str, s2: str) -> int:
         """Calculate Levenshtein distance between two strings"""
-        if len(s1) < len(s2):
-            return self._calculate_levenshtein_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        return levenshtein_distance(s1, s2)
     
-    def _detect_grammar_errors(self, text: str) -> List[Dict[str, Any]]:
+    def _detect_grammar_errors(self, text: str, tokens: Optional[TokenizedReport] = None) -> List[Dict[str, Any]]:
         """Detect grammar errors using rule-based patterns"""
         errors = []
+        vocabulary = (tokens if tokens is not None else tokenize_report(text)).vocabulary
         
-        for rule_name, rule_config in self.grammar_rules.items():
-            for pattern, error_type in rule_config['patterns']:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    errors.append({
-                        'type': 'grammar',
-                        'subtype': error_type,
-                        'original': match.group(),
-                        'position': (match.start(), match.end()),
-                        'confidence': 0.85,
-                        'rule': rule_name
-                    })
+        for rule_name, pattern, error_type, anchors in self.compiled_grammar_rules:
+            # Skip patterns whose trigger words never occur in this report
+            if anchors is not None and anchors.isdisjoint(vocabulary):
+                continue
+            for match in pattern.finditer(text):
+                errors.append({
+                    'type': 'grammar',
+                    'subtype': error_type,
+                    'original': match.group(),
+                    'position': (match.start(), match.end()),
+                    'confidence': 0.85,
+                    'rule': rule_name
+                })
         
         return errors
     
-    def _detect_medical_terminology_errors(self, text: str) -> List[Dict[str, Any]]:
+    def _detect_medical_terminology_errors(self, text: str, tokens: Optional[TokenizedReport] = None) -> List[Dict[str, Any]]:
         """
         RAG-Enhanced Medical Terminology Detection
         Uses knowledge bases (RadLex, SNOMED) for intelligent medical term correction
         """
         errors = []
+        tokens = tokens if tokens is not None else tokenize_report(text)
         
-        # Extract all words for medical term checking
-        words = re.finditer(r'\b[a-zA-Z]+\b', text)
+        # Medical term checking runs on purely alphabetic words
+        alpha_tokens = [
+            token for token in tokens.alpha_tokens()
+            if len(token.lower) >= 3 and token.lower not in _COMMON_WORDS  # Skip common non-medical words
+        ]
         
-        for match in words:
-            word = match.group().lower()
-            
-            # Skip common non-medical words
-            if len(word) < 3 or word in {'the', 'and', 'for', 'are', 'was', 'has', 'his', 'her', 'this', 'that', 'with', 'from', 'they', 'been', 'have', 'were', 'said', 'each', 'which', 'what', 'when', 'where', 'will', 'more', 'very', 'can', 'had', 'our', 'out', 'day', 'get', 'use', 'man', 'new', 'now', 'old', 'see', 'him', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use'}:
-                continue
+        # Resolve every distinct word the local dictionary does not cover in one RAG batch
+        rag_corrections = {}
+        if RAG_AVAILABLE and rag_retriever:
+            rag_words = {token.lower for token in alpha_tokens if token.lower not in self.medical_dictionary}
+            try:
+                rag_corrections = rag_retriever.get_corrections_with_context(rag_words)
+            except Exception as e:
+                logger.warning(f"RAG batch retrieval failed for {len(rag_words)} terms: {e}")
+        
+        for token in alpha_tokens:
+            word = token.lower
             
             # First check local dictionary
             if word in self.medical_dictionary:
                 errors.append({
                     'type': 'medical_terminology',
                     'subtype': 'spelling_correction',
-                    'original': match.group(),
+                    'original': token.text,
                     'correction': self.medical_dictionary[word],
-                    'position': (match.start(), match.end()),
+                    'position': token.position,
                     'confidence': 0.95,
                     'source': 'Local Medical Dictionary'
                 })
                 continue
             
             # RAG-Enhanced Medical Term Retrieval
-            if RAG_AVAILABLE and rag_retriever:
-                try:
-                    rag_correction = rag_retriever.get_correction_with_context(word)
-                    if rag_correction and rag_correction['confidence'] > 0.7:
-                        errors.append({
-                            'type': 'medical_terminology',
-                            'subtype': 'rag_correction',
-                            'original': match.group(),
-                            'correction': rag_correction['corrected_term'],
-                            'position': (match.start(), match.end()),
-                            'confidence': rag_correction['confidence'],
-                            'source': rag_correction['source'],
-                            'category': rag_correction['category'],
-                            'definition': rag_correction['definition'],
-                            'context': rag_correction['context'],
-                            'rag_enabled': True
-                        })
-                        continue
-                except Exception as e:
-                    logger.warning(f"RAG retrieval failed for '{word}': {e}")
+            rag_correction = rag_corrections.get(word)
+            if rag_correction and rag_correction['confidence'] > 0.7:
+                errors.append({
+                    'type': 'medical_terminology',
+                    'subtype': 'rag_correction',
+                    'original': token.text,
+                    'correction': rag_correction['corrected_term'],
+                    'position': token.position,
+                    'confidence': rag_correction['confidence'],
+                    'source': rag_correction['source'],
+                    'category': rag_correction['category'],
+                    'definition': rag_correction['definition'],
+                    'context': rag_correction['context'],
+                    'rag_enabled': True
+                })
         
         # Check for non-standard abbreviations (enhanced with RAG)
-        abbrev_pattern = r'\\b[A-Z]{2,}\\b'
-        abbreviations = re.finditer(abbrev_pattern, text)
+        abbreviations = _ABBREVIATION_PATTERN.finditer(text)
         
         for match in abbreviations:
             abbrev = match.group()
@@ -669,13 +968,13 @@ class MedicalReportCorrectionService:
         
         return errors
     
-    def _detect_consistency_errors(self, text: str) -> List[Dict[str, Any]]:
+    def _detect_consistency_errors(self, text: str, tokens: Optional[TokenizedReport] = None) -> List[Dict[str, Any]]:
         """Detect consistency issues in medical reports"""
         errors = []
         
         # Check tense consistency
-        past_tense_matches = list(re.finditer(r'\\b(was|were|showed|demonstrated)\\b', text, re.IGNORECASE))
-        present_tense_matches = list(re.finditer(r'\\b(is|are|shows|demonstrates)\\b', text, re.IGNORECASE))
+        past_tense_matches = list(_PAST_TENSE_PATTERN.finditer(text))
+        present_tense_matches = list(_PRESENT_TENSE_PATTERN.finditer(text))
         
         if past_tense_matches and present_tense_matches:
             # Mixed tense usage detected
@@ -786,12 +1085,11 @@ class MedicalReportCorrectionService:
         elif subtype == 'multiple_spaces':
             return ' '
         elif subtype == 'doctor_title_capitalization':
-            return re.sub(r'(?i)\bdr\s+([a-z])', r'Dr. \1', original, flags=re.IGNORECASE)
+            return _DOCTOR_TITLE_PATTERN.sub(r'Dr. \1', original)
         elif subtype in ['mr_title_capitalization', 'ms_title_capitalization', 'mrs_title_capitalization']:
             # Capitalize titles properly
-            return re.sub(r'(?i)\b(mr|ms|mrs)\s+([a-z])', 
-                         lambda m: f"{m.group(1).capitalize()}. {m.group(2).upper()}", 
-                         original, flags=re.IGNORECASE)
+            return _PERSON_TITLE_PATTERN.sub(
+                lambda m: f"{m.group(1).capitalize()}. {m.group(2).upper()}", original)
         else:
             return original  # Default fallback
     
@@ -816,14 +1114,9 @@ class MedicalReportCorrectionService:
         
         return word
     
-    def _enhance_with_ai(self, text: str, corrections: List[Dict[str, Any]], ai_client=None, model_name="gpt-3.5-turbo") -> Optional[List[Dict[str, Any]]]:
-        """Enhance corrections using OpenAI API"""
-        client = ai_client or self.openai_client
-        if not client:
-            return None
-        
-        try:
-            system_prompt = f"""You are an AI assistant specialized in medical text editing for radiology reports. 
+    def _build_enhancement_messages(self, text: str, corrections: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Chat messages asking the model to enhance corrections for a text"""
+        system_prompt = f"""You are an AI assistant specialized in medical text editing for radiology reports. 
 
 Task: Analyze the given radiology report text and enhance the provided corrections.
 
@@ -839,18 +1132,28 @@ For each correction, enhance the suggestion if needed and ensure the recommendat
 Return the enhanced corrections in the same JSON format.
 """
 
-            user_prompt = f"""
+        # Compact JSON keeps the prompt small for reports with many corrections
+        user_prompt = f"""
 Text: {text}
 
-Current corrections: {json.dumps(corrections, indent=2)}
+Current corrections: {json.dumps(corrections, separators=(',', ':'))}
 
 Please enhance these corrections while maintaining medical accuracy and professional tone.
 """
 
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _enhance_with_ai(self, text: str, corrections: List[Dict[str, Any]], ai_client=None, model_name="gpt-3.5-turbo") -> Optional[List[Dict[str, Any]]]:
+        """Enhance corrections using OpenAI API"""
+        client = ai_client or self.openai_client
+        if not client:
+            return None
+        
+        try:
+            messages = self._build_enhancement_messages(text, corrections)
             
             response, error = self._make_openai_request(messages, client, model_name)
             if error:
@@ -868,6 +1171,81 @@ Please enhance these corrections while maintaining medical accuracy and professi
             logger.warning(f"AI enhancement error: {e}")
             return None
     
+    async def _enhance_with_ai_async(self, text: str, corrections: List[Dict[str, Any]], llm_client: AsyncLLMClient) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Enhance corrections section by section with concurrent LLM requests
+        
+        Each section is sent with only its own corrections, rebased to section
+        offsets. Sections that time out, fail or return unusable JSON keep
+        their original corrections.
+        
+        Returns:
+            (corrections, metadata) where metadata describes per-section outcomes
+        """
+        sections = []
+        for chunk in split_report_sections(text):
+            chunk_corrections = [c for c in corrections if chunk.start <= c['position'][0] < chunk.end]
+            if chunk_corrections:
+                sections.append((chunk, chunk_corrections))
+        
+        def rebase(chunk_corrections, offset):
+            rebased = []
+            for correction in chunk_corrections:
+                start, end = correction['position']
+                rebased.append({**correction, 'position': [start + offset, end + offset]})
+            return rebased
+        
+        section_corrections = {id(chunk): chunk_corrections for chunk, chunk_corrections in sections}
+        results = await llm_client.run_chunks(
+            [chunk for chunk, _ in sections],
+            lambda chunk: self._build_enhancement_messages(
+                chunk.text, rebase(section_corrections[id(chunk)], -chunk.start)
+            ),
+        )
+        
+        enhanced = []
+        failed_sections = []
+        for result in results:
+            original = section_corrections[id(result.chunk)]
+            enhanced_section = self._parse_enhanced_section(result.content) if result.ok else None
+            if enhanced_section is None:
+                failed_sections.append({'section': result.chunk.name, 'status': result.status, 'error': result.error or 'invalid_response'})
+                enhanced.extend(original)
+            else:
+                enhanced.extend(rebase(enhanced_section, result.chunk.start))
+        
+        enhanced.sort(key=lambda x: x['position'][0])
+        metadata = {
+            'ai_enhanced': len(results) > len(failed_sections),
+            'ai_sections_total': len(results),
+            'ai_sections_enhanced': len(results) - len(failed_sections),
+            'ai_sections_failed': failed_sections,
+            'ai_partial': bool(failed_sections) and len(failed_sections) < len(results),
+            'ai_elapsed_max': round(max((r.elapsed for r in results), default=0.0), 3),
+        }
+        return enhanced, metadata
+    
+    def _parse_enhanced_section(self, response: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Parse a section's enhanced corrections, or None if they are unusable"""
+        try:
+            enhanced_corrections = json.loads(response or '')
+        except json.JSONDecodeError:
+            logger.warning("AI returned invalid JSON for a report section, using original corrections")
+            return None
+        
+        if not isinstance(enhanced_corrections, list) or not self._has_valid_positions(enhanced_corrections):
+            return None
+        return enhanced_corrections
+    
+    def _has_valid_positions(self, corrections: List[Any]) -> bool:
+        """Whether every correction is a dict with a [start, end] integer position"""
+        for correction in corrections:
+            position = correction.get('position') if isinstance(correction, dict) else None
+            if not (isinstance(position, (list, tuple)) and len(position) == 2
+                    and all(isinstance(offset, int) for offset in position)):
+                return False
+        return True
+    
     def _make_openai_request(self, messages: List[Dict[str, str]], client=None, model: str = "gpt-3.5-turbo") -> Tuple[Optional[str], Optional[str]]:
         """Make OpenAI API request with error handling"""
         openai_client = client or self.openai_client
@@ -931,6 +1309,10 @@ Please enhance these corrections while maintaining medical accuracy and professi
         """
         Apply all corrections to the original text to generate corrected version
         
+        Corrections are applied as span edits joined in a single pass. Only
+        overlapping corrections (e.g. capitalization after a period and a
+        spelling fix of the next word) are combined on their shared span.
+        
         Args:
             text: Original text
             corrections: List of corrections with position information
@@ -941,20 +1323,34 @@ Please enhance these corrections while maintaining medical accuracy and professi
         if not corrections:
             return text
         
-        # Sort corrections by position (descending) to avoid position shifts
-        sorted_corrections = sorted(corrections, key=lambda x: x['position'][0], reverse=True)
+        edits = [
+            SpanEdit(correction['position'][0], correction['position'][1], correction['suggestion'],
+                     correction.get('confidence', 0.0), payload=correction)
+            for correction in corrections
+        ]
+        return apply_span_edits(text, edits, self._combine_overlapping_corrections).text
+    
+    def _combine_overlapping_corrections(self, text: str, cluster: List[SpanEdit]) -> Optional[SpanEdit]:
+        """
+        Apply a group of overlapping corrections on their shared span
         
-        corrected_text = text
+        Corrections are applied from the right, each verified against the
+        span as already corrected, so they compose (e.g. "hylar" -> "hilar"
+        then ". h" -> ". H").
+        """
+        start = min(edit.start for edit in cluster)
+        end = max(edit.end for edit in cluster)
+        segment = text[start:end]
         
-        for correction in sorted_corrections:
-            start_pos, end_pos = correction['position']
-            original_word = correction['error']
-            suggested_word = correction['suggestion']
+        # Sort corrections by position (descending) to avoid position shifts
+        for edit in sorted(cluster, key=lambda x: x.start, reverse=True):
+            original_word = edit.payload['error']
+            suggested_word = edit.replacement
             
             # Verify the word at this position matches what we expect
-            actual_word = corrected_text[start_pos:end_pos]
+            actual_word = segment[edit.start - start:edit.end - start]
             
-            if actual_word.lower() == original_word.lower():
+            if actual_word and actual_word.lower() == original_word.lower():
                 # Apply the correction maintaining original capitalization pattern
                 if actual_word.isupper():
                     suggested_word = suggested_word.upper()
@@ -964,9 +1360,11 @@ Please enhance these corrections while maintaining medical accuracy and professi
                     suggested_word = suggested_word.capitalize()
                 
                 # Replace the text
-                corrected_text = corrected_text[:start_pos] + suggested_word + corrected_text[end_pos:]
+                segment = segment[:edit.start - start] + suggested_word + segment[edit.end - start:]
         
-        return corrected_text
+        if segment == text[start:end]:
+            return None
+        return SpanEdit(start, end, segment, payload=[edit.payload for edit in cluster])
     
     def _get_timestamp(self) -> str:
         """Get current timestamp in ISO format"""
@@ -0,0 +1,130 @@
+"""
+In-Process Caches
+=================
+
+Bounded, thread-safe LRU cache with per-entry expiry, used as a first tier
+in front of the shared Django cache. Entries are dropped least recently used
+first once max_entries (or, when set, the max_bytes size budget) is
+exceeded, and lazily when their TTL has passed.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with a TTL and hit/miss counters.
+
+    With max_bytes set, every entry is stored with a size (given by the
+    caller, len(value) by default) and the total is kept within the budget.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = 3600,
+                 max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_locked(self, key, now: float, default: Any) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, _size = entry
+        if expires_at is not None and expires_at <= now:
+            self._remove_locked(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def _set_locked(self, key, value: Any, now: float, ttl: Optional[float], size: Optional[int] = None):
+        if self.max_bytes is not None:
+            size = len(value) if size is None else size
+            if size > self.max_bytes:
+                # Larger than the whole budget - never cached
+                self._remove_locked(key)
+                return
+        else:
+            size = 0
+
+        self._remove_locked(key)
+        expires_at = now + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at, size)
+        self.total_bytes += size
+
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, key, default: Any = None) -> Any:
+        with self._lock:
+            return self._get_locked(key, time.monotonic(), default)
+
+    def get_many(self, keys: Iterable) -> Dict[Any, Any]:
+        """Values for the keys present and unexpired; missing keys are left out"""
+        missing = object()
+        found = {}
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                value = self._get_locked(key, now, missing)
+                if value is not missing:
+                    found[key] = value
+        return found
+
+    def set(self, key, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        with self._lock:
+            self._set_locked(key, value, time.monotonic(), self.ttl if ttl is None else ttl, size)
+
+    def set_many(self, items: Dict[Any, Any], ttl: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            for key, value in items.items():
+                self._set_locked(key, value, now, self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove_locked(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,148 @@
+"""
+Micro-Batching Queue
+====================
+
+Gathers items submitted by concurrent callers into batches for one call of
+a batch function (e.g. a padded seq2seq generate). A batch is dispatched
+when it reaches max_batch_size or max_wait_ms after its first item
+arrived, whichever comes first; results are scattered back to the waiting
+callers through futures.
+
+A single daemon worker thread per batcher runs the batch function, so the
+model is only ever driven by one batch at a time.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    In-process dynamic batching in front of process_batch(items) -> results.
+
+    process_batch must return one result per item, in order. If it raises,
+    every caller in that batch receives the exception.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 15.0, name: str = 'batcher'):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._items = 0
+        self._batches = 0
+        self._failed_batches = 0
+        self._queue_wait_total = 0.0
+        self._batch_seconds_total = 0.0
+        self._max_queue_depth = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+                self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the future resolves to its result"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def map(self, items: Sequence[Any], timeout: Optional[float] = None) -> List[Any]:
+        """
+        Submit items and wait for all their results, in order. On timeout or
+        error the items that have not started are cancelled, so the worker
+        drops them instead of computing results nobody reads.
+        """
+        futures = [self.submit(item) for item in items]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            return [
+                future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first item, then gather until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Callers that gave up (cancelled futures) are dropped from the batch
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.warning(f"Micro-batch of {len(items)} in '{self.name}' failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+
+            with self._stats_lock:
+                self._batches += 1
+                self._failed_batches += failed
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._queue_wait_total += sum(started - queued_at for _, _, queued_at in batch)
+                self._batch_seconds_total += time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, batch-size histogram and timing averages"""
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': batches,
+                'failed_batches': self._failed_batches,
+                'items': self._items,
+                'avg_batch_size': round(self._items / batches, 2) if batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'avg_queue_wait_ms': round(self._queue_wait_total / self._items * 1000.0, 2) if self._items else 0.0,
+                'avg_batch_ms': round(self._batch_seconds_total / batches * 1000.0, 2) if batches else 0.0,
+            }
@@ -0,0 +1,229 @@
+"""
+Model Registry
+==============
+
+Process-wide registry of heavyweight models (e.g. the T5 grammar model).
+Each model is loaded at most once per process, on first use or at worker
+boot (MODEL_WARMUP), and shared by every request after that.
+
+Torch thread counts are pinned before the first load (MODEL_TORCH_THREADS,
+MODEL_TORCH_INTEROP_THREADS) so concurrent workers do not oversubscribe
+the CPU. Models unused for MODEL_IDLE_TIMEOUT seconds are unloaded on the
+next registry access; 0 keeps them for the life of the process. A failed
+load is remembered for MODEL_LOAD_RETRY_SECONDS so a missing dependency
+does not cost an import attempt on every request.
+"""
+
+import gc
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelEntry:
+    """A registered model and its load/usage bookkeeping"""
+    name: str
+    loader: Callable[[], Any]
+    model: Any = None
+    loaded_at: Optional[float] = None
+    last_used: Optional[float] = None
+    load_seconds: Optional[float] = None
+    memory_bytes: Optional[int] = None
+    loads: int = 0
+    hits: int = 0
+    evictions: int = 0
+    error: Optional[BaseException] = None
+    failed_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+
+def estimate_memory_bytes(obj: Any) -> Optional[int]:
+    """
+    Parameter and buffer bytes of a torch model, or of each torch model in
+    a tuple/list (e.g. (tokenizer, model)); None when nothing is measurable.
+    """
+    if isinstance(obj, (tuple, list)):
+        sizes = [size for size in (estimate_memory_bytes(item) for item in obj) if size is not None]
+        return sum(sizes) if sizes else None
+
+    if not hasattr(obj, 'parameters'):
+        return None
+    try:
+        total = sum(p.numel() * p.element_size() for p in obj.parameters())
+        if hasattr(obj, 'buffers'):
+            total += sum(b.numel() * b.element_size() for b in obj.buffers())
+        return total
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Load-once, thread-safe model store with idle eviction and stats"""
+
+    def __init__(self, idle_timeout: Optional[float] = None, retry_seconds: Optional[float] = None,
+                 torch_threads: Optional[int] = None, torch_interop_threads: Optional[int] = None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(settings, 'MODEL_IDLE_TIMEOUT', 0)
+        self.retry_seconds = retry_seconds if retry_seconds is not None else getattr(settings, 'MODEL_LOAD_RETRY_SECONDS', 300)
+        self.torch_threads = torch_threads if torch_threads is not None else getattr(settings, 'MODEL_TORCH_THREADS', 0)
+        self.torch_interop_threads = (torch_interop_threads if torch_interop_threads is not None
+                                      else getattr(settings, 'MODEL_TORCH_INTEROP_THREADS', 0))
+        self._entries: Dict[str, ModelEntry] = {}
+        self._registry_lock = threading.Lock()
+        # One lock per model, so loading one model does not block users of another
+        self._model_locks: Dict[str, threading.Lock] = {}
+        self._torch_configured = False
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a loader; re-registering a name replaces its loader and unloads it"""
+        with self._registry_lock:
+            self._entries[name] = ModelEntry(name=name, loader=loader)
+            self._model_locks.setdefault(name, threading.Lock())
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str) -> Any:
+        """
+        The loaded model, loading it on first use.
+
+        Raises KeyError for an unknown name, and re-raises the load error
+        while a failed load is inside its retry window.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' is not registered")
+
+        self.evict_idle(exclude=name)
+
+        if not entry.loaded:
+            with self._model_locks[name]:
+                if not entry.loaded:
+                    self._load(entry)
+
+        entry.hits += 1
+        entry.last_used = time.monotonic()
+        return entry.model
+
+    def _load(self, entry: ModelEntry):
+        if entry.error is not None and time.monotonic() - entry.failed_at < self.retry_seconds:
+            raise entry.error
+
+        self._configure_torch()
+        started = time.perf_counter()
+        try:
+            model = entry.loader()
+        except Exception as e:
+            entry.error = e
+            entry.failed_at = time.monotonic()
+            logger.warning(f"Loading model '{entry.name}' failed: {e}")
+            raise
+
+        entry.model = model
+        entry.load_seconds = time.perf_counter() - started
+        entry.memory_bytes = estimate_memory_bytes(model)
+        entry.loaded_at = entry.last_used = time.monotonic()
+        entry.loads += 1
+        entry.error = entry.failed_at = None
+        logger.info(f"Loaded model '{entry.name}' in {entry.load_seconds:.2f}s"
+                    + (f" ({entry.memory_bytes / (1024 * 1024):.1f} MB)" if entry.memory_bytes else ""))
+
+    def _configure_torch(self):
+        """Pin torch thread pools once, before the first model is loaded"""
+        if self._torch_configured:
+            return
+        self._torch_configured = True
+        if not (self.torch_threads or self.torch_interop_threads):
+            return
+
+        try:
+            import torch
+        except ImportError:
+            return
+
+        if self.torch_threads:
+            torch.set_num_threads(self.torch_threads)
+        if self.torch_interop_threads:
+            try:
+                torch.set_num_interop_threads(self.torch_interop_threads)
+            except RuntimeError as e:
+                # Only allowed before torch starts any inter-op work
+                logger.warning(f"Could not set torch inter-op threads: {e}")
+
+    def warm_up(self, names: Iterable[str]) -> Dict[str, bool]:
+        """Load the named models now; returns name -> loaded"""
+        results = {}
+        for name in names:
+            try:
+                self.get(name)
+                results[name] = True
+            except Exception as e:
+                logger.warning(f"Warm-up of model '{name}' failed: {e}")
+                results[name] = False
+        return results
+
+    def unload(self, name: str) -> bool:
+        """Drop a loaded model so its memory can be reclaimed"""
+        entry = self._entries.get(name)
+        if entry is None or not entry.loaded:
+            return False
+
+        with self._model_locks[name]:
+            if not entry.loaded:
+                return False
+            entry.model = None
+            entry.loaded_at = None
+            entry.evictions += 1
+        gc.collect()
+        logger.info(f"Unloaded model '{name}'")
+        return True
+
+    def evict_idle(self, exclude: Optional[str] = None) -> int:
+        """Unload models idle longer than idle_timeout; returns the number unloaded"""
+        if not self.idle_timeout:
+            return 0
+
+        now = time.monotonic()
+        evicted = 0
+        for name, entry in list(self._entries.items()):
+            if name != exclude and entry.loaded and now - entry.last_used > self.idle_timeout:
+                evicted += self.unload(name)
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model load time, memory footprint and usage"""
+        now = time.monotonic()
+        models = {}
+        for name, entry in self._entries.items():
+            models[name] = {
+                'loaded': entry.loaded,
+                'load_seconds': round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                'memory_bytes': entry.memory_bytes,
+                'loads': entry.loads,
+                'hits': entry.hits,
+                'evictions': entry.evictions,
+                'idle_seconds': round(now - entry.last_used, 1) if entry.loaded else None,
+                'last_error': str(entry.error) if entry.error is not None else None,
+            }
+        return {
+            'idle_timeout': self.idle_timeout,
+            'torch_threads': self.torch_threads or None,
+            'models': models,
+        }
+
+
+# Process-wide registry
+model_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return model_registry
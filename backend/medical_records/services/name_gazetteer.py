@@ -0,0 +1,282 @@
+"""
+Name Gazetteer
+==============
+
+Decides whether a capitalized word pair such as "John Smith" is a person's
+name instead of a medical phrase such as "Pleural Effusion". A candidate is
+rejected only when one of its words is a medical term (the stoplist built
+from the knowledge base). Pairs with a known first name or surname get a
+higher confidence; unknown pairs are still treated as names, at a lower
+confidence, unless full first-name and surname lists were configured, in
+which case a known name is required.
+
+First names and surnames are held in Bloom filters: a lookup hashes the
+word once and tests a fixed number of bits, and large gazetteers (the
+Census surname and SSA first-name lists) take about 1.8 bytes per name at
+a 0.1% false-positive rate. A false positive only means a word is treated
+as a name, so the filters themselves can only over-redact.
+
+The gazetteer is written to a single file by the build_name_gazetteer
+management command and opened with mmap, so every worker process on a
+host shares the same pages. This module has no Django imports, so batch
+worker processes can load it directly.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_MAGIC = b'PHIGAZ01'
+GAZETTEER_FORMAT_VERSION = 1
+_HEADER_LENGTH = struct.Struct('<I')
+
+# Always part of the gazetteer, so names are recognised even without the
+# external name lists configured
+BUILTIN_FIRST_NAMES = (
+    'aaron', 'abigail', 'adam', 'ahmed', 'aisha', 'alan', 'albert', 'alex', 'alexander', 'alice',
+    'alicia', 'amanda', 'amy', 'ana', 'andrea', 'andrew', 'angela', 'ann', 'anna', 'anne', 'anthony',
+    'arthur', 'ashley', 'barbara', 'benjamin', 'betty', 'beverly', 'billy', 'bobby', 'brandon',
+    'brenda', 'brian', 'bruce', 'carl', 'carlos', 'carol', 'carolyn', 'catherine', 'charles',
+    'charlotte', 'cheryl', 'chloe', 'christina', 'christine', 'christopher', 'cynthia', 'daniel',
+    'david', 'deborah', 'debra', 'dennis', 'diana', 'diane', 'donald', 'donna', 'doris', 'dorothy',
+    'douglas', 'dylan', 'edward', 'elizabeth', 'emily', 'emma', 'eric', 'ethan', 'eugene', 'evelyn',
+    'fatima', 'frances', 'frank', 'gary', 'george', 'gerald', 'gloria', 'grace', 'gregory', 'hannah',
+    'harold', 'heather', 'helen', 'henry', 'isabella', 'jack', 'jacob', 'jacqueline', 'james',
+    'janet', 'janice', 'jason', 'jean', 'jeffrey', 'jennifer', 'jeremy', 'jerry', 'jesse', 'jessica',
+    'joan', 'joe', 'john', 'johnny', 'jonathan', 'jose', 'joseph', 'joshua', 'joyce', 'juan', 'judith',
+    'judy', 'julia', 'julie', 'justin', 'karen', 'katherine', 'kathleen', 'kathryn', 'kayla', 'keith',
+    'kelly', 'kenneth', 'kevin', 'kimberly', 'kyle', 'larry', 'laura', 'lauren', 'lawrence', 'linda',
+    'lisa', 'logan', 'lori', 'louis', 'madison', 'margaret', 'maria', 'marie', 'marilyn', 'mark',
+    'martha', 'mary', 'matthew', 'megan', 'melissa', 'michael', 'michelle', 'mohammed', 'nancy',
+    'natalie', 'nathan', 'nicholas', 'nicole', 'noah', 'olivia', 'pamela', 'patricia', 'patrick',
+    'paul', 'peter', 'philip', 'rachel', 'ralph', 'randy', 'raymond', 'rebecca', 'richard', 'robert',
+    'roger', 'ronald', 'rose', 'roy', 'russell', 'ruth', 'ryan', 'samantha', 'samuel', 'sandra',
+    'sara', 'sarah', 'scott', 'sean', 'sharon', 'shirley', 'sophia', 'stephanie', 'stephen', 'steven',
+    'susan', 'teresa', 'terry', 'theresa', 'thomas', 'timothy', 'tyler', 'victoria', 'vincent',
+    'virginia', 'walter', 'wayne', 'william', 'willie', 'zachary',
+)
+BUILTIN_SURNAMES = (
+    'adams', 'ahmed', 'alexander', 'ali', 'allen', 'alvarez', 'anderson', 'bailey', 'baker', 'barnes',
+    'bell', 'bennett', 'brooks', 'brown', 'bryant', 'butler', 'campbell', 'carter', 'castillo',
+    'chavez', 'chen', 'clark', 'coleman', 'collins', 'cook', 'cooper', 'cox', 'cruz', 'davis', 'diaz',
+    'edwards', 'evans', 'fisher', 'flores', 'ford', 'foster', 'garcia', 'gibson', 'gomez', 'gonzales',
+    'gonzalez', 'graham', 'gray', 'green', 'griffin', 'gutierrez', 'hall', 'hamilton', 'harris',
+    'hayes', 'henderson', 'hernandez', 'hill', 'howard', 'hughes', 'jackson', 'james', 'jenkins',
+    'johnson', 'jones', 'jordan', 'kelly', 'khan', 'kim', 'king', 'lee', 'lewis', 'long', 'lopez',
+    'martin', 'martinez', 'mendoza', 'miller', 'mitchell', 'moore', 'morales', 'morgan', 'morris',
+    'murphy', 'myers', 'nelson', 'nguyen', 'ortiz', 'parker', 'patel', 'perez', 'perry', 'peterson',
+    'phillips', 'powell', 'price', 'ramirez', 'reed', 'reyes', 'richardson', 'rivera', 'roberts',
+    'robinson', 'rodriguez', 'rogers', 'ross', 'russell', 'sanchez', 'sanders', 'scott', 'shah',
+    'simmons', 'singh', 'smith', 'stewart', 'sullivan', 'taylor', 'thomas', 'thompson', 'torres',
+    'turner', 'walker', 'wallace', 'ward', 'washington', 'watson', 'white', 'williams', 'wilson',
+    'wood', 'wright', 'young',
+)
+
+
+# Confidence of a candidate pair with no known first name or surname
+UNKNOWN_NAME_CONFIDENCE = 0.6
+
+
+def normalize_name(word: str) -> str:
+    return word.strip().lower()
+
+
+def read_name_list(path: str) -> Iterator[str]:
+    """
+    Names from a list file: one per line, or CSV/TSV with the name in the
+    first column (as in the SSA and Census downloads). Blank lines and
+    '#' comments are skipped.
+    """
+    with open(path, encoding='utf-8', errors='ignore') as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name = normalize_name(re.split(r'[,\t]', line, maxsplit=1)[0])
+            if name.isalpha():
+                yield name
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over a bytes-like bit array.
+
+    Bit positions come from double hashing one 128-bit BLAKE2b digest, so a
+    lookup costs one hash and `hashes` bit tests whatever the set size.
+    """
+
+    def __init__(self, bits: int, hashes: int, data=None):
+        self.bits = max(8, bits)
+        self.hashes = max(1, hashes)
+        self.data = data if data is not None else bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        """A filter sized for capacity keys at the given false-positive rate"""
+        capacity = max(1, capacity)
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        return cls(bits, round(bits / capacity * math.log(2)))
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        for index in range(self.hashes):
+            yield (first + index * second) % self.bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        data = self.data
+        return all(data[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+
+class NameGazetteer:
+    """First-name and surname Bloom filters plus the medical stoplist"""
+
+    def __init__(self, first_names: BloomFilter, surnames: BloomFilter, stoplist: Iterable[str],
+                 meta: Optional[Dict[str, Any]] = None):
+        self.first_names = first_names
+        self.surnames = surnames
+        self.stoplist = frozenset(stoplist)
+        self.meta = meta or {}
+        # Only with full name lists is an unknown pair evidence of a non-name
+        self.require_known_name = bool(self.meta.get('full_name_lists'))
+
+    @classmethod
+    def build(cls, first_names: Iterable[str], surnames: Iterable[str], stoplist: Iterable[str],
+              error_rate: float = 0.001, meta: Optional[Dict[str, Any]] = None) -> 'NameGazetteer':
+        first_names = {normalize_name(name) for name in first_names}
+        surnames = {normalize_name(name) for name in surnames}
+        filters = []
+        for names in (first_names, surnames):
+            bloom = BloomFilter.for_capacity(len(names), error_rate)
+            for name in names:
+                bloom.add(name)
+            filters.append(bloom)
+        meta = {**(meta or {}), 'first_names': len(first_names), 'surnames': len(surnames)}
+        return cls(filters[0], filters[1], stoplist, meta)
+
+    def name_confidence(self, first: str, last: str) -> Optional[float]:
+        """Confidence that the word pair is a person's name, or None if it is not"""
+        first, last = normalize_name(first), normalize_name(last)
+        if first in self.stoplist or last in self.stoplist:
+            return None
+        known_first, known_last = first in self.first_names, last in self.surnames
+        if known_first and known_last:
+            return 0.9
+        if known_first or known_last:
+            return 0.75
+        return None if self.require_known_name else UNKNOWN_NAME_CONFIDENCE
+
+    def is_name(self, text: str) -> bool:
+        words = text.split()
+        return len(words) >= 2 and self.name_confidence(words[0], words[-1]) is not None
+
+    def write(self, path: str):
+        """Write the gazetteer file atomically, replacing any previous one"""
+        sections = {}
+        offset = 0
+        for key, bloom in (('first_names', self.first_names), ('surnames', self.surnames)):
+            sections[key] = {'bits': bloom.bits, 'hashes': bloom.hashes, 'offset': offset, 'nbytes': bloom.nbytes}
+            offset += bloom.nbytes
+        header = json.dumps({
+            'format_version': GAZETTEER_FORMAT_VERSION,
+            'meta': self.meta,
+            'sections': sections,
+            'stoplist': sorted(self.stoplist),
+        }).encode('utf-8')
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            handle.write(GAZETTEER_MAGIC)
+            handle.write(_HEADER_LENGTH.pack(len(header)))
+            handle.write(header)
+            handle.write(self.first_names.data)
+            handle.write(self.surnames.data)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> 'NameGazetteer':
+        """Map a gazetteer file read-only; the filters read straight from the mapping"""
+        with open(path, 'rb') as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        header, data_start = _read_header(mapped)
+        view = memoryview(mapped)
+        filters = []
+        for key in ('first_names', 'surnames'):
+            section = header['sections'][key]
+            start = data_start + section['offset']
+            filters.append(BloomFilter(section['bits'], section['hashes'], view[start:start + section['nbytes']]))
+        return cls(filters[0], filters[1], header['stoplist'], header.get('meta'))
+
+
+def _read_header(buffer) -> Tuple[Dict[str, Any], int]:
+    prefix = len(GAZETTEER_MAGIC)
+    if bytes(buffer[:prefix]) != GAZETTEER_MAGIC:
+        raise ValueError('Not a name gazetteer file')
+    (length,) = _HEADER_LENGTH.unpack(bytes(buffer[prefix:prefix + _HEADER_LENGTH.size]))
+    start = prefix + _HEADER_LENGTH.size
+    header = json.loads(bytes(buffer[start:start + length]))
+    if header.get('format_version') != GAZETTEER_FORMAT_VERSION:
+        raise ValueError(f"Unsupported gazetteer format {header.get('format_version')}")
+    return header, start + length
+
+
+def read_gazetteer_meta(path: str) -> Dict[str, Any]:
+    """Build metadata of a gazetteer file, or {} if it is missing or unreadable"""
+    try:
+        with open(path, 'rb') as handle:
+            prefix = handle.read(len(GAZETTEER_MAGIC) + _HEADER_LENGTH.size)
+            (length,) = _HEADER_LENGTH.unpack(prefix[len(GAZETTEER_MAGIC):])
+            header, _ = _read_header(prefix + handle.read(length))
+    except (OSError, ValueError, struct.error):
+        return {}
+    return header.get('meta') or {}
+
+
+_gazetteers: Dict[str, Tuple[int, Optional[NameGazetteer]]] = {}
+_gazetteers_lock = threading.Lock()
+
+
+def load_gazetteer(path: Optional[str]) -> Optional[NameGazetteer]:
+    """
+    The gazetteer at path, mapped once per process and re-opened when the
+    file is replaced. None if there is no usable file.
+    """
+    if not path:
+        return None
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _gazetteers.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _gazetteers_lock:
+        cached = _gazetteers.get(path)
+        if cached is None or cached[0] != stamp:
+            try:
+                gazetteer = NameGazetteer.open(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Name gazetteer {path} is unusable: {e}")
+                gazetteer = None
+            cached = (stamp, gazetteer)
+            _gazetteers[path] = cached
+    return cached[1]
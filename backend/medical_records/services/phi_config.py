@@ -0,0 +1,176 @@
+"""
+PHI Detector Configuration
+==========================
+
+Resolves which PHI detectors are active from the default
+AnonymizationConfiguration and hands out the matching compiled engine.
+The active selection is cached in the Django cache under a key holding
+the default configuration's id, version and last update. Each call reads
+only that stamp, one small query, so a saved or replaced configuration
+takes effect in every worker process on its next request, whatever the
+cache backend.
+
+Also builds the name gazetteer file used to confirm name candidates. It
+combines the built-in and configured first-name and surname lists with a
+stoplist of words taken from the medical knowledge base. The file is
+stamped with a checksum of those inputs and rebuilt when they change.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import AnonymizationConfiguration
+from .name_gazetteer import (
+    BUILTIN_FIRST_NAMES, BUILTIN_SURNAMES, GAZETTEER_FORMAT_VERSION, NameGazetteer,
+    read_gazetteer_meta, read_name_list,
+)
+from .phi_detection import DEFAULT_DETECTORS, PhiDetectionEngine, get_engine, select_detectors
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'phi_detectors'
+CACHE_TIMEOUT = 3600
+
+
+def _default_configurations():
+    return (AnonymizationConfiguration.objects.filter(is_default=True, is_active=True)
+            .order_by('-version', '-created_at'))
+
+
+def get_active_detectors() -> Tuple[str, ...]:
+    """Detector names for the current default configuration, highest priority first"""
+    try:
+        current = _default_configurations().values_list('pk', 'version', 'updated_at').first()
+    except Exception as e:
+        # e.g. the table is missing on a fresh database
+        logger.warning(f"Anonymization configuration unavailable, using built-in detectors: {e}")
+        return DEFAULT_DETECTORS
+
+    if current is None:
+        config_version = 'builtin'
+    else:
+        pk, version, updated_at = current
+        config_version = f"{pk}:{version}:{updated_at.timestamp() if updated_at else ''}"
+    cache_key = f"{CACHE_KEY_PREFIX}:{config_version}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    config = _default_configurations().filter(pk=current[0]).first() if current else None
+    detectors = select_detectors(config.config_json if config else None)
+    cache.set(cache_key, list(detectors), CACHE_TIMEOUT)
+    return detectors
+
+
+def get_phi_engine() -> PhiDetectionEngine:
+    """The compiled detection engine for the current configuration"""
+    return get_engine(get_active_detectors(), get_gazetteer_path())
+
+
+def gazetteer_path() -> str:
+    return getattr(settings, 'PHI_NAME_GAZETTEER_PATH',
+                   os.path.join(settings.BASE_DIR, 'medical_data', 'name_gazetteer.bin'))
+
+
+def _name_list_files() -> Tuple[str, str]:
+    return getattr(settings, 'PHI_FIRST_NAMES_FILE', ''), getattr(settings, 'PHI_SURNAMES_FILE', '')
+
+
+def medical_stoplist() -> Set[str]:
+    """Every word of three or more letters in knowledge base terms and synonyms"""
+    from .rag_medical_service import rag_retriever
+
+    knowledge_base = rag_retriever.knowledge_base
+    cursor = knowledge_base.get_connection().cursor()
+    words = set()
+    queries = [f'SELECT term_lower FROM {table}' for table in knowledge_base.TERM_TABLES]
+    queries.append('SELECT synonym_lower FROM term_synonyms')
+    for query in queries:
+        for (term,) in cursor.execute(query):
+            words.update(re.findall(r'[a-z]{3,}', term or ''))
+    return words
+
+
+def _gazetteer_stamp() -> str:
+    """Checksum of everything the gazetteer file is built from"""
+    from .rag_medical_service import rag_retriever
+
+    sources = []
+    for path in _name_list_files():
+        if path:
+            try:
+                stat = os.stat(path)
+                sources.append([path, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                sources.append([path, None, None])
+    payload = json.dumps({
+        'format_version': GAZETTEER_FORMAT_VERSION,
+        'knowledge_base': rag_retriever.knowledge_base.version,
+        'builtin': [BUILTIN_FIRST_NAMES, BUILTIN_SURNAMES],
+        'sources': sources,
+        'error_rate': getattr(settings, 'PHI_NAME_GAZETTEER_ERROR_RATE', 0.001),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_name_gazetteer(force: bool = False) -> Optional[NameGazetteer]:
+    """
+    Write the gazetteer file unless it is already current. Returns the built
+    gazetteer, or None if the existing file was kept.
+    """
+    path = gazetteer_path()
+    stamp = _gazetteer_stamp()
+    if not force and read_gazetteer_meta(path).get('stamp') == stamp:
+        return None
+
+    first_names, surnames = set(BUILTIN_FIRST_NAMES), set(BUILTIN_SURNAMES)
+    loaded = []
+    for names, source in zip((first_names, surnames), _name_list_files()):
+        if source:
+            before = len(names)
+            names.update(read_name_list(source))
+            loaded.append(len(names) > before)
+        else:
+            loaded.append(False)
+
+    # Unknown pairs are only rejected once both full name lists are in place
+    gazetteer = NameGazetteer.build(first_names, surnames, medical_stoplist(),
+                                    error_rate=getattr(settings, 'PHI_NAME_GAZETTEER_ERROR_RATE', 0.001),
+                                    meta={'stamp': stamp, 'full_name_lists': all(loaded)})
+    gazetteer.write(path)
+    logger.info(f"Built name gazetteer at {path}: {gazetteer.meta['first_names']} first names, "
+                f"{gazetteer.meta['surnames']} surnames, {len(gazetteer.stoplist)} stopwords")
+    return gazetteer
+
+
+_gazetteer_checked = False
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer_path() -> Optional[str]:
+    """
+    Path of a current name gazetteer, building it on first use in this
+    process if it is missing or stale. None if no gazetteer is available,
+    in which case name candidates are not filtered.
+    """
+    global _gazetteer_checked
+    path = gazetteer_path()
+    if not _gazetteer_checked:
+        with _gazetteer_lock:
+            if not _gazetteer_checked:
+                try:
+                    if build_name_gazetteer():
+                        logger.warning("Name gazetteer was missing or outdated and has been rebuilt. "
+                                       "Run 'manage.py build_name_gazetteer' at deploy time to avoid this.")
+                except Exception as e:
+                    logger.error(f"Could not build the name gazetteer: {e}")
+                _gazetteer_checked = True
+    return path if os.path.exists(path) else None
@@ -6,16 +6,25 @@ This service connects to medical terminology databases (RadLex, SNOMED, ICD-10)
 to provide intelligent medical term corrections and suggestions.
 """
 
+import hashlib
 import json
+import logging
 import sqlite3
 import os
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 from difflib import SequenceMatcher
 import requests
 from django.conf import settings
 from django.core.cache import cache
 
+from .fuzzy_index import NgramIndex
+from .memory_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class MedicalTerm:
@@ -29,23 +38,254 @@ class MedicalTerm:
     context: str  # Additional context for the term
 
 
+# Cached marker for lookups that found nothing, so they are not repeated
+NO_MATCH = '__no_match__'
+
+# Knowledge base build stamp. Bump KB_SCHEMA_VERSION whenever the table
+# layout changes; content changes are picked up through the seed checksum.
+KB_SCHEMA_VERSION = 2
+
+# Seed terminology written by build_medical_kb
+RADLEX_SEED_TERMS = [
+    # Radiology-specific terms
+    {"radlex_id": "RID5825", "preferred_name": "opacity", "synonyms": "opasity,opacty,opacitiy", 
+     "definition": "Area of increased attenuation on radiographic images", "body_part": "chest"},
+    {"radlex_id": "RID1301", "preferred_name": "consolidation", "synonyms": "consolidaton,consolidatoin", 
+     "definition": "Complete filling of alveoli with fluid or cellular material", "body_part": "lung"},
+    {"radlex_id": "RID28476", "preferred_name": "atelectasis", "synonyms": "atelecasis,atelectesis", 
+     "definition": "Collapse or incomplete expansion of lung tissue", "body_part": "lung"},
+    {"radlex_id": "RID34952", "preferred_name": "pneumothorax", "synonyms": "pneumotorax,pnuemothorax", 
+     "definition": "Presence of air in pleural space", "body_part": "chest"},
+    {"radlex_id": "RID1363", "preferred_name": "effusion", "synonyms": "effuson,efusion", 
+     "definition": "Abnormal collection of fluid", "body_part": "pleura"},
+    {"radlex_id": "RID1240", "preferred_name": "diaphragm", "synonyms": "diaphram,diafragm", 
+     "definition": "Dome-shaped muscle separating thorax from abdomen", "body_part": "thorax"},
+    {"radlex_id": "RID2468", "preferred_name": "costophrenic", "synonyms": "costophranic,costofrenic", 
+     "definition": "Relating to ribs and diaphragm", "body_part": "chest"},
+    {"radlex_id": "RID1326", "preferred_name": "hilar", "synonyms": "hylar,hiler", 
+     "definition": "Relating to the hilum of the lung", "body_part": "lung"},
+]
+
+SNOMED_SEED_TERMS = [
+    # Clinical conditions
+    {"snomed_id": "44054006", "term": "fibrosis", "synonyms": "fibriosis,fibrsis", 
+     "semantic_tag": "disorder", "definition": "Formation of excess fibrous tissue"},
+    {"snomed_id": "233604007", "term": "pneumonia", "synonyms": "pnuemonia,pneummonia", 
+     "semantic_tag": "disorder", "definition": "Inflammatory condition of the lung"},
+    {"snomed_id": "195967001", "term": "asthma", "synonyms": "asma,astma", 
+     "semantic_tag": "disorder", "definition": "Respiratory condition with airway inflammation"},
+    {"snomed_id": "87433001", "term": "emphysema", "synonyms": "emfysema,emphisema", 
+     "semantic_tag": "disorder", "definition": "Lung condition with enlarged air spaces"},
+    {"snomed_id": "56717001", "term": "tuberculosis", "synonyms": "tubercolosis,tuburculosis", 
+     "semantic_tag": "disorder", "definition": "Infectious disease caused by Mycobacterium tuberculosis"},
+    {"snomed_id": "13645005", "term": "chronic", "synonyms": "cronic,chronik", 
+     "semantic_tag": "qualifier", "definition": "Long-term or persistent condition"},
+    {"snomed_id": "89138009", "term": "carcinoma", "synonyms": "carsinoma,carcinomma", 
+     "semantic_tag": "neoplasm", "definition": "Malignant tumor of epithelial origin"},
+]
+
+# (term, correct_spelling, category, definition, source)
+COMMON_MISSPELLINGS = [
+    # Anatomy
+    ("diaphram", "diaphragm", "anatomy", "Dome-shaped respiratory muscle", "RadLex"),
+    ("fibriosis", "fibrosis", "pathology", "Formation of fibrous tissue", "SNOMED"),
+    ("opasity", "opacity", "radiology", "Area of increased density on imaging", "RadLex"),
+    ("costophranic", "costophrenic", "anatomy", "Relating to ribs and diaphragm", "RadLex"),
+    ("hylar", "hilar", "anatomy", "Relating to lung hilum", "RadLex"),
+    
+    # Pathology
+    ("pnuemonia", "pneumonia", "pathology", "Lung infection", "SNOMED"),
+    ("tubercolosis", "tuberculosis", "pathology", "TB infection", "SNOMED"),
+    ("carsinoma", "carcinoma", "pathology", "Malignant tumor", "SNOMED"),
+    ("scolliosis", "scoliosis", "pathology", "Spinal curvature", "SNOMED"),
+    
+    # Procedures
+    ("bronchoscopy", "bronchoscopy", "procedure", "Examination of airways", "SNOMED"),
+    ("tomograhpy", "tomography", "procedure", "Imaging technique", "RadLex"),
+]
+
+ANATOMICAL_TERMS = [
+    ("vertebra", "vertebrae", "anatomy", "Spinal bone", "RadLex"),
+    ("sternum", "sternum", "anatomy", "Breastbone", "RadLex"),
+    ("clavicle", "clavicle", "anatomy", "Collarbone", "RadLex"),
+    ("scapula", "scapula", "anatomy", "Shoulder blade", "RadLex"),
+    ("thorax", "thorax", "anatomy", "Chest cavity", "RadLex"),
+    ("abdomen", "abdomen", "anatomy", "Belly", "RadLex"),
+    ("pelvis", "pelvis", "anatomy", "Hip region", "RadLex"),
+]
+
+PATHOLOGY_TERMS = [
+    ("fibrosis", "fibrosis", "pathology", "Tissue scarring", "SNOMED"),
+    ("necrosis", "necrosis", "pathology", "Tissue death", "SNOMED"),
+    ("inflammation", "inflammation", "pathology", "Immune response", "SNOMED"),
+    ("ischemia", "ischemia", "pathology", "Reduced blood flow", "SNOMED"),
+    ("infarction", "infarction", "pathology", "Tissue death from lack of blood", "SNOMED"),
+]
+
+
+def seed_checksum() -> str:
+    """Checksum of the seed terminology, stamped into the built database."""
+    payload = json.dumps([
+        RADLEX_SEED_TERMS,
+        SNOMED_SEED_TERMS,
+        COMMON_MISSPELLINGS,
+        ANATOMICAL_TERMS,
+        PATHOLOGY_TERMS,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
 class MedicalKnowledgeBase:
     """
     RAG-enabled medical knowledge base for intelligent terminology correction.
+    
+    The SQLite file is written by the build_medical_kb management command and
+    stamped with the schema version and seed checksum. Startup only opens the
+    file; it is rebuilt in-process only when missing or stale.
     """
     
-    def __init__(self):
+    # Tables holding terms, with the column that gets normalized into term_lower
+    TERM_TABLES = {
+        'medical_terms': 'term',
+        'radlex_terms': 'preferred_name',
+        'snomed_terms': 'term',
+    }
+    
+    def __init__(self, auto_build: bool = True):
         self.db_path = os.path.join(settings.BASE_DIR, 'medical_data', 'medical_knowledge.db')
-        self.initialize_database()
-        self.load_medical_terminologies()
+        self.mmap_size = 256 * 1024 * 1024
+        self.build_timeout = 30  # seconds to wait for another process' build
+        self._local = threading.local()
+        self.version_check_interval = 30  # seconds between kb_meta re-reads
+        self._version = None
+        self._version_checked_at = 0.0
+        
+        if self.is_current():
+            self._refresh_version()
+        elif auto_build:
+            logger.warning("Medical knowledge base missing or outdated; building it now. "
+                           "Run 'manage.py build_medical_kb' at deploy time to avoid this.")
+            self.build()
     
-    def initialize_database(self):
-        """Initialize SQLite database for medical knowledge storage."""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+    @property
+    def expected_stamp(self) -> Dict[str, str]:
+        return {'schema_version': str(KB_SCHEMA_VERSION), 'content_checksum': seed_checksum()}
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Return this thread's read-only connection to the knowledge base.
         
+        Connections are opened once per thread and reused for every lookup,
+        with memory-mapped I/O enabled and writes refused.
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+            conn.execute('PRAGMA temp_store = MEMORY')
+            conn.execute('PRAGMA query_only = ON')
+            self._local.connection = conn
+        return conn
+    
+    def _read_meta(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        try:
+            return dict(conn.execute('SELECT key, value FROM kb_meta').fetchall())
+        except sqlite3.DatabaseError:
+            return {}
+    
+    def _stamp_matches(self, meta: Dict[str, str]) -> bool:
+        return all(meta.get(key) == value for key, value in self.expected_stamp.items())
+    
+    def is_current(self) -> bool:
+        """Whether the database file exists and matches the current schema and seed data."""
+        if not os.path.exists(self.db_path):
+            return False
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        try:
+            return self._stamp_matches(self._read_meta(conn))
+        finally:
+            conn.close()
+    
+    def _read_version(self) -> str:
+        """Short version string of the built knowledge base, used in cache keys."""
+        meta = self._read_meta(self.get_connection())
+        return (f"{meta.get('schema_version', '0')}-{meta.get('content_checksum', '')[:12]}"
+                f"-{meta.get('built_at', '')}")
+    
+    def _refresh_version(self) -> Optional[str]:
+        self._version = self._read_version()
+        self._version_checked_at = time.monotonic()
+        return self._version
+    
+    @property
+    def version(self) -> Optional[str]:
+        """
+        Version of the built knowledge base, re-read from kb_meta at most every
+        version_check_interval seconds, so a rebuild by another process (which
+        may only touch the -wal file) is picked up.
+        """
+        if self._version is not None and time.monotonic() - self._version_checked_at < self.version_check_interval:
+            return self._version
+        if not os.path.exists(self.db_path):
+            return self._version
+        return self._refresh_version()
+    
+    def current_version(self) -> Optional[str]:
+        """The version read from kb_meta now, bypassing the check interval."""
+        if not os.path.exists(self.db_path):
+            return self._version
+        return self._refresh_version()
+    
+    def build(self, force: bool = False) -> bool:
+        """
+        Write the knowledge base in a single transaction and stamp its version.
         
+        Holds the SQLite write lock for the whole build, so processes starting
+        together build once and the rest find a current stamp. Returns True if
+        this call wrote the database.
+        """
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        
+        conn = sqlite3.connect(self.db_path, timeout=self.build_timeout, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            
+            if not force and self._stamp_matches(self._read_meta(conn)):
+                conn.execute('ROLLBACK')
+                return False
+            
+            self._create_schema(cursor)
+            for table in (*self.TERM_TABLES, 'term_synonyms'):
+                cursor.execute(f'DELETE FROM {table}')
+            self.load_medical_terminologies(cursor)
+            
+            cursor.executemany(
+                'INSERT OR REPLACE INTO kb_meta (key, value) VALUES (?, ?)',
+                [*self.expected_stamp.items(), ('built_at', str(time.time()))],
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        # Threads holding a connection to the old file contents reopen lazily
+        self._local = threading.local()
+        self._refresh_version()
+        return True
+    
+    def _ensure_column(self, cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table created by an older schema."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create the medical knowledge storage tables."""
         # Create tables for medical terminology
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS medical_terms (
@@ -56,6 +296,7 @@ class MedicalKnowledgeBase:
                 definition TEXT,
                 source TEXT,
                 synonyms TEXT,
+                term_lower TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
@@ -67,7 +308,8 @@ class MedicalKnowledgeBase:
                 preferred_name TEXT,
                 synonyms TEXT,
                 definition TEXT,
-                body_part TEXT
+                body_part TEXT,
+                term_lower TEXT
             )
         ''')
         
@@ -78,178 +320,104 @@ class MedicalKnowledgeBase:
                 term TEXT,
                 synonyms TEXT,
                 semantic_tag TEXT,
-                definition TEXT
+                definition TEXT,
+                term_lower TEXT
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kb_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
             )
         ''')
         
+        # Individual synonyms, one row each, so synonym hits are index seeks
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS term_synonyms (
+                id INTEGER PRIMARY KEY,
+                synonym_lower TEXT NOT NULL,
+                source_table TEXT NOT NULL,
+                term_id INTEGER NOT NULL
+            )
+        ''')
+        
+        # Databases created before term_lower existed
+        for table in self.TERM_TABLES:
+            self._ensure_column(cursor, table, 'term_lower', 'TEXT')
+        
         # Create indexes for fast retrieval
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_term ON medical_terms(term)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_correct_spelling ON medical_terms(correct_spelling)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_radlex_name ON radlex_terms(preferred_name)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_snomed_term ON snomed_terms(term)')
-        
-        conn.commit()
-        conn.close()
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_medical_term_lower ON medical_terms(term_lower)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_radlex_term_lower ON radlex_terms(term_lower)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_snomed_term_lower ON snomed_terms(term_lower)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_synonym_lower ON term_synonyms(synonym_lower, source_table)')
     
-    def load_medical_terminologies(self):
+    def load_medical_terminologies(self, cursor: sqlite3.Cursor):
         """Load comprehensive medical terminology databases."""
-        self._load_radlex_terms()
-        self._load_snomed_terms()
-        self._load_common_misspellings()
-        self._load_anatomical_terms()
-        self._load_pathology_terms()
+        self._load_radlex_terms(cursor)
+        self._load_snomed_terms(cursor)
+        self._load_common_misspellings(cursor)
+        self._load_anatomical_terms(cursor)
+        self._load_pathology_terms(cursor)
+        self._rebuild_lookup_columns(cursor)
     
-    def _load_radlex_terms(self):
+    def _rebuild_lookup_columns(self, cursor: sqlite3.Cursor):
+        """Refresh term_lower columns and the term_synonyms table from the term tables."""
+        for table, column in self.TERM_TABLES.items():
+            cursor.execute(f'UPDATE {table} SET term_lower = LOWER({column})')
+        
+        cursor.execute('DELETE FROM term_synonyms')
+        for table in self.TERM_TABLES:
+            cursor.execute(f'SELECT id, synonyms FROM {table} WHERE synonyms IS NOT NULL')
+            rows = []
+            for term_id, synonyms in cursor.fetchall():
+                for synonym in {part.strip().lower() for part in synonyms.split(',')}:
+                    if synonym:
+                        rows.append((synonym, table, term_id))
+            cursor.executemany('''
+                INSERT INTO term_synonyms (synonym_lower, source_table, term_id)
+                VALUES (?, ?, ?)
+            ''', rows)
+    
+    def _load_radlex_terms(self, cursor: sqlite3.Cursor):
         """Load RadLex (Radiology Lexicon) terms for radiology-specific terminology."""
-        radlex_terms = [
-            # Radiology-specific terms
-            {"radlex_id": "RID5825", "preferred_name": "opacity", "synonyms": "opasity,opacty,opacitiy", 
-             "definition": "Area of increased attenuation on radiographic images", "body_part": "chest"},
-            {"radlex_id": "RID1301", "preferred_name": "consolidation", "synonyms": "consolidaton,consolidatoin", 
-             "definition": "Complete filling of alveoli with fluid or cellular material", "body_part": "lung"},
-            {"radlex_id": "RID28476", "preferred_name": "atelectasis", "synonyms": "atelecasis,atelectesis", 
-             "definition": "Collapse or incomplete expansion of lung tissue", "body_part": "lung"},
-            {"radlex_id": "RID34952", "preferred_name": "pneumothorax", "synonyms": "pneumotorax,pnuemothorax", 
-             "definition": "Presence of air in pleural space", "body_part": "chest"},
-            {"radlex_id": "RID1363", "preferred_name": "effusion", "synonyms": "effuson,efusion", 
-             "definition": "Abnormal collection of fluid", "body_part": "pleura"},
-            {"radlex_id": "RID1240", "preferred_name": "diaphragm", "synonyms": "diaphram,diafragm", 
-             "definition": "Dome-shaped muscle separating thorax from abdomen", "body_part": "thorax"},
-            {"radlex_id": "RID2468", "preferred_name": "costophrenic", "synonyms": "costophranic,costofrenic", 
-             "definition": "Relating to ribs and diaphragm", "body_part": "chest"},
-            {"radlex_id": "RID1326", "preferred_name": "hilar", "synonyms": "hylar,hiler", 
-             "definition": "Relating to the hilum of the lung", "body_part": "lung"},
-        ]
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for term in radlex_terms:
-            cursor.execute('''
-                INSERT OR REPLACE INTO radlex_terms 
-                (radlex_id, preferred_name, synonyms, definition, body_part)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (term["radlex_id"], term["preferred_name"], term["synonyms"], 
-                  term["definition"], term["body_part"]))
-        
-        conn.commit()
-        conn.close()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO radlex_terms 
+            (radlex_id, preferred_name, synonyms, definition, body_part)
+            VALUES (:radlex_id, :preferred_name, :synonyms, :definition, :body_part)
+        ''', RADLEX_SEED_TERMS)
     
-    def _load_snomed_terms(self):
+    def _load_snomed_terms(self, cursor: sqlite3.Cursor):
         """Load SNOMED CT terms for clinical terminology."""
-        snomed_terms = [
-            # Clinical conditions
-            {"snomed_id": "44054006", "term": "fibrosis", "synonyms": "fibriosis,fibrsis", 
-             "semantic_tag": "disorder", "definition": "Formation of excess fibrous tissue"},
-            {"snomed_id": "233604007", "term": "pneumonia", "synonyms": "pnuemonia,pneummonia", 
-             "semantic_tag": "disorder", "definition": "Inflammatory condition of the lung"},
-            {"snomed_id": "195967001", "term": "asthma", "synonyms": "asma,astma", 
-             "semantic_tag": "disorder", "definition": "Respiratory condition with airway inflammation"},
-            {"snomed_id": "87433001", "term": "emphysema", "synonyms": "emfysema,emphisema", 
-             "semantic_tag": "disorder", "definition": "Lung condition with enlarged air spaces"},
-            {"snomed_id": "56717001", "term": "tuberculosis", "synonyms": "tubercolosis,tuburculosis", 
-             "semantic_tag": "disorder", "definition": "Infectious disease caused by Mycobacterium tuberculosis"},
-            {"snomed_id": "13645005", "term": "chronic", "synonyms": "cronic,chronik", 
-             "semantic_tag": "qualifier", "definition": "Long-term or persistent condition"},
-            {"snomed_id": "89138009", "term": "carcinoma", "synonyms": "carsinoma,carcinomma", 
-             "semantic_tag": "neoplasm", "definition": "Malignant tumor of epithelial origin"},
-        ]
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for term in snomed_terms:
-            cursor.execute('''
-                INSERT OR REPLACE INTO snomed_terms 
-                (snomed_id, term, synonyms, semantic_tag, definition)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (term["snomed_id"], term["term"], term["synonyms"], 
-                  term["semantic_tag"], term["definition"]))
-        
-        conn.commit()
-        conn.close()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO snomed_terms 
+            (snomed_id, term, synonyms, semantic_tag, definition)
+            VALUES (:snomed_id, :term, :synonyms, :semantic_tag, :definition)
+        ''', SNOMED_SEED_TERMS)
     
-    def _load_common_misspellings(self):
+    def _insert_medical_terms(self, cursor: sqlite3.Cursor, terms: List[Tuple[str, str, str, str, str]]):
+        cursor.executemany('''
+            INSERT INTO medical_terms 
+            (term, correct_spelling, category, definition, source, synonyms)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(term, correct, category, definition, source, term)
+              for term, correct, category, definition, source in terms])
+    
+    def _load_common_misspellings(self, cursor: sqlite3.Cursor):
         """Load common medical term misspellings and their corrections."""
-        common_misspellings = [
-            # Anatomy
-            ("diaphram", "diaphragm", "anatomy", "Dome-shaped respiratory muscle", "RadLex"),
-            ("fibriosis", "fibrosis", "pathology", "Formation of fibrous tissue", "SNOMED"),
-            ("opasity", "opacity", "radiology", "Area of increased density on imaging", "RadLex"),
-            ("costophranic", "costophrenic", "anatomy", "Relating to ribs and diaphragm", "RadLex"),
-            ("hylar", "hilar", "anatomy", "Relating to lung hilum", "RadLex"),
-            
-            # Pathology
-            ("pnuemonia", "pneumonia", "pathology", "Lung infection", "SNOMED"),
-            ("tubercolosis", "tuberculosis", "pathology", "TB infection", "SNOMED"),
-            ("carsinoma", "carcinoma", "pathology", "Malignant tumor", "SNOMED"),
-            ("scolliosis", "scoliosis", "pathology", "Spinal curvature", "SNOMED"),
-            
-            # Procedures
-            ("bronchoscopy", "bronchoscopy", "procedure", "Examination of airways", "SNOMED"),
-            ("tomograhpy", "tomography", "procedure", "Imaging technique", "RadLex"),
-        ]
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for incorrect, correct, category, definition, source in common_misspellings:
-            cursor.execute('''
-                INSERT OR REPLACE INTO medical_terms 
-                (term, correct_spelling, category, definition, source, synonyms)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (incorrect, correct, category, definition, source, incorrect))
-        
-        conn.commit()
-        conn.close()
+        self._insert_medical_terms(cursor, COMMON_MISSPELLINGS)
     
-    def _load_anatomical_terms(self):
+    def _load_anatomical_terms(self, cursor: sqlite3.Cursor):
         """Load comprehensive anatomical terminology."""
-        anatomical_terms = [
-            ("vertebra", "vertebrae", "anatomy", "Spinal bone", "RadLex"),
-            ("sternum", "sternum", "anatomy", "Breastbone", "RadLex"),
-            ("clavicle", "clavicle", "anatomy", "Collarbone", "RadLex"),
-            ("scapula", "scapula", "anatomy", "Shoulder blade", "RadLex"),
-            ("thorax", "thorax", "anatomy", "Chest cavity", "RadLex"),
-            ("abdomen", "abdomen", "anatomy", "Belly", "RadLex"),
-            ("pelvis", "pelvis", "anatomy", "Hip region", "RadLex"),
-        ]
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for term, correct, category, definition, source in anatomical_terms:
-            cursor.execute('''
-                INSERT OR REPLACE INTO medical_terms 
-                (term, correct_spelling, category, definition, source, synonyms)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (term, correct, category, definition, source, term))
-        
-        conn.commit()
-        conn.close()
+        self._insert_medical_terms(cursor, ANATOMICAL_TERMS)
     
-    def _load_pathology_terms(self):
+    def _load_pathology_terms(self, cursor: sqlite3.Cursor):
         """Load pathology and disease terminology."""
-        pathology_terms = [
-            ("fibrosis", "fibrosis", "pathology", "Tissue scarring", "SNOMED"),
-            ("necrosis", "necrosis", "pathology", "Tissue death", "SNOMED"),
-            ("inflammation", "inflammation", "pathology", "Immune response", "SNOMED"),
-            ("ischemia", "ischemia", "pathology", "Reduced blood flow", "SNOMED"),
-            ("infarction", "infarction", "pathology", "Tissue death from lack of blood", "SNOMED"),
-        ]
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for term, correct, category, definition, source in pathology_terms:
-            cursor.execute('''
-                INSERT OR REPLACE INTO medical_terms 
-                (term, correct_spelling, category, definition, source, synonyms)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (term, correct, category, definition, source, term))
-        
-        conn.commit()
-        conn.close()
+        self._insert_medical_terms(cursor, PATHOLOGY_TERMS)
 
 
 class RAGMedicalRetriever:
@@ -257,9 +425,30 @@ class RAGMedicalRetriever:
     RAG retrieval service for medical terminology correction.
     """
     
+    # Columns returned for exact matches, per table
+    EXACT_MATCH_COLUMNS = {
+        'medical_terms': 't.term, t.correct_spelling, t.category, t.definition, t.source',
+        'radlex_terms': 't.preferred_name, t.synonyms, t.definition, t.body_part, t.radlex_id',
+        'snomed_terms': 't.term, t.synonyms, t.definition, t.semantic_tag, t.snomed_id',
+    }
+    
     def __init__(self):
         self.knowledge_base = MedicalKnowledgeBase()
         self.similarity_threshold = 0.6
+        self.sql_batch_size = 400  # terms per IN list; each query binds the list twice
+        
+        # Two-tier lookup cache: bounded in-process LRU, then the shared Django cache
+        self.cache_timeout = 3600  # Cache for 1 hour
+        self.local_cache = LRUCache(max_entries=20000, ttl=self.cache_timeout)
+        self._cache_counters = {'shared_hits': 0, 'misses': 0}
+        
+        # In-memory n-gram index for fuzzy candidate generation
+        self.fuzzy_candidate_limit = 50
+        self.index_refresh_interval = 30  # seconds between knowledge base change checks
+        self._fuzzy_index = None
+        self._fuzzy_index_stamp = None
+        self._fuzzy_index_checked_at = 0.0
+        self._fuzzy_index_lock = threading.Lock()
     
     def retrieve_medical_term(self, query_term: str, limit: int = 5) -> List[MedicalTerm]:
         """
@@ -272,45 +461,154 @@ class RAGMedicalRetriever:
         Returns:
             List of MedicalTerm objects with corrections and context
         """
-        cache_key = f"medical_term_{query_term.lower()}"
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return cached_result
+        return self.retrieve_many([query_term], limit)[query_term]
+    
+    def _cache_key(self, query_term: str) -> str:
+        # Versioned by knowledge base content so a rebuild invalidates both tiers
+        return f"medical_term:{self.knowledge_base.version}:{query_term.lower()}"
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters of the term lookup cache tiers.
         
-        # Step 1: Exact match search
-        exact_matches = self._search_exact_match(query_term)
-        if exact_matches:
-            cache.set(cache_key, exact_matches, 3600)  # Cache for 1 hour
-            return exact_matches
+        local_* counters describe the in-process LRU; shared_hits and misses
+        count lookups that fell through to the shared cache.
+        """
+        return {
+            **{f'local_{name}': value for name, value in self.local_cache.stats().items()},
+            **self._cache_counters,
+        }
+    
+    def _get_cached(self, cache_keys: List[str]) -> Dict[str, List[MedicalTerm]]:
+        """Read cached lookups, local tier first, then the shared Django cache."""
+        cached = self.local_cache.get_many(cache_keys)
+        shared_keys = [key for key in cache_keys if key not in cached]
+        
+        if shared_keys:
+            shared = cache.get_many(shared_keys)
+            if shared:
+                self.local_cache.set_many(shared)
+                cached.update(shared)
+            self._cache_counters['shared_hits'] += len(shared)
+            self._cache_counters['misses'] += len(shared_keys) - len(shared)
         
-        # Step 2: Fuzzy matching with similarity scoring
-        fuzzy_matches = self._search_fuzzy_match(query_term, limit)
-        if fuzzy_matches:
-            cache.set(cache_key, fuzzy_matches, 3600)
-            return fuzzy_matches
+        return {
+            key: [] if value == NO_MATCH else value
+            for key, value in cached.items()
+        }
+    
+    def _set_cached(self, entries: Dict[str, List[MedicalTerm]]):
+        """Write lookups to both tiers, storing empty results as NO_MATCH."""
+        entries = {key: value or NO_MATCH for key, value in entries.items()}
+        self.local_cache.set_many(entries)
+        cache.set_many(entries, self.cache_timeout)
+    
+    def retrieve_many(self, query_terms: Iterable[str], limit: int = 5) -> Dict[str, List[MedicalTerm]]:
+        """
+        Retrieve medical terms for many query terms at once.
+        
+        Duplicates are looked up once, cache hits are fetched in a single
+        pass over the local and shared tiers, exact matches for the remaining
+        terms come from one batched query per table, and new results
+        (including "no match") are written back to both tiers.
         
-        # Step 3: Semantic search (if available)
-        semantic_matches = self._search_semantic_match(query_term, limit)
+        Returns:
+            Dictionary mapping each distinct query term to its matches
+        """
+        unique_terms = list(dict.fromkeys(query_terms))
+        if not unique_terms:
+            return {}
+        
+        cache_keys = {term: self._cache_key(term) for term in unique_terms}
+        cached = self._get_cached(list(set(cache_keys.values())))
+        
+        results = {}
+        misses = []
+        for term in unique_terms:
+            cached_result = cached.get(cache_keys[term])
+            if cached_result is not None:
+                results[term] = cached_result
+            else:
+                misses.append(term)
+        
+        if not misses:
+            return results
+        
+        # Step 1: Exact match search, batched
+        exact_matches = self._search_exact_many(misses)
+        
+        to_cache = {}
+        for term in misses:
+            matches = exact_matches.get(term)
+            
+            # Step 2: Fuzzy matching with similarity scoring
+            if not matches:
+                matches = self._search_fuzzy_match(term, limit)
+            
+            # Step 3: Semantic search (if available)
+            if not matches:
+                matches = self._search_semantic_match(term, limit)
+            
+            results[term] = matches
+            to_cache.setdefault(cache_keys[term], matches)
         
-        cache.set(cache_key, semantic_matches, 3600)
-        return semantic_matches
+        self._set_cached(to_cache)
+        return results
     
     def _search_exact_match(self, query_term: str) -> List[MedicalTerm]:
         """Search for exact matches in the knowledge base."""
-        conn = sqlite3.connect(self.knowledge_base.db_path)
-        cursor = conn.cursor()
-        
-        results = []
+        return self._search_exact_many([query_term]).get(query_term, [])
+    
+    def _search_exact_many(self, query_terms: List[str]) -> Dict[str, List[MedicalTerm]]:
+        """
+        Search for exact matches of several terms in the knowledge base.
         
-        # Search in medical_terms table
-        cursor.execute('''
-            SELECT term, correct_spelling, category, definition, source
-            FROM medical_terms 
-            WHERE LOWER(term) = LOWER(?) OR LOWER(synonyms) LIKE LOWER(?)
-        ''', (query_term, f'%{query_term}%'))
+        Matches the normalized term_lower column or a single synonym in
+        term_synonyms, both of which are indexed. Each table is queried once
+        per chunk of terms instead of once per term.
+        """
+        terms_by_key: Dict[str, List[str]] = {}
+        for term in query_terms:
+            terms_by_key.setdefault(term.lower(), []).append(term)
+        keys = list(terms_by_key)
+        
+        # Matching rows per lowercased key and table, in knowledge base order
+        rows_by_key = {key: {table: {} for table in self.knowledge_base.TERM_TABLES} for key in keys}
+        cursor = self.knowledge_base.get_connection().cursor()
+        
+        for offset in range(0, len(keys), self.sql_batch_size):
+            chunk = keys[offset:offset + self.sql_batch_size]
+            placeholders = ','.join('?' * len(chunk))
+            
+            for table, columns in self.EXACT_MATCH_COLUMNS.items():
+                cursor.execute(f'''
+                    SELECT t.term_lower, t.id, {columns}
+                    FROM {table} t
+                    WHERE t.term_lower IN ({placeholders})
+                    UNION ALL
+                    SELECT s.synonym_lower, t.id, {columns}
+                    FROM term_synonyms s JOIN {table} t ON t.id = s.term_id
+                    WHERE s.source_table = ? AND s.synonym_lower IN ({placeholders})
+                ''', (*chunk, table, *chunk))
+                
+                for key, row_id, *row in cursor.fetchall():
+                    rows_by_key[key][table].setdefault(row_id, row)
+        
+        results = {}
+        for key, tables in rows_by_key.items():
+            for term in terms_by_key[key]:
+                matches = []
+                for table, rows in tables.items():
+                    for row_id in sorted(rows):
+                        matches.append(self._exact_match_term(table, rows[row_id], term))
+                results[term] = matches
         
-        for row in cursor.fetchall():
-            term = MedicalTerm(
+        return results
+    
+    def _exact_match_term(self, table: str, row: tuple, query_term: str) -> MedicalTerm:
+        """Build the MedicalTerm for an exact match row of the given table."""
+        if table == 'medical_terms':
+            return MedicalTerm(
                 term=row[0],
                 correct_spelling=row[1],
                 category=row[2] or "general",
@@ -319,17 +617,8 @@ class RAGMedicalRetriever:
                 confidence=1.0,
                 context=f"Exact match found in {row[4]} database"
             )
-            results.append(term)
-        
-        # Search RadLex terms
-        cursor.execute('''
-            SELECT preferred_name, synonyms, definition, body_part, radlex_id
-            FROM radlex_terms 
-            WHERE LOWER(preferred_name) = LOWER(?) OR LOWER(synonyms) LIKE LOWER(?)
-        ''', (query_term, f'%{query_term}%'))
-        
-        for row in cursor.fetchall():
-            term = MedicalTerm(
+        if table == 'radlex_terms':
+            return MedicalTerm(
                 term=query_term,
                 correct_spelling=row[0],
                 category="radiology",
@@ -338,67 +627,89 @@ class RAGMedicalRetriever:
                 confidence=1.0,
                 context=f"RadLex ID: {row[4]}, Body part: {row[3]}"
             )
-            results.append(term)
-        
-        # Search SNOMED terms
-        cursor.execute('''
-            SELECT term, synonyms, definition, semantic_tag, snomed_id
-            FROM snomed_terms 
-            WHERE LOWER(term) = LOWER(?) OR LOWER(synonyms) LIKE LOWER(?)
-        ''', (query_term, f'%{query_term}%'))
-        
-        for row in cursor.fetchall():
-            term = MedicalTerm(
-                term=query_term,
-                correct_spelling=row[0],
-                category=row[3] or "clinical",
-                definition=row[2] or "Clinical term",
-                source="SNOMED CT",
-                confidence=1.0,
-                context=f"SNOMED ID: {row[4]}, Semantic tag: {row[3]}"
-            )
-            results.append(term)
-        
-        conn.close()
-        return results
+        return MedicalTerm(
+            term=query_term,
+            correct_spelling=row[0],
+            category=row[3] or "clinical",
+            definition=row[2] or "Clinical term",
+            source="SNOMED CT",
+            confidence=1.0,
+            context=f"SNOMED ID: {row[4]}, Semantic tag: {row[3]}"
+        )
     
-    def _search_fuzzy_match(self, query_term: str, limit: int) -> List[MedicalTerm]:
-        """Search for fuzzy matches using similarity scoring."""
-        conn = sqlite3.connect(self.knowledge_base.db_path)
-        cursor = conn.cursor()
+    def _knowledge_base_stamp(self) -> Optional[str]:
+        """Version stamp from the knowledge base's kb_meta row, used to detect rebuilds"""
+        return self.knowledge_base.current_version()
+    
+    def _build_fuzzy_index(self) -> NgramIndex:
+        """Load every term from the knowledge base into an n-gram index."""
+        cursor = self.knowledge_base.get_connection().cursor()
         
-        results = []
+        index = NgramIndex(n=3)
         
-        # Get all terms for fuzzy matching
         cursor.execute('''
             SELECT term, correct_spelling, category, definition, source
             FROM medical_terms
         ''')
-        
-        medical_terms = cursor.fetchall()
+        for row in cursor.fetchall():
+            index.add(row[0].lower(), ('medical_terms', row))
         
         cursor.execute('''
             SELECT preferred_name, synonyms, definition, body_part, radlex_id
             FROM radlex_terms
         ''')
-        
-        radlex_terms = cursor.fetchall()
+        for row in cursor.fetchall():
+            index.add(row[0].lower(), ('radlex_terms', row))
         
         cursor.execute('''
             SELECT term, synonyms, definition, semantic_tag, snomed_id
             FROM snomed_terms
         ''')
+        for row in cursor.fetchall():
+            index.add(row[0].lower(), ('snomed_terms', row))
+        
+        return index
+    
+    def _get_fuzzy_index(self) -> NgramIndex:
+        """Return the fuzzy index, rebuilding it when the knowledge base changed."""
+        now = time.monotonic()
+        if self._fuzzy_index is not None and now - self._fuzzy_index_checked_at < self.index_refresh_interval:
+            return self._fuzzy_index
+        
+        with self._fuzzy_index_lock:
+            stamp = self._knowledge_base_stamp()
+            if self._fuzzy_index is None or stamp != self._fuzzy_index_stamp:
+                self._fuzzy_index = self._build_fuzzy_index()
+                self._fuzzy_index_stamp = stamp
+            self._fuzzy_index_checked_at = now
+        
+        return self._fuzzy_index
+    
+    def _search_fuzzy_match(self, query_term: str, limit: int) -> List[MedicalTerm]:
+        """
+        Search for fuzzy matches using similarity scoring.
         
-        snomed_terms = cursor.fetchall()
+        Candidates come from the n-gram index, so only the best few dozen
+        terms are scored instead of every row in the knowledge base.
+        """
+        query_lower = query_term.lower()
+        candidates = self._get_fuzzy_index().candidates(
+            query_lower, limit=max(self.fuzzy_candidate_limit, limit)
+        )
+        
+        # Keep knowledge base order so equal similarities rank as before
+        candidates.sort(key=lambda candidate: candidate[0])
         
         # Calculate similarity scores
-        candidates = []
+        scored = []
         
-        # Process medical terms
-        for row in medical_terms:
-            similarity = SequenceMatcher(None, query_term.lower(), row[0].lower()).ratio()
-            if similarity >= self.similarity_threshold:
-                candidates.append((similarity, MedicalTerm(
+        for _entry_id, _overlap, key, (table, row) in candidates:
+            similarity = SequenceMatcher(None, query_lower, key).ratio()
+            if similarity < self.similarity_threshold:
+                continue
+            
+            if table == 'medical_terms':
+                scored.append((similarity, MedicalTerm(
                     term=row[0],
                     correct_spelling=row[1],
                     category=row[2] or "general",
@@ -407,12 +718,8 @@ class RAGMedicalRetriever:
                     confidence=similarity,
                     context=f"Fuzzy match (similarity: {similarity:.2f})"
                 )))
-        
-        # Process RadLex terms
-        for row in radlex_terms:
-            similarity = SequenceMatcher(None, query_term.lower(), row[0].lower()).ratio()
-            if similarity >= self.similarity_threshold:
-                candidates.append((similarity, MedicalTerm(
+            elif table == 'radlex_terms':
+                scored.append((similarity, MedicalTerm(
                     term=query_term,
                     correct_spelling=row[0],
                     category="radiology",
@@ -421,12 +728,8 @@ class RAGMedicalRetriever:
                     confidence=similarity,
                     context=f"RadLex ID: {row[4]}, Body part: {row[3]}, similarity: {similarity:.2f}"
                 )))
-        
-        # Process SNOMED terms
-        for row in snomed_terms:
-            similarity = SequenceMatcher(None, query_term.lower(), row[0].lower()).ratio()
-            if similarity >= self.similarity_threshold:
-                candidates.append((similarity, MedicalTerm(
+            else:
+                scored.append((similarity, MedicalTerm(
                     term=query_term,
                     correct_spelling=row[0],
                     category=row[3] or "clinical",
@@ -437,11 +740,8 @@ class RAGMedicalRetriever:
                 )))
         
         # Sort by similarity and return top results
-        candidates.sort(key=lambda x: x[0], reverse=True)
-        results = [candidate[1] for candidate in candidates[:limit]]
-        
-        conn.close()
-        return results
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [candidate[1] for candidate in scored[:limit]]
     
     def _search_semantic_match(self, query_term: str, limit: int) -> List[MedicalTerm]:
         """Placeholder for semantic search (can be enhanced with embeddings)."""
@@ -456,24 +756,35 @@ class RAGMedicalRetriever:
         Returns:
             Dictionary with correction, confidence, source, and context
         """
-        matches = self.retrieve_medical_term(incorrect_term, limit=1)
-        
-        if not matches:
-            return None
-        
-        best_match = matches[0]
+        return self.get_corrections_with_context([incorrect_term])[incorrect_term]
+    
+    def get_corrections_with_context(self, incorrect_terms: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Batch version of get_correction_with_context.
         
-        return {
-            'original_term': incorrect_term,
-            'corrected_term': best_match.correct_spelling,
-            'confidence': best_match.confidence,
-            'source': best_match.source,
-            'category': best_match.category,
-            'definition': best_match.definition,
-            'context': best_match.context,
-            'rag_enabled': True,
-            'medical_database': best_match.source
-        }
+        Returns:
+            Dictionary mapping each distinct term to its correction, or None
+        """
+        corrections = {}
+        for incorrect_term, matches in self.retrieve_many(incorrect_terms, limit=1).items():
+            if not matches:
+                corrections[incorrect_term] = None
+                continue
+            
+            best_match = matches[0]
+            
+            corrections[incorrect_term] = {
+                'original_term': incorrect_term,
+                'corrected_term': best_match.correct_spelling,
+                'confidence': best_match.confidence,
+                'source': best_match.source,
+                'category': best_match.category,
+                'definition': best_match.definition,
+                'context': best_match.context,
+                'rag_enabled': True,
+                'medical_database': best_match.source
+            }
+        return corrections
 
 
 # Global RAG retriever instance
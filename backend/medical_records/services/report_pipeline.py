@@ -9,11 +9,19 @@ This module provides a PoC implementation for:
 Replace the PoC pieces with production-grade models, ontology lookups
 and vector DB clients for a real deployment.
 """
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import json
 import logging
 import os
+import threading
 
-from .models import ReportCorrectionVersion, ReportCorrectionRequest
+from django.conf import settings
+
+from ..models import ReportCorrectionVersion, ReportCorrectionRequest
+from .incremental_analysis import split_sentences
+from .micro_batcher import MicroBatcher
+from .model_registry import model_registry
+from .term_matcher import TermMatcher, build_term_matcher, get_term_matcher
 
 # Import transformers lazily in helper to avoid hard dependency if not used
 logger = logging.getLogger(__name__)
@@ -40,9 +48,65 @@ def _load_grammar_model():
     model_name = "t5-small"
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
     return tokenizer, model
 
 
+# Loaded once per process through the registry (see MODEL_WARMUP to load at boot)
+GRAMMAR_MODEL = "grammar_t5"
+model_registry.register(GRAMMAR_MODEL, _load_grammar_model)
+
+
+def _generate_grammar_batch(items: List[Tuple[str, int]]) -> List[str]:
+    """One padded generate over (prompt, max_length) items from concurrent requests"""
+    tokenizer, model = model_registry.get(GRAMMAR_MODEL)
+    max_length = max(length for _, length in items)
+    inputs = tokenizer([prompt for prompt, _ in items], return_tensors="pt", padding=True,
+                       truncation=True, max_length=max_length)
+    outputs = model.generate(**inputs, max_length=max_length, num_beams=4, early_stopping=True)
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+_grammar_batcher: Optional[MicroBatcher] = None
+_grammar_batcher_lock = threading.Lock()
+
+
+def get_grammar_batcher() -> MicroBatcher:
+    """Process-wide batching queue in front of the grammar model"""
+    global _grammar_batcher
+    if _grammar_batcher is None:
+        with _grammar_batcher_lock:
+            if _grammar_batcher is None:
+                _grammar_batcher = MicroBatcher(
+                    _generate_grammar_batch,
+                    max_batch_size=getattr(settings, 'GRAMMAR_BATCH_MAX_SIZE', 16),
+                    max_wait_ms=getattr(settings, 'GRAMMAR_BATCH_MAX_WAIT_MS', 15.0),
+                    name=GRAMMAR_MODEL,
+                )
+    return _grammar_batcher
+
+
+def _correct_with_local_model(text: str, max_length: int) -> str:
+    """
+    Correct text sentence by sentence through the batching queue.
+
+    Sentences keep their original trailing whitespace, so line structure
+    survives the round trip.
+    """
+    sentences = [text[start:end] for start, end in split_sentences(text)]
+    targets = [index for index, sentence in enumerate(sentences) if sentence.strip()]
+    corrected = get_grammar_batcher().map(
+        [(f"correct: {sentences[index].strip()}", max_length) for index in targets],
+        timeout=getattr(settings, 'GRAMMAR_BATCH_TIMEOUT', 60.0),
+    )
+
+    for index, sentence_text in zip(targets, corrected):
+        sentence = sentences[index]
+        trailing = sentence[len(sentence.rstrip()):]
+        sentences[index] = sentence_text + trailing
+    return ''.join(sentences).strip()
+
+
 def run_grammar_correction(text: str, max_length: int = 512) -> Dict[str, Any]:
     """Run a lightweight grammar/fluency correction using a seq2seq model.
 
@@ -54,13 +118,6 @@ def run_grammar_correction(text: str, max_length: int = 512) -> Dict[str, Any]:
     if not text or not text.strip():
         return {"corrected_text": text, "confidence": 0.0, "explain": []}
 
-    tokenizer, model = _load_grammar_model()
-    # Use a simple prefix to request correction; T5 is generic text-to-text.
-    prompt = f"correct: {text.strip()}"
-    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=max_length)
-    outputs = model.generate(**inputs, max_length=max_length, num_beams=4, early_stopping=True)
-    corrected = tokenizer.decode(outputs[0], skip_special_tokens=True)
-
     # Prefer an external Generative API to avoid CPU-heavy local models
     if OPENAI_API_KEY:
         try:
@@ -84,12 +141,7 @@ def run_grammar_correction(text: str, max_length: int = 512) -> Dict[str, Any]:
     else:
         # If no API key, fall back to local transformers only if available; otherwise use rule-based lightweight correction
         try:
-            tokenizer, model = _load_grammar_model()
-            # Use a simple prefix to request correction; T5 is generic text-to-text.
-            prompt = f"correct: {text.strip()}"
-            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=max_length)
-            outputs = model.generate(**inputs, max_length=max_length, num_beams=4, early_stopping=True)
-            corrected = tokenizer.decode(outputs[0], skip_special_tokens=True)
+            corrected = _correct_with_local_model(text, max_length)
         except Exception:
             # Transformers not available or failed — use simple rule-based correction
             corrected = _rule_based_correction(text)
@@ -138,29 +190,51 @@ _MEDICAL_SYNONYMS = {
 }
 
 
+def _build_medical_term_matcher() -> Tuple[TermMatcher, bool]:
+    """
+    Automaton over the synonym map plus the correction service's medical
+    dictionary, and whether the dictionary was included.
+    """
+    term_maps = [(_MEDICAL_SYNONYMS, "synonym_map")]
+    try:
+        from .medical_correction_service import get_medical_correction_service
+        correction_service = get_medical_correction_service()
+        if correction_service is not None:
+            term_maps.append((correction_service.medical_dictionary, "medical_dictionary"))
+    except ImportError as e:
+        logger.warning("Medical dictionary not available for term matching: %s", e)
+    complete = len(term_maps) > 1
+    if not complete:
+        logger.warning("Medical term matcher built without the medical dictionary; will retry")
+    return build_term_matcher(*term_maps), complete
+
+
+def get_medical_term_matcher() -> TermMatcher:
+    """
+    Shared matcher for run_medical_term_check, built once per process; rebuilt
+    periodically while the medical dictionary is unavailable.
+    """
+    return get_term_matcher("medical_terms", _build_medical_term_matcher)
+
+
 def run_medical_term_check(text: str) -> Dict[str, Any]:
     """Identify simple misspellings of common terms and normalize them.
 
     Returns `normalized_text` and `changes` list with entries {from,to,reason}.
-    This is intentionally simple — it demonstrates the interface and audit
-    trail for changes.
+    All misspellings are found in one pass of a multi-pattern automaton and
+    only whole words are replaced; `changes` lists each misspelling found
+    once, in map order.
     """
     if not text:
         return {"normalized_text": text, "changes": []}
 
-    normalized = text
+    matcher = get_medical_term_matcher()
+    normalized, matches = matcher.replace(text)
+
     changes: List[Dict[str, Any]] = []
-    lowered = text.lower()
-    for misspelling, canonical in _MEDICAL_SYNONYMS.items():
-        if misspelling in lowered and misspelling != canonical:
-            # Replace occurrences (case-insensitive)
-            import re
-
-            pattern = re.compile(re.escape(misspelling), re.IGNORECASE)
-            new_text, count = pattern.subn(canonical, normalized)
-            if count > 0:
-                changes.append({"from": misspelling, "to": canonical, "reason": "synonym_map"})
-                normalized = new_text
+    for pattern_id in sorted({pattern_id for _, _, pattern_id in matches}):
+        misspelling, canonical, reason = matcher.patterns[pattern_id]
+        changes.append({"from": misspelling, "to": canonical, "reason": reason})
 
     return {"normalized_text": normalized, "changes": changes}
 
@@ -199,29 +273,43 @@ def aggregate_corrections(grammar_res: Dict[str, Any], medical_res: Dict[str, An
     }
 
 
-def process_report_correction_sync(request: ReportCorrectionRequest) -> ReportCorrectionVersion:
-    """Synchronous processing path for testing without Celery.
+def process_report_correction_sync(request: ReportCorrectionRequest,
+                                   on_progress: Optional[Callable[[int], None]] = None) -> ReportCorrectionVersion:
+    """Run the correction pipeline for a request and store the result as a new version.
 
-    Processes the latest submitted text (assumed stored in request.notes or a linked record)
-    and writes a ReportCorrectionVersion to the database. Returns the created version.
+    Used directly for local testing and by the background job runner, which
+    passes `on_progress` to record progress (0-100) between pipeline steps.
+    Returns the created version.
     """
-    # For POC, assume the raw report text is stored in request.notes
-    raw = (request.notes or "").strip()
+    def progress(percent: int):
+        if on_progress is not None:
+            on_progress(percent)
+
+    # The submitted report text; older requests only kept it in notes
+    raw = (request.original_text or request.notes or "").strip()
+
+    progress(10)
     grammar_res = run_grammar_correction(raw)
+    progress(60)
     medical_res = run_medical_term_check(grammar_res.get("corrected_text", raw))
+    progress(80)
     aggregated = aggregate_corrections(grammar_res, medical_res)
 
+    corrected = medical_res.get("normalized_text") or aggregated.get("findings") or raw
     version = ReportCorrectionVersion.objects.create(
         correction_request=request,
-        patient_info=aggregated.get("patient_info", {}),
-        clinical_indication=aggregated.get("clinical_indication"),
-        findings=aggregated.get("findings"),
-        impression=aggregated.get("impression"),
-        corrections=aggregated.get("corrections", {}),
-        confidence_score=aggregated.get("confidence_score", 0.0),
+        version_number=request.versions.count() + 1,
+        corrected_text=corrected,
+        correction_notes=json.dumps({
+            "corrections": aggregated.get("corrections", {}),
+            "confidence_score": aggregated.get("confidence_score", 0.0),
+        }),
+        created_by=request.requested_by,
     )
 
+    request.corrected_text = corrected
     request.status = ReportCorrectionRequest.STATUS_PROCESSED
+    request.progress = 100
     request.processed_at = version.created_at
     request.save()
 
@@ -0,0 +1,105 @@
+"""
+Report Tokenizer
+================
+
+Single-pass tokenization shared by every detector of the medical correction
+service. A report is scanned once into a compact token array carrying
+offsets, the lowercased form and shape flags, so detectors no longer need
+their own regex passes over the same text.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import FrozenSet, List
+
+# Equivalent to r'\b\w+\b' - greedy \w runs are always bounded by \b
+WORD_PATTERN = re.compile(r'\w+')
+
+# Shape flags (bitmask)
+ASCII_ALPHA = 1    # Only ASCII letters - what r'\b[a-zA-Z]+\b' used to match
+UPPER = 2          # All cased characters are uppercase
+CAPITALIZED = 4    # First character is uppercase
+HAS_DIGIT = 8      # Contains at least one digit
+
+_ASCII_LETTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+@dataclass(frozen=True, slots=True)
+class Token:
+    """A word token with its position in the original report"""
+    start: int
+    end: int
+    text: str
+    lower: str
+    flags: int
+
+    @property
+    def position(self):
+        return (self.start, self.end)
+
+    @property
+    def is_ascii_alpha(self) -> bool:
+        return bool(self.flags & ASCII_ALPHA)
+
+    @property
+    def is_upper(self) -> bool:
+        return bool(self.flags & UPPER)
+
+    @property
+    def is_capitalized(self) -> bool:
+        return bool(self.flags & CAPITALIZED)
+
+    @property
+    def has_digit(self) -> bool:
+        return bool(self.flags & HAS_DIGIT)
+
+
+class TokenizedReport:
+    """Token array for a report plus the derived lookups detectors need"""
+
+    __slots__ = ('text', 'tokens', '_vocabulary')
+
+    def __init__(self, text: str, tokens: List[Token]):
+        self.text = text
+        self.tokens = tokens
+        self._vocabulary = None
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    @property
+    def vocabulary(self) -> FrozenSet[str]:
+        """Set of lowercased token forms, used to skip patterns that cannot match"""
+        if self._vocabulary is None:
+            self._vocabulary = frozenset(token.lower for token in self.tokens)
+        return self._vocabulary
+
+    def alpha_tokens(self) -> List[Token]:
+        """Tokens made purely of ASCII letters"""
+        return [token for token in self.tokens if token.flags & ASCII_ALPHA]
+
+
+def _shape_flags(word: str) -> int:
+    flags = 0
+    if _ASCII_LETTERS.issuperset(word):
+        flags |= ASCII_ALPHA
+    if word.isupper():
+        flags |= UPPER
+    if word[0].isupper():
+        flags |= CAPITALIZED
+    if any(char.isdigit() for char in word):
+        flags |= HAS_DIGIT
+    return flags
+
+
+def tokenize_report(text: str) -> TokenizedReport:
+    """Tokenize a report once into a TokenizedReport"""
+    tokens = []
+    append = tokens.append
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group()
+        append(Token(match.start(), match.end(), word, word.lower(), _shape_flags(word)))
+    return TokenizedReport(text, tokens)
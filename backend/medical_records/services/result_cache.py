@@ -0,0 +1,91 @@
+"""
+Analysis Result Cache
+=====================
+
+Content-addressed cache for analyze_medical_report results. The key is a
+SHA-256 over the report text and everything else that can change the
+output: model name, whether AI enhancement applies, the knowledge base
+version and the correction ruleset version.
+
+Results are stored pickled, so each hit returns a private copy. A
+byte-budgeted in-process LRU sits in front of the shared Django cache;
+entries above ANALYSIS_CACHE_MAX_ITEM_BYTES are not cached at all.
+"""
+
+import hashlib
+import logging
+import pickle
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .memory_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'analysis_result'
+
+
+class AnalysisResultCache:
+    """Two-tier, size-aware cache of analysis results keyed by content hash"""
+
+    def __init__(self, timeout: Optional[int] = None, local_max_bytes: Optional[int] = None,
+                 max_item_bytes: Optional[int] = None):
+        self.timeout = timeout or getattr(settings, 'ANALYSIS_CACHE_TIMEOUT', 86400)
+        self.max_item_bytes = max_item_bytes or getattr(settings, 'ANALYSIS_CACHE_MAX_ITEM_BYTES', 1024 * 1024)
+        self.local_cache = LRUCache(
+            max_entries=10000,
+            ttl=self.timeout,
+            max_bytes=local_max_bytes or getattr(settings, 'ANALYSIS_CACHE_LOCAL_MAX_BYTES', 64 * 1024 * 1024),
+        )
+        self.shared_hits = 0
+
+    def make_key(self, text: str, model_name: str, ai_enabled: bool, kb_version: str, ruleset_version: str) -> str:
+        """
+        Cache key for an analysis request.
+
+        The text is hashed exactly as submitted. Corrections carry character
+        offsets, so any normalization would map two texts to one set of
+        offsets that is only valid for one of them.
+        """
+        digest = hashlib.sha256()
+        for part in (model_name if ai_enabled else '', 'ai' if ai_enabled else 'rules', kb_version, ruleset_version):
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return f"{KEY_PREFIX}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for key, or None"""
+        payload = self.local_cache.get(key)
+        if payload is None:
+            payload = cache.get(key)
+            if payload is None:
+                return None
+            self.shared_hits += 1
+            self.local_cache.set(key, payload)
+
+        try:
+            return pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached analysis {key}: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> bool:
+        """Store a result; returns False if it is too large to cache"""
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_item_bytes:
+            return False
+
+        self.local_cache.set(key, payload)
+        cache.set(key, payload, self.timeout)
+        return True
+
+    def delete(self, key: str):
+        self.local_cache.delete(key)
+        cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.local_cache.stats(), 'shared_hits': self.shared_hits}
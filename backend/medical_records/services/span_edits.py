@@ -0,0 +1,160 @@
+"""
+Span Edit Engine
+================
+
+Applies a set of (start, end, replacement) edits to a text in one pass.
+Overlapping edits are resolved by priority (e.g. confidence), then by span
+length, then by position - or, for callers whose edits compose, by a
+cluster resolver that turns each group of overlapping edits into one edit.
+The surviving edits are joined into the output in a single ''.join, so cost
+is linear in the text size plus the number of edits. The returned OffsetMap
+translates positions in the original text to positions in the rewritten one.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class SpanEdit:
+    """Replace text[start:end] with replacement"""
+    start: int
+    end: int
+    replacement: str
+    priority: float = 0.0
+    payload: Any = field(default=None, compare=False)
+
+
+class OffsetMap:
+    """Maps offsets in the original text to offsets in the edited text"""
+
+    def __init__(self, applied: List[SpanEdit]):
+        self._old_starts = [edit.start for edit in applied]
+        self._edits = applied
+        # Cumulative length change after each applied edit
+        self._deltas = []
+        delta = 0
+        for edit in applied:
+            delta += len(edit.replacement) - (edit.end - edit.start)
+            self._deltas.append(delta)
+
+    def map_position(self, position: int) -> int:
+        """
+        New offset of an original offset.
+
+        Offsets inside a replaced span map to the start of its replacement;
+        the end offset of a replaced span maps to the end of the replacement.
+        """
+        index = bisect_right(self._old_starts, position) - 1
+        if index < 0:
+            return position
+
+        edit = self._edits[index]
+        if position < edit.end:
+            delta_before = self._deltas[index - 1] if index > 0 else 0
+            return edit.start + delta_before
+        return position + self._deltas[index]
+
+    def map_span(self, start: int, end: int) -> Tuple[int, int]:
+        """New (start, end) of an original span"""
+        return self.map_position(start), self.map_position(end)
+
+
+@dataclass
+class SpanEditResult:
+    text: str
+    applied: List[SpanEdit]
+    rejected: List[SpanEdit]
+    offset_map: OffsetMap
+
+
+def _overlaps(a: SpanEdit, b: SpanEdit) -> bool:
+    if a.start == a.end or b.start == b.end:
+        # Insertions only conflict when they target the same point or fall strictly inside another edit
+        return a.start == b.start or (b.start < a.start < b.end) or (a.start < b.start < a.end)
+    return a.start < b.end and b.start < a.end
+
+
+def resolve_overlaps(edits: Iterable[SpanEdit]) -> Tuple[List[SpanEdit], List[SpanEdit]]:
+    """
+    Pick a non-overlapping subset of edits.
+
+    Higher priority wins, then the longer span, then the earlier one.
+    Returns (applied sorted by start, rejected).
+    """
+    ranked = sorted(edits, key=lambda edit: (-edit.priority, -(edit.end - edit.start), edit.start))
+
+    applied: List[SpanEdit] = []
+    starts: List[int] = []
+    rejected: List[SpanEdit] = []
+    for edit in ranked:
+        index = bisect_right(starts, edit.start)
+        neighbours = applied[max(0, index - 1):index + 1]
+        if any(_overlaps(edit, other) for other in neighbours):
+            rejected.append(edit)
+            continue
+        applied.insert(index, edit)
+        starts.insert(index, edit.start)
+
+    return applied, rejected
+
+
+def group_overlapping(edits: Iterable[SpanEdit]) -> List[List[SpanEdit]]:
+    """
+    Group edits into clusters of transitively overlapping spans.
+
+    Clusters are ordered by start; edits keep their input order inside a
+    cluster. Spans that merely touch (one ends where the next starts) are
+    independent.
+    """
+    ordered = sorted(enumerate(edits), key=lambda item: (item[1].start, item[0]))
+
+    clusters: List[List[Tuple[int, SpanEdit]]] = []
+    cluster_end = -1
+    for order, edit in ordered:
+        if clusters and edit.start < cluster_end:
+            clusters[-1].append((order, edit))
+            cluster_end = max(cluster_end, edit.end)
+        else:
+            clusters.append([(order, edit)])
+            cluster_end = edit.end
+
+    return [[edit for _, edit in sorted(cluster, key=lambda item: item[0])] for cluster in clusters]
+
+
+def apply_span_edits(text: str, edits: Iterable[SpanEdit],
+                     resolve_cluster: Optional[Callable[[str, List[SpanEdit]], Optional[SpanEdit]]] = None) -> SpanEditResult:
+    """
+    Resolve overlaps and rewrite text with one join.
+
+    Without resolve_cluster, overlaps are settled by priority. With it,
+    every cluster of overlapping edits (including single edits) is passed to
+    resolve_cluster(text, cluster), which returns one edit covering the
+    cluster or None to drop it.
+    """
+    valid, invalid = [], []
+    for edit in edits:
+        (valid if 0 <= edit.start <= edit.end <= len(text) else invalid).append(edit)
+
+    if resolve_cluster is None:
+        applied, rejected = resolve_overlaps(valid)
+    else:
+        applied, rejected = [], []
+        for cluster in group_overlapping(valid):
+            resolved = resolve_cluster(text, cluster)
+            if resolved is None:
+                rejected.extend(cluster)
+            else:
+                applied.append(resolved)
+    rejected.extend(invalid)
+
+    parts = []
+    position = 0
+    for edit in applied:
+        parts.append(text[position:edit.start])
+        parts.append(edit.replacement)
+        position = edit.end
+    parts.append(text[position:])
+
+    return SpanEditResult(''.join(parts), applied, rejected, OffsetMap(applied))
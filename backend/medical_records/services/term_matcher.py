@@ -0,0 +1,190 @@
+"""
+Multi-Pattern Term Matcher
+==========================
+
+Aho-Corasick automaton over a misspelling -> canonical term map. Every
+occurrence of every misspelling is found in one linear pass over the text,
+so per-report cost does not grow with the size of the map.
+
+Matching is case-insensitive and limited to whole words: a match must not be
+preceded or followed by a word character. Overlapping matches are resolved
+leftmost-longest.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton mapping misspellings to canonical terms.
+
+    Patterns keep their insertion order (pattern id), which callers use to
+    report changes in map order. Adding the same misspelling twice keeps the
+    first entry.
+    """
+
+    def __init__(self):
+        # Trie nodes: transitions, failure link, pattern id ending here,
+        # and the nearest node on the failure chain that ends a pattern
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._dict_link: List[int] = [0]
+        self.patterns: List[Tuple[str, str, str]] = []  # (misspelling, canonical, reason)
+        self._built = True
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def add(self, misspelling: str, canonical: str, reason: str = 'synonym_map'):
+        """Add a misspelling; call build() after the last add"""
+        key = misspelling.lower()
+        if not key:
+            return
+
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(0)
+                self._goto[node][char] = next_node
+            node = next_node
+
+        if self._output[node] == -1:
+            self._output[node] = len(self.patterns)
+            self.patterns.append((key, canonical, reason))
+            self._built = False
+
+    def build(self):
+        """Compute failure and output links breadth-first"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._dict_link[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._output[fail] != -1 else self._dict_link[fail]
+                queue.append(child)
+
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Whole-word matches in text as (start, end, pattern_id).
+
+        Overlaps are resolved leftmost-longest, so the result is ordered by
+        start and non-overlapping.
+        """
+        if not self._built:
+            self.build()
+
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        patterns = self.patterns
+        candidates = []
+        node = 0
+        length = len(text)
+
+        for index, char in enumerate(text):
+            # Keep one automaton step per character so offsets stay exact
+            lowered = char.lower()
+            if len(lowered) != 1:
+                lowered = char
+            while node and lowered not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(lowered, 0)
+
+            end = index + 1
+            if end < length and _is_word_char(text[end]):
+                continue
+
+            match_node = node if output[node] != -1 else dict_link[node]
+            while match_node:
+                pattern_id = output[match_node]
+                start = end - len(patterns[pattern_id][0])
+                if start >= 0 and (start == 0 or not _is_word_char(text[start - 1])):
+                    candidates.append((start, -end, pattern_id))
+                match_node = dict_link[match_node]
+
+        candidates.sort()
+        matches = []
+        position = 0
+        for start, negative_end, pattern_id in candidates:
+            if start >= position:
+                matches.append((start, -negative_end, pattern_id))
+                position = -negative_end
+        return matches
+
+    def replace(self, text: str) -> Tuple[str, List[Tuple[int, int, int]]]:
+        """Replace every match with its canonical term; returns (text, matches)"""
+        matches = self.find_all(text)
+        if not matches:
+            return text, matches
+
+        parts = []
+        position = 0
+        for start, end, pattern_id in matches:
+            parts.append(text[position:start])
+            parts.append(self.patterns[pattern_id][1])
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts), matches
+
+
+def build_term_matcher(*term_maps: Tuple[Dict[str, str], str]) -> TermMatcher:
+    """
+    Build a matcher from (mapping, reason) pairs.
+
+    Identity entries (a term mapped to itself) are skipped, and earlier maps
+    win when the same misspelling (case-insensitively) appears in several.
+    """
+    matcher = TermMatcher()
+    for mapping, reason in term_maps:
+        for misspelling, canonical in mapping.items():
+            if misspelling != canonical:
+                matcher.add(misspelling, canonical, reason)
+    matcher.build()
+    return matcher
+
+
+# name -> (matcher, complete, built_at)
+_matcher_cache: Dict[str, Tuple[TermMatcher, bool, float]] = {}
+_matcher_lock = threading.Lock()
+
+
+def get_term_matcher(name: str, factory: Callable[[], Tuple[TermMatcher, bool]],
+                     retry_interval: float = 60.0) -> TermMatcher:
+    """
+    Return the named matcher, built with factory() once per process.
+
+    factory returns (matcher, complete). An incomplete matcher, built while
+    one of its term sources was unavailable, is still used but rebuilt at
+    most every retry_interval seconds until a complete one is cached.
+    """
+    entry = _matcher_cache.get(name)
+    if entry is not None and (entry[1] or time.monotonic() - entry[2] < retry_interval):
+        return entry[0]
+    with _matcher_lock:
+        entry = _matcher_cache.get(name)
+        if entry is None or not (entry[1] or time.monotonic() - entry[2] < retry_interval):
+            matcher, complete = factory()
+            entry = _matcher_cache[name] = (matcher, complete, time.monotonic())
+    return entry[0]
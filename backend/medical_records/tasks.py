@@ -1,53 +1,18 @@
 from celery import shared_task
-from .models import ReportCorrectionRequest, ReportCorrectionVersion
-from .services import run_grammar_correction, run_medical_term_check, aggregate_corrections, rag_retrieval
-from django.utils import timezone
 
-@shared_task(bind=True)
-def process_report_correction(self, request_id):
-    try:
-        req = ReportCorrectionRequest.objects.get(request_id=request_id)
-        req.status = 'processing'
-        req.save()
-
-        # For now use the latest version's findings as input (placeholder)
-        raw_text = ''
-        if req.versions.exists():
-            raw_text = req.versions.first().findings or ''
-
-        # Layer 1: grammar
-        grammar_res = run_grammar_correction(raw_text)
+from .services.anonymization_engine import run_batch_job
+from .services.correction_jobs import run_correction_job
 
-        # RAG retrieval for medical context
-        retrieved = rag_retrieval(raw_text, raw_text)
 
-        # Layer 2: medical term/ontology check
-        medical_res = run_medical_term_check(grammar_res['corrected_text'], ontology_hits=retrieved)
-
-        # Aggregate
-        final = aggregate_corrections(grammar_res, medical_res)
-
-        # Create a new version with corrected text and metadata
-        version = ReportCorrectionVersion.objects.create(
-            correction_request=req,
-            created_by=req.requested_by,
-            findings=final['corrected_text'],
-            corrections=final['corrections'],
-            confidence_score=final['confidence']
-        )
+@shared_task(bind=True, acks_late=True)
+def process_report_correction(self, request_id):
+    """Celery entry point for a queued report correction (see services.correction_jobs)"""
+    version_id = run_correction_job(request_id)
+    return {'status': 'ok', 'request_id': request_id, 'version_id': version_id}
 
-        req.status = 'completed'
-        req.processed_at = timezone.now()
-        req.save()
 
-        return {'status':'ok', 'request_id': request_id}
-    except Exception as e:
-        try:
-            req = ReportCorrectionRequest.objects.get(request_id=request_id)
-            req.status = 'failed'
-            req.notes = str(e)
-            req.save()
-        except Exception:
-            pass
-        raise
-*** End Patch
\ No newline at end of file
+@shared_task(bind=True, acks_late=True)
+def process_anonymization_batch(self, job_id):
+    """Celery entry point for a queued batch anonymization (see services.anonymization_engine)"""
+    processed = run_batch_job(job_id)
+    return {'status': 'ok', 'job_id': job_id, 'processed': processed}
@@ -0,0 +1,58 @@
+"""
+Tests for PHI name detection
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from .services.name_gazetteer import NameGazetteer
+from .services.phi_detection import DETECTORS_BY_NAME, PhiDetectionEngine
+
+
+class NameDetectionTests(SimpleTestCase):
+    """Name candidates are only dropped when they are medical phrases"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def engine(self, full_name_lists=False):
+        path = os.path.join(self.directory, f'gazetteer-{int(full_name_lists)}.bin')
+        NameGazetteer.build(
+            first_names=['john'], surnames=['smith'], stoplist=['pleural', 'effusion'],
+            meta={'full_name_lists': full_name_lists},
+        ).write(path)
+        return PhiDetectionEngine([DETECTORS_BY_NAME['full_name']], gazetteer_path=path)
+
+    def names(self, engine, text):
+        return [detection['value'] for detection in engine.detect(text)]
+
+    def test_uncommon_name_is_redacted(self):
+        engine = self.engine()
+        self.assertEqual(self.names(engine, 'Seen today: Tanzeem Agra, follow-up in a week.'), ['Tanzeem Agra'])
+        result = engine.anonymize('Tanzeem Agra reports chest pain.')
+        self.assertNotIn('Tanzeem', result['anonymized_text'])
+        self.assertNotIn('Agra', result['anonymized_text'])
+
+    def test_medical_phrase_is_not_redacted(self):
+        engine = self.engine()
+        self.assertEqual(self.names(engine, 'Findings: Pleural Effusion on the left.'), [])
+
+    def test_name_after_medical_phrase_is_found(self):
+        engine = self.engine()
+        self.assertEqual(self.names(engine, 'Pleural Effusion Tanzeem Agra'), ['Tanzeem Agra'])
+
+    def test_known_names_score_higher_than_unknown(self):
+        confidences = {d['value']: d['confidence'] for d in self.engine().detect('John Smith and Tanzeem Agra')}
+        self.assertGreater(confidences['John Smith'], confidences['Tanzeem Agra'])
+
+    def test_full_name_lists_require_a_known_name(self):
+        engine = self.engine(full_name_lists=True)
+        self.assertEqual(self.names(engine, 'John Smith and Tanzeem Agra'), ['John Smith'])
+
+    def test_without_gazetteer_every_candidate_counts(self):
+        engine = PhiDetectionEngine([DETECTORS_BY_NAME['full_name']],
+                                    gazetteer_path=os.path.join(self.directory, 'missing.bin'))
+        self.assertEqual(self.names(engine, 'Pleural Effusion'), ['Pleural Effusion'])
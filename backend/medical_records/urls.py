@@ -8,6 +8,8 @@ from . import ai_views
 
 # Create router for viewsets if needed
 router = DefaultRouter()
+router.register(r'report-corrections', views.ReportCorrectionViewSet, basename='report-correction')
+router.register(r'anonymization-requests', views.AnonymizationBatchViewSet, basename='anonymization')
 
 # Medical records specific URLs
 urlpatterns = [
@@ -17,6 +19,10 @@ urlpatterns = [
     # AI-powered endpoints
     path('corrections/test/', ai_views.test_correction_api, name='test-correction'),
     path('corrections/analyze/', ai_views.analyze_report_with_ai, name='analyze-report'),
+    path('corrections/analyze-stream/', ai_views.analyze_report_stream, name='analyze-report-stream'),
+    path('corrections/analyze-async/', ai_views.analyze_report_async, name='analyze-report-async'),
+    path('corrections/analyze-incremental/', ai_views.analyze_report_incremental, name='analyze-report-incremental'),
+    path('corrections/models/', ai_views.model_registry_stats, name='model-registry-stats'),
     path('corrections/submit/', ai_views.submit_correction_request, name='submit-correction'),
     path('anonymization/anonymize/', ai_views.anonymize_text, name='anonymize-text'),
     path('analyze-image/', ai_views.analyze_medical_image, name='analyze-image'),
@@ -2,8 +2,11 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.conf import settings
+from django.db import transaction
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import ReportCorrectionRequest, ReportCorrectionVersion, MedicalRecord
@@ -12,8 +15,16 @@ from django.utils import timezone
 import json
 import logging
 # from . import services  # Commented out to avoid import issues for demo
-from .models import AnonymizationRequest, AnonymizationAuditLog, AnonymizationConfiguration
+from .models import AnonymizationRequest, AnonymizationAuditLog, AnonymizationConfiguration, AnonymizationBatchJob
 from .file_processing import file_processing_service
+from .services.anonymization_engine import BatchAnonymizationEngine, enqueue_batch_job
+from .services.correction_jobs import enqueue_correction_job
+from .services.phi_config import get_phi_engine
+from .services.phi_detection import (
+    anonymize_detections, compliance_score as phi_compliance_score,
+    replacement_for, risk_level as phi_risk_level,
+)
+from dashboard.pagination import CreatedAtPagination, TimestampPagination
 # Removed circular import: from dashboard.services import dashboard_service
 
 def get_dashboard_service():
@@ -33,6 +44,7 @@ class ReportCorrectionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ReportCorrectionRequest.objects.all()
     serializer_class = ReportCorrectionRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtPagination
     lookup_field = 'request_id'
 
     @action(detail=False, methods=['post'], url_path='submit', permission_classes=[AllowAny])
@@ -49,53 +61,24 @@ class ReportCorrectionViewSet(viewsets.ReadOnlyModelViewSet):
             # For demo/testing: create a correction request without requiring existing medical record
             correction_request = ReportCorrectionRequest.objects.create(
                 medical_record=None,  # Allow null for demo purposes
+                medical_record_id_fallback=medical_record_data,
+                original_text=text,
                 requested_by=request.user if request.user.is_authenticated else None,
-                status='pending',
+                status=ReportCorrectionRequest.STATUS_PENDING,
                 notes=f"Demo correction for record ID: {medical_record_data}. {notes}".strip()
             )
         else:
             # Normal case with existing medical record
             correction_request = ReportCorrectionRequest.objects.create(
                 medical_record=medical_record_data,
+                original_text=text,
                 requested_by=request.user if request.user.is_authenticated else None,
-                status='pending',
+                status=ReportCorrectionRequest.STATUS_PENDING,
                 notes=notes
             )
 
-        # Update status to processing
-        correction_request.status = 'processing'
-        correction_request.save()
-
-        # Create a simple demo response version for testing
-        # This provides immediate feedback while avoiding complex model dependencies
-        
-        # Apply simple text corrections for demo purposes
-        corrected_text = text.replace("brething", "breathing").replace("pnuemonia", "pneumonia")
-        corrected_text = corrected_text.replace("surgeyr", "surgery").replace("recieve", "receive")
-        
-        # Create correction version with demo corrections
-        version = ReportCorrectionVersion.objects.create(
-            correction_request=correction_request,
-            created_by=request.user if request.user.is_authenticated else None,
-            findings=corrected_text,
-            corrections={
-                'grammar': {
-                    'explain': ['Demo correction: Fixed common spelling errors'],
-                    'original': text,
-                    'corrected': corrected_text
-                },
-                'medical': {
-                    'explain': ['Demo: Medical terminology normalized'],
-                    'suggestions': ['Consider using standardized medical abbreviations']
-                }
-            },
-            confidence_score=0.85
-        )
-        
-        # Update request status to completed
-        correction_request.status = 'completed'
-        correction_request.processed_at = timezone.now()
-        correction_request.save()
+        # Processing runs in a worker; clients poll the status endpoint
+        backend = enqueue_correction_job(correction_request.request_id)
         
         # Log report correction activity for dashboard
         get_dashboard_service().log_activity(
@@ -103,15 +86,14 @@ class ReportCorrectionViewSet(viewsets.ReadOnlyModelViewSet):
             action='submit_correction',
             user=request.user if request.user.is_authenticated else None,
             category='report_correction',
-            description=f'Report correction submitted and processed',
-            severity='success',
+            description=f'Report correction submitted for processing',
+            severity='info',
             metadata={
                 'request_id': str(correction_request.request_id),
                 'medical_record_id': str(medical_record_data) if isinstance(medical_record_data, str) else str(medical_record_data.id) if medical_record_data else None,
                 'text_length': len(text),
-                'corrections_applied': len(version.corrections) if version.corrections else 0,
-                'confidence_score': version.confidence_score,
                 'correction_type': 'grammar_and_medical',
+                'job_backend': backend,
                 'status': correction_request.status
             },
             ip_address=self.get_client_ip(request) if hasattr(self, 'get_client_ip') else None,
@@ -119,7 +101,39 @@ class ReportCorrectionViewSet(viewsets.ReadOnlyModelViewSet):
             session_key=request.session.session_key if hasattr(request.session, 'session_key') else None
         )
 
-        return Response(ReportCorrectionRequestSerializer(correction_request).data, status=status.HTTP_201_CREATED)
+        return Response({
+            'request_id': correction_request.request_id,
+            'status': correction_request.status,
+            'progress': correction_request.progress,
+            'status_url': request.build_absolute_uri(
+                reverse('report-correction-job-status', kwargs={'request_id': correction_request.request_id})
+            ),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path='status', url_name='job-status', permission_classes=[AllowAny])
+    def job_status(self, request, request_id=None):
+        """
+        Status and progress of a submitted correction job. The corrected
+        report is PHI, so the result is only included for its owner or staff.
+        """
+        req = get_object_or_404(ReportCorrectionRequest, request_id=request_id)
+        data = {
+            'request_id': req.request_id,
+            'status': req.status,
+            'progress': req.progress,
+            'processed_at': req.processed_at,
+            'error': req.error_message or None,
+        }
+        if req.status == ReportCorrectionRequest.STATUS_PROCESSED:
+            user = request.user
+            can_view_result = user.is_authenticated and (user.is_staff or req.requested_by_id == user.pk)
+            data['result_available'] = can_view_result
+            if not can_view_result:
+                return Response(data, status=status.HTTP_200_OK)
+            latest = req.versions.first()
+            data['corrected_text'] = req.corrected_text
+            data['version'] = ReportCorrectionVersionSerializer(latest).data if latest else None
+        return Response(data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'], url_path='analyze', permission_classes=[AllowAny])
     def analyze(self, request):
@@ -328,59 +342,6 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=False, methods=['post'], url_path='batch')
-    def batch_anonymize(self, request):
-        """Batch anonymization for multiple texts or medical records"""
-        data = request.data
-        texts = data.get('texts', [])
-        record_ids = data.get('record_ids', [])
-        
-        if not texts and not record_ids:
-            return Response({'error': 'No texts or record IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
-
-        results = []
-        
-        # Process individual texts
-        for i, text in enumerate(texts):
-            try:
-                result = self.perform_ai_anonymization(text, data.get('options', {}))
-                results.append({
-                    'index': i,
-                    'status': 'success',
-                    'anonymized_text': result['anonymized_text'],
-                    'detections_count': len(result['detections'])
-                })
-            except Exception as e:
-                results.append({
-                    'index': i,
-                    'status': 'error',
-                    'error': str(e)
-                })
-
-        # Process medical records
-        for record_id in record_ids:
-            try:
-                # This would process actual medical records from database
-                # For demo, we'll simulate
-                results.append({
-                    'record_id': record_id,
-                    'status': 'success',
-                    'message': 'Medical record anonymized successfully'
-                })
-            except Exception as e:
-                results.append({
-                    'record_id': record_id,
-                    'status': 'error',
-                    'error': str(e)
-                })
-
-        return Response({
-            'batch_results': results,
-            'total_processed': len(results),
-            'successful': len([r for r in results if r.get('status') == 'success']),
-            'failed': len([r for r in results if r.get('status') == 'error'])
-        }, status=status.HTTP_200_OK)
-
     @action(detail=False, methods=['post'], url_path='insights')
     def get_insights(self, request):
         """Get anonymization insights and risk assessment"""
@@ -430,8 +391,8 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='audit')
     def get_audit_log(self, request):
-        """Get anonymization audit log"""
-        logs = AnonymizationAuditLog.objects.select_related('user', 'anonymization_request')
+        """Get anonymization audit log, newest first, one keyset page at a time"""
+        logs = AnonymizationAuditLog.objects.select_related('performed_by', 'request')
         
         # Apply filters
         action = request.query_params.get('action')
@@ -441,29 +402,30 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
         if action:
             logs = logs.filter(action=action)
         if user_id:
-            logs = logs.filter(user_id=user_id)
+            logs = logs.filter(performed_by_id=user_id)
         if date_from:
             logs = logs.filter(timestamp__gte=date_from)
 
         # Paginate results
-        logs = logs[:100]  # Limit to 100 records for demo
+        paginator = TimestampPagination()
+        page = paginator.paginate_queryset(logs, request, view=self)
 
         audit_data = [{
             'id': log.id,
             'action': log.action,
-            'user': log.user.username if log.user else 'Anonymous',
+            'user': log.performed_by.username if log.performed_by else 'Anonymous',
             'timestamp': log.timestamp,
-            'request_id': log.anonymization_request.request_id,
-            'ip_address': log.ip_address,
-            'details': log.details_json
-        } for log in logs]
+            'request_id': log.request.request_id,
+            'ip_address': log.request.ip_address,
+            'details': log.details
+        } for log in page]
 
-        return Response({
-            'audit_logs': audit_data,
-            'total_count': len(audit_data)
-        })
+        data = paginator.get_paginated_data(audit_data, results_key='audit_logs')
+        if 'count' in data:
+            data['total_count'] = data.pop('count')
+        return Response(data)
 
-    @action(detail=False, methods=['get', 'post'], url_path='config')
+    @action(detail=False, methods=['get', 'post'], url_path='config', parser_classes=[JSONParser, MultiPartParser, FormParser])
     def manage_config(self, request):
         """Get or update anonymization configuration"""
         if request.method == 'GET':
@@ -488,14 +450,19 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
             # Update configuration
             config_data = request.data
             
-            # Create new configuration version
-            config = AnonymizationConfiguration.objects.create(
-                name=config_data.get('name', 'Custom Configuration'),
-                description=config_data.get('description', ''),
-                config_json=config_data.get('config', {}),
-                is_default=True,
-                created_by=request.user if request.user.is_authenticated else None
-            )
+            # Create new configuration version; it replaces the previous default
+            name = config_data.get('name', 'Custom Configuration')
+            with transaction.atomic():
+                latest = AnonymizationConfiguration.objects.filter(name=name).order_by('-version').first()
+                AnonymizationConfiguration.objects.filter(is_default=True).update(is_default=False)
+                config = AnonymizationConfiguration.objects.create(
+                    name=name,
+                    description=config_data.get('description', ''),
+                    config_json=config_data.get('config', {}),
+                    version=latest.version + 1 if latest else 1,
+                    is_default=True,
+                    created_by=request.user if request.user.is_authenticated else None
+                )
             
             return Response({
                 'message': 'Configuration updated successfully',
@@ -659,56 +626,13 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
     # Helper methods
     def perform_ai_analysis(self, text):
         """AI-powered text analysis using soft-coded rules"""
-        # Simulate advanced AI analysis
-        import re
-        
-        detections = []
-        
-        # Name detection patterns
-        name_patterns = [
-            r'\b[A-Z][a-z]{2,}\s+[A-Z][a-z]{2,}\b',  # First Last names
-            r'\bPatient:?\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',  # Patient: Name
-        ]
-        
-        for pattern in name_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                detections.append({
-                    'type': 'name',
-                    'value': match.group(0),
-                    'start': match.start(),
-                    'end': match.end(),
-                    'confidence': 0.85
-                })
-        
-        # ID detection patterns
-        id_patterns = [
-            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN format
-            r'\bMRN:?\s*(\d+)\b',       # Medical Record Number
-        ]
-        
-        for pattern in id_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                detections.append({
-                    'type': 'identifier',
-                    'value': match.group(0),
-                    'start': match.start(),
-                    'end': match.end(),
-                    'confidence': 0.95
-                })
-        
-        # Calculate risk level
-        risk_level = 'LOW'
-        if len(detections) > 5:
-            risk_level = 'HIGH'
-        elif len(detections) > 2:
-            risk_level = 'MEDIUM'
+        # One scan with the detectors of the active configuration
+        detections = get_phi_engine().detect(text)
         
         return {
             'detections': detections,
-            'risk_level': risk_level,
-            'compliance_score': max(0, 100 - (len(detections) * 10)),
+            'risk_level': phi_risk_level(detections),
+            'compliance_score': phi_compliance_score(detections),
             'recommendations': self.generate_recommendations(detections)
         }
 
@@ -716,22 +640,8 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
         """Perform AI-powered anonymization"""
         analysis = self.perform_ai_analysis(text)
         
-        # Anonymize detected sensitive data
-        anonymized_text = text
-        offset = 0
-        
-        # Sort detections by position (reverse order to maintain positions)
-        detections = sorted(analysis['detections'], key=lambda x: x['start'], reverse=True)
-        
-        for detection in detections:
-            start = detection['start']
-            end = detection['end']
-            
-            # Generate contextual replacement
-            replacement = self.generate_replacement(detection['type'], detection['value'])
-            
-            # Replace in text
-            anonymized_text = anonymized_text[:start] + replacement + anonymized_text[end:]
+        # Anonymize detected sensitive data in one pass
+        anonymized_text = anonymize_detections(text, analysis['detections'])
         
         return {
             'anonymized_text': anonymized_text,
@@ -747,15 +657,7 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
 
     def generate_replacement(self, data_type, original_value):
         """Generate contextually appropriate replacement tokens"""
-        replacements = {
-            'name': '[PATIENT NAME]',
-            'identifier': '[ID REMOVED]',
-            'date': '[DATE]',
-            'phone': '[PHONE NUMBER]',
-            'email': '[EMAIL ADDRESS]',
-            'address': '[ADDRESS]'
-        }
-        return replacements.get(data_type, '[REDACTED]')
+        return replacement_for(data_type)
 
     def generate_recommendations(self, detections):
         """Generate anonymization recommendations"""
@@ -843,6 +745,113 @@ class AnonymizationViewSet(viewsets.ModelViewSet):
         }
 
 
+class AnonymizationBatchViewSet(viewsets.GenericViewSet):
+    """
+    Batch anonymization of texts or medical records, with job progress.
+
+    Only these two actions are routed; reading record_ids returns
+    de-identified patient records, so both require an authenticated user.
+    """
+    queryset = AnonymizationBatchJob.objects.all()
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'job_id'
+
+    @action(detail=False, methods=['post'], url_path='batch', parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def batch_anonymize(self, request):
+        """
+        Batch anonymization for multiple texts or medical records
+        
+        Small batches are processed in the request. Larger ones become a
+        background job: the response is 202 with a job_id to poll at
+        batch/<job_id>/.
+        """
+        data = request.data
+        texts = data.get('texts', [])
+        record_ids = data.get('record_ids', [])
+        options = data.get('options', {})
+        
+        if not texts and not record_ids:
+            return Response({'error': 'No texts or record IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        engine = BatchAnonymizationEngine()
+        total = engine.count_items(texts, record_ids)
+        requested_by = request.user
+        missing_records = len(record_ids) - (total - len(texts))
+
+        if total <= getattr(settings, 'ANONYMIZATION_BATCH_SYNC_LIMIT', 20):
+            # Inline: too small to be worth worker processes
+            outcome = BatchAnonymizationEngine(workers=1).process(
+                engine.iter_items(texts, record_ids), options, requested_by=requested_by, keep_results=True
+            )
+            results = outcome['results']
+            return Response({
+                'batch_results': results,
+                'total_processed': len(results),
+                'successful': len([r for r in results if r.get('status') == 'success']),
+                'failed': len([r for r in results if r.get('status') == 'error']),
+                'records_not_found': missing_records
+            }, status=status.HTTP_200_OK)
+
+        job = AnonymizationBatchJob.objects.create(
+            payload={'texts': texts, 'record_ids': record_ids, 'options': options},
+            total_items=total,
+            requested_by=requested_by,
+        )
+        backend = enqueue_batch_job(job.job_id)
+        
+        return Response({
+            'job_id': job.job_id,
+            'status': job.status,
+            'total_items': total,
+            'records_not_found': missing_records,
+            'job_backend': backend,
+            'status_url': request.build_absolute_uri(
+                reverse('anonymization-batch-status', kwargs={'job_id': job.job_id})
+            )
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'batch/(?P<job_id>[^/.]+)', url_name='batch-status')
+    def batch_status(self, request, job_id=None):
+        """Progress of a batch job; completed jobs page their results with ?offset=&limit="""
+        job = get_object_or_404(AnonymizationBatchJob, job_id=job_id)
+        data = {
+            'job_id': job.job_id,
+            'status': job.status,
+            'progress': job.progress,
+            'total_items': job.total_items,
+            'processed_items': job.processed_items,
+            'failed_items': job.failed_items,
+            'error': job.error_message or None,
+            'started_at': job.started_at,
+            'completed_at': job.completed_at
+        }
+        if job.status == 'completed':
+            # Results are de-identified patient data: only for the requester or staff
+            user = request.user
+            can_view_results = user.is_staff or job.requested_by_id == user.pk
+            data['results_available'] = can_view_results
+            if not can_view_results:
+                return Response(data, status=status.HTTP_200_OK)
+            try:
+                offset = max(0, int(request.query_params.get('offset', 0)))
+                limit = min(1000, max(1, int(request.query_params.get('limit', 100))))
+            except ValueError:
+                return Response({'error': 'offset and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+            rows = (job.requests.order_by('pk')
+                    .values('request_id', 'medical_record__record_id', 'status', 'anonymized_text', 'detections_count')
+                    [offset:offset + limit])
+            data['results'] = [{
+                'request_id': row['request_id'],
+                'record_id': row['medical_record__record_id'],
+                'status': 'success' if row['status'] == 'completed' else 'error',
+                'anonymized_text': row['anonymized_text'],
+                'detections_count': row['detections_count']
+            } for row in rows]
+            data['offset'] = offset
+            data['limit'] = limit
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class RadiologyViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for radiology records - medical records with imaging type"""
     serializer_class = MedicalRecordSerializer